@@ -18,6 +18,21 @@ from SimPEG import Solver as SimpegSolver
 __all__ = ['BaseEMProblem', 'BaseEMSurvey', 'BaseEMSrc']
 
 
+def _innerProductDerivVec(MDeriv, u, v, adjoint=False):
+    """
+    Derivative of an inner product matrix times u, times a vector v. A block
+    u [n x nSrc] (even for a single source) gives a block [n x nSrc] with a
+    column for each source, and in the adjoint (v [n x nSrc]) the sum of the
+    products over the sources.
+    """
+    if getattr(u, 'ndim', 1) == 2:
+        if adjoint:
+            return MDeriv.T * np.sum(u*np.reshape(v, u.shape, order='F'), axis=1)
+        return u * Utils.mkvc(MDeriv * v, 2)
+    if adjoint:
+        return MDeriv.T * (Utils.sdiag(u)*v)
+    return Utils.sdiag(u)*(MDeriv * v)
+
 
 ###############################################################################
 #                                                                             #
@@ -120,6 +135,7 @@ class BaseEMProblem(Problem.BaseProblem):
         for mat in self._clear_on_mu_update:
             if hasattr(self, mat):
                 delattr(self, mat)
+        self._clean_factors()
 
     @properties.observer('mui')
     def _clear_mu_mats_on_mui_update(self, change):
@@ -134,6 +150,7 @@ class BaseEMProblem(Problem.BaseProblem):
         for mat in self._clear_on_mu_update:
             if hasattr(self, mat):
                 delattr(self, mat)
+        self._clean_factors()
 
     @properties.observer('sigma')
     def _clear_sigma_mats_on_sigma_update(self, change):
@@ -148,6 +165,7 @@ class BaseEMProblem(Problem.BaseProblem):
         for mat in self._clear_on_sigma_update:
             if hasattr(self, mat):
                 delattr(self, mat)
+        self._clean_factors()
 
     @properties.observer('rho')
     def _clear_sigma_mats_on_rho_update(self, change):
@@ -162,6 +180,7 @@ class BaseEMProblem(Problem.BaseProblem):
         for mat in self._clear_on_sigma_update:
             if hasattr(self, mat):
                 delattr(self, mat)
+        self._clean_factors()
 
     @property
     def Me(self):
@@ -231,9 +250,9 @@ class BaseEMProblem(Problem.BaseProblem):
             )(np.ones(self.mesh.nF)) * self.muiDeriv
 
         if v is not None:
-            if adjoint is True:
-                return self._MfMuiDeriv.T*(Utils.sdiag(u)*v)
-            return Utils.sdiag(u)*(self._MfMuiDeriv*v)
+            return _innerProductDerivVec(
+                self._MfMuiDeriv, u, v, adjoint
+            )
         else:
             if adjoint is True:
                 return self._MfMuiDeriv.T*(Utils.sdiag(u))
@@ -293,9 +312,9 @@ class BaseEMProblem(Problem.BaseProblem):
             )(np.ones(self.mesh.nE)) * self.muDeriv
 
         if v is not None:
-            if adjoint:
-                return self._MeMuDeriv.T * (Utils.sdiag(u)*v)
-            return Utils.sdiag(u)*(self._MeMuDeriv * v)
+            return _innerProductDerivVec(
+                self._MeMuDeriv, u, v, adjoint
+            )
         else:
             if adjoint is True:
                 return self._MeMuDeriv.T * Utils.sdiag(u)
@@ -358,9 +377,9 @@ class BaseEMProblem(Problem.BaseProblem):
             )(np.ones(self.mesh.nE)) * self.sigmaDeriv
 
         if v is not None:
-            if adjoint:
-                return self._MeSigmaDeriv.T * (Utils.sdiag(u)*v)
-            return Utils.sdiag(u)*(self._MeSigmaDeriv * v)
+            return _innerProductDerivVec(
+                self._MeSigmaDeriv, u, v, adjoint
+            )
         else:
             if adjoint is True:
                 return self._MeSigmaDeriv.T * Utils.sdiag(u)
@@ -421,9 +440,9 @@ class BaseEMProblem(Problem.BaseProblem):
             )(np.ones(self.mesh.nF)) * self.rhoDeriv
 
         if v is not None:
-            if adjoint is True:
-                return self._MfRhoDeriv.T*(Utils.sdiag(u)*v)
-            return Utils.sdiag(u)*(self._MfRhoDeriv*v)
+            return _innerProductDerivVec(
+                self._MfRhoDeriv, u, v, adjoint
+            )
         else:
             if adjoint is True:
                 return self._MfRhoDeriv.T*(Utils.sdiag(u))
@@ -60,6 +60,51 @@ class BaseFDEMProblem(BaseEMProblem):
 
     Props.Reciprocal(mu, mui)
 
+    #: clear cached factors of the system matrices on any model update
+    clean_on_model_update = ['_Ainv']
+    #: keep the factors of the system matrices between calls
+    cacheFactors = True
+    #: maximum memory (bytes) used by cached factors, None for no limit
+    factorCacheMemory = None
+
+    def getAinv(self, freq, adjoint=False):
+        """
+        Solver for the system matrix at a given frequency.
+
+        Factors are cached for the current model (keyed on the frequency) and
+        shared by :code:`fields`, :code:`Jvec` and :code:`Jtvec`. They are
+        released on a model update, and the least recently used factors are
+        dropped once :code:`factorCacheMemory` is exceeded. As the system
+        matrices are complex-symmetric, the forward factor is re-used for
+        adjoint solves.
+
+        :param float freq: Frequency
+        :param bool adjoint: solver for the transpose of the system matrix
+        :rtype: Solver
+        :return: Ainv
+        """
+        symmetric = self._makeASymmetric is True
+        if adjoint and not symmetric:
+            factory = lambda: self.Solver(self.getA(freq).T, **self.solverOpts)
+            key = (freq, 'T')
+        else:
+            factory = lambda: self.Solver(self.getA(freq), **self.solverOpts)
+            key = freq
+
+        if not self.cacheFactors:
+            return factory()
+
+        if getattr(self, '_Ainv', None) is None:
+            self._Ainv = Utils.SolverUtils.FactorCache(
+                maxMemory=self.factorCacheMemory
+            )
+        return self._Ainv.get(key, factory)
+
+    def _cleanAinv(self, Ainv):
+        # factors are only cleaned here if they are not being cached
+        if not self.cacheFactors:
+            Ainv.clean()
+
     def fields(self, m=None):
         """
         Solve the forward problem for the fields.
@@ -75,13 +120,12 @@ class BaseFDEMProblem(BaseEMProblem):
         f = self.fieldsPair(self.mesh, self.survey)
 
         for freq in self.survey.freqs:
-            A = self.getA(freq)
             rhs = self.getRHS(freq)
-            Ainv = self.Solver(A, **self.solverOpts)
+            Ainv = self.getAinv(freq)
             u = Ainv * rhs
             Srcs = self.survey.getSrcByFreq(freq)
             f[Srcs, self._solutionType] = u
-            Ainv.clean()
+            self._cleanAinv(Ainv)
         return f
 
     def Jvec(self, m, v, f=None):
@@ -105,9 +149,8 @@ class BaseFDEMProblem(BaseEMProblem):
         Jv = []
 
         for freq in self.survey.freqs:
-            A = self.getA(freq)
             # create the concept of Ainv (actually a solve)
-            Ainv = self.Solver(A, **self.solverOpts)
+            Ainv = self.getAinv(freq)
 
             for src in self.survey.getSrcByFreq(freq):
                 u_src = f[src, self._solutionType]
@@ -119,7 +162,7 @@ class BaseFDEMProblem(BaseEMProblem):
                     Jv.append(
                         rx.evalDeriv(src, self.mesh, f, du_dm_v=du_dm_v, v=v)
                     )
-            Ainv.clean()
+            self._cleanAinv(Ainv)
         return np.hstack(Jv)
 
     def Jtvec(self, m, v, f=None):
@@ -145,8 +188,7 @@ class BaseFDEMProblem(BaseEMProblem):
         Jtv = np.zeros(m.size)
 
         for freq in self.survey.freqs:
-            AT = self.getA(freq).T
-            ATinv = self.Solver(AT, **self.solverOpts)
+            ATinv = self.getAinv(freq, adjoint=True)
 
             for src in self.survey.getSrcByFreq(freq):
                 u_src = f[src, self._solutionType]
@@ -176,7 +218,7 @@ class BaseFDEMProblem(BaseEMProblem):
                     else:
                         raise Exception('Must be real or imag')
 
-            ATinv.clean()
+            self._cleanAinv(ATinv)
 
         return Utils.mkvc(Jtv)
 
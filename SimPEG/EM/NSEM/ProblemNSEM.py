@@ -57,10 +57,8 @@ class BaseNSEMProblem(BaseFDEMProblem):
 
         # Loop all the frequenies
         for freq in self.survey.freqs:
-            # Get the system
-            A = self.getA(freq)
-            # Factor
-            Ainv = self.Solver(A, **self.solverOpts)
+            # Get the (cached) factor of the system
+            Ainv = self.getAinv(freq)
 
             for src in self.survey.getSrcByFreq(freq):
                 # We need fDeriv_m = df/du*du/dm + df/dm
@@ -77,7 +75,7 @@ class BaseNSEMProblem(BaseFDEMProblem):
                 for rx in src.rxList:
                     # Calculate dP/du*du/dm*v
                     Jv[src, rx] = rx.evalDeriv(src, self.mesh, f, mkvc(du_dm_v)) # wrt uPDeriv_u(mkvc(du_dm))
-            Ainv.clean()
+            self._cleanAinv(Ainv)
         # Return the vectorized sensitivities
         return mkvc(Jv)
 
@@ -104,9 +102,8 @@ class BaseNSEMProblem(BaseFDEMProblem):
         Jtv = np.zeros(m.size)
 
         for freq in self.survey.freqs:
-            AT = self.getA(freq).T
-
-            ATinv = self.Solver(AT, **self.solverOpts)
+            # The system is complex-symmetric, re-use the forward factor
+            ATinv = self.getAinv(freq, adjoint=True)
 
             for src in self.survey.getSrcByFreq(freq):
                 # u_src needs to have both polarizations
@@ -131,8 +128,8 @@ class BaseNSEMProblem(BaseFDEMProblem):
                         Jtv +=  -np.array(du_dmT, dtype=complex).real
                     else:
                         raise Exception('Must be real or imag')
-            # Clean the factorization, clear memory.
-            ATinv.clean()
+            # Clean the factorization, clear memory (if not cached).
+            self._cleanAinv(ATinv)
         return Jtv
 
 ###################################
@@ -290,15 +287,15 @@ class Problem1D_ePrimSec(BaseNSEMProblem):
                 startTime = time.time()
                 print('Starting work for {:.3e}'.format(freq))
                 sys.stdout.flush()
-            A = self.getA(freq)
             rhs  = self.getRHS(freq)
-            Ainv = self.Solver(A, **self.solverOpts)
+            Ainv = self.getAinv(freq)
             e_s = Ainv * rhs
 
             # Store the fields
             Src = self.survey.getSrcByFreq(freq)[0]
             # NOTE: only store the e_solution(secondary), all other components calculated in the fields object
             F[Src, 'e_1dSolution'] = e_s
+            self._cleanAinv(Ainv)
 
             if self.verbose:
                 print('Ran for {:f} seconds'.format(time.time()-startTime))
@@ -457,10 +454,9 @@ class Problem3D_ePrimSec(BaseNSEMProblem):
                 startTime = time.time()
                 print('Starting work for {:.3e}'.format(freq))
                 sys.stdout.flush()
-            A = self.getA(freq)
             rhs = self.getRHS(freq)
             # Solve the system
-            Ainv = self.Solver(A, **self.solverOpts)
+            Ainv = self.getAinv(freq)
             e_s = Ainv * rhs
 
             # Store the fields
@@ -474,5 +470,5 @@ class Problem3D_ePrimSec(BaseNSEMProblem):
             if self.verbose:
                 print('Ran for {:f} seconds'.format(time.time()-startTime))
                 sys.stdout.flush()
-            Ainv.clean()
+            self._cleanAinv(Ainv)
         return F
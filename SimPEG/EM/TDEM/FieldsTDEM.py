@@ -1,4 +1,5 @@
 from __future__ import division
+import warnings
 import numpy as np
 import scipy.sparse as sp
 from scipy.constants import epsilon_0
@@ -9,6 +10,111 @@ from SimPEG.EM.Utils import omega
 from SimPEG.Utils import Zero, sdiag
 
 
+class CheckpointedSolution(object):
+    """
+    Storage of the solution [nu x nSrc x nT+1] of a TDEM problem that only
+    keeps the time steps at checkpoints. The other time steps are recomputed
+    from the nearest earlier checkpoint when they are read, with the
+    (pooled) factors of the problem, one segment between two checkpoints at
+    a time. The checkpoint interval is chosen so that the checkpoints and
+    the segment fit in :code:`maxStoredSteps` time steps.
+
+    It is indexed like the array it replaces, :code:`store[:, srcInd,
+    tInd]`, and is written one time step (all the sources) at a time. The
+    time steps are recomputed with the model the solution was computed
+    for; if the model of the problem changed since, it is restored after.
+    Without a model (physical properties set directly), the steps are
+    recomputed with the properties of the problem as they are.
+    """
+
+    def __init__(self, prob, shape, maxStoredSteps, dtype=float):
+        self.prob = prob
+        self.shape = shape
+        self.dtype = dtype
+        self.model = None
+        if prob.model is not None:
+            self.model = np.array(prob.model, dtype=float)
+
+        # checkpoints and the segment (interval - 1 steps) in memory
+        nT = shape[2]
+        memory = [
+            (-(-nT // interval) + interval - 1, interval)
+            for interval in range(1, nT + 1)
+        ]
+        fits = [interval for m, interval in memory if m <= maxStoredSteps]
+        if fits:
+            self.interval = fits[0]
+        else:
+            self.interval = min(memory)[1]
+            warnings.warn(
+                "maxStoredSteps = {0:d} is below the minimum of {1:d} "
+                "time steps for {2:d} time steps".format(
+                    maxStoredSteps, min(memory)[0], nT
+                ), RuntimeWarning
+            )
+
+        self._checkpoints = {}
+        self._segment = None
+        self._segmentIndex = None
+
+    @property
+    def nStored(self):
+        """Number of time steps held in memory"""
+        return len(self._checkpoints) + len(self._segment or [])
+
+    def __setitem__(self, key, val):
+        _, srcInd, tInd = key
+        assert srcInd == slice(None) and np.isscalar(tInd), (
+            'The checkpointed solution is written one time step at a time'
+        )
+        if tInd % self.interval == 0:
+            self._checkpoints[tInd] = np.array(val, dtype=self.dtype).reshape(
+                self.shape[:2], order='F'
+            )
+        if tInd // self.interval == self._segmentIndex:
+            self._segment = self._segmentIndex = None
+
+    def __getitem__(self, key):
+        _, srcInd, timeInd = key
+        tInds = np.arange(self.shape[2])[timeInd]
+        if np.ndim(tInds) == 0:
+            return self._get(tInds)[:, srcInd]
+        return np.stack([self._get(tInd)[:, srcInd] for tInd in tInds], -1)
+
+    def _get(self, tInd):
+        if tInd in self._checkpoints:
+            return self._checkpoints[tInd]
+
+        segment = tInd // self.interval
+        if segment != self._segmentIndex:
+            prob = self.prob
+            model = prob.model
+            changed = self.model is not None and not (
+                isinstance(model, np.ndarray) and
+                model.shape == self.model.shape and
+                np.allclose(model, self.model)
+            )
+            if changed:
+                prob.model = self.model
+
+            # step from the checkpoint to the end of the segment
+            start = segment * self.interval
+            stop = min(start + self.interval, self.shape[2])
+            self._segment, self._segmentIndex = None, None
+            u = self._checkpoints[start]
+            steps = []
+            try:
+                for tInd_i in range(start, stop - 1):
+                    u = prob._timeStep(tInd_i, u)
+                    steps.append(u)
+            finally:
+                if changed:
+                    prob.model = model
+            self._segment, self._segmentIndex = steps, segment
+
+        return self._segment[tInd - segment * self.interval - 1]
+
+
 class FieldsTDEM(SimPEG.Problem.TimeFields):
     """
 
@@ -37,6 +143,16 @@ class FieldsTDEM(SimPEG.Problem.TimeFields):
     knownFields = {}
     dtype = float
 
+    #: data projected on the receivers during the forward (checkpointed)
+    projectedData = None
+
+    def _setField(self, field, val, name, ind):
+        if isinstance(field, CheckpointedSolution):
+            srcInd, timeInd = ind
+            field[:, srcInd, timeInd] = val
+            return
+        super(FieldsTDEM, self)._setField(field, val, name, ind)
+
     def _GLoc(self, fieldType):
         """Grid location of the fieldType"""
         return self.aliasFields[fieldType][1]
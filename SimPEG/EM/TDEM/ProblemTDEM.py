@@ -6,8 +6,9 @@ from SimPEG.EM.Base import BaseEMProblem
 from SimPEG.EM.TDEM.SurveyTDEM import Survey as SurveyTDEM
 from SimPEG.EM.TDEM.FieldsTDEM import (
     FieldsTDEM, Fields3D_b, Fields3D_e, Fields3D_h, Fields3D_j,
-    Fields_Derivs_eb, Fields_Derivs_hj
+    Fields_Derivs_eb, Fields_Derivs_hj, CheckpointedSolution
 )
+from SimPEG.EM.TDEM.TimeStepsTDEM import designTimeSteps
 from scipy.constants import mu_0
 import time
 
@@ -20,87 +21,296 @@ class BaseTDEMProblem(Problem.BaseTimeProblem, BaseEMProblem):
     """
     surveyPair = SurveyTDEM  #: A SimPEG.EM.TDEM.SurveyTDEM Class
     fieldsPair = FieldsTDEM  #: A SimPEG.EM.TDEM.FieldsTDEM Class
-    clean_on_model_update = ['_Adcinv']  #: clear DC matrix factors on any model updates
+    clean_on_model_update = ['_Adcinv', '_Adiaginv']  #: clear matrix factors on any model updates
     dt_threshold = 1e-8
+    cacheFactors = True  #: keep the factors for each distinct dt between calls
+    factorCacheMemory = None  #: maximum memory (bytes) used by the factors
+    maxStoredSteps = None  #: time steps of the solution kept by fields, the others are recomputed from checkpoints
 
     def __init__(self, mesh, **kwargs):
         BaseEMProblem.__init__(self, mesh, **kwargs)
 
-    # def fields_nostore(self, m):
-    #     """
-    #     Solve the forward problem without storing fields
+    def _dtKey(self, dt):
+        # time steps within dt_threshold share a factorization
+        for key in self._Adiaginv.keys():
+            if not isinstance(key, tuple) and abs(dt - key) <= self.dt_threshold:
+                return key
+        return dt
 
-    #     :param numpy.ndarray m: inversion model (nP,)
-    #     :rtype: numpy.ndarray
-    #     :return numpy.ndarray: numpy.ndarray (nD,)
+    def getAdiagInv(self, tInd, adjoint=False):
+        """
+        Solver for the diagonal block of the system at a given time index.
+
+        The factors are pooled on the distinct time step sizes, so each
+        system is only factored once per model and shared by
+        :code:`fields`, :code:`Jvec` and :code:`Jtvec`. The diagonal blocks
+        are symmetric, so the same factor is used for the adjoint solves.
+        The pool is released on a model update; with
+        :code:`cacheFactors = False` only the most recent factor is kept.
+
+        :param int tInd: time index
+        :param bool adjoint: solver for the transpose of the diagonal block
+        :rtype: Solver
+        :return: Adiaginv
+        """
+        if getattr(self, '_Adiaginv', None) is None:
+            self._Adiaginv = Utils.SolverUtils.FactorCache()
+        self._Adiaginv.maxMemory = (
+            self.factorCacheMemory if self.cacheFactors else 0
+        )
 
-    #     """
+        key = self._dtKey(self.timeSteps[tInd])
+
+        if adjoint and self._makeASymmetric is not True:
+            factory = lambda: self.Solver(
+                self.getAdiag(tInd).T, **self.solverOpts
+            )
+            key = ('T', key)
+        else:
+            factory = lambda: self.Solver(
+                self.getAdiag(tInd), **self.solverOpts
+            )
+
+        if self.verbose and key not in self._Adiaginv:
+            print('Factoring...   (dt = {:e})'.format(self.timeSteps[tInd]))
+        return self._Adiaginv.get(key, factory)
+
+    @property
+    def factorMemory(self):
+        """
+        Estimated memory (bytes) held by the pool of time-step factors
+        """
+        if getattr(self, '_Adiaginv', None) is None:
+            return 0
+        return self._Adiaginv.memory
+
+    def designTimeSteps(self, accuracy=0.05, factorCost=20., solveCost=1.):
+        """
+        Set :code:`t0` and :code:`timeSteps` from the waveforms of the
+        sources and the receiver times, minimizing the predicted cost
+        (nFactors * factorCost + nSteps * solveCost) of a forward for the
+        accuracy. See :code:`TimeStepsTDEM`.
+
+        :param float accuracy: relative accuracy of a step
+        :param float factorCost: cost of a factorization
+        :param float solveCost: cost of a solve
+        :rtype: SimPEG.EM.TDEM.TimeStepsTDEM.TimeStepDesign
+        :return: design, with its predicted cost
+        """
+        assert self.ispaired, 'The problem must be paired with a survey'
+        srcList = self.survey.srcList
+        design = designTimeSteps(
+            [src.waveform for src in srcList],
+            np.hstack([rx.times for src in srcList for rx in src.rxList]),
+            accuracy=accuracy, factorCost=factorCost, solveCost=solveCost
+        )
+        self.t0 = design.t0
+        self.timeSteps = design.timeSteps
+        if self.verbose:
+            design.summary()
+        return design
+
+    def _cleanAdiaginv(self):
+        # factors are only released here if they are not being cached
+        if not self.cacheFactors and getattr(self, '_Adiaginv', None) is not None:
+            self._Adiaginv.clean()
+
+    @staticmethod
+    def _srcBlock(x, nSrc):
+        # fields and solutions of a single source come back as vectors
+        if isinstance(x, Utils.Zero):
+            return x
+        return np.reshape(x, (-1, nSrc), order='F')
+
+    def _timeStep(self, tInd, u):
+        """
+        Solution of all the sources at time index tInd+1 from the solution u
+        at tInd
+        """
+        # factors are shared by all time steps with the same dt
+        Ainv = self.getAdiagInv(tInd)
+
+        rhs = self.getRHS(tInd+1)  # this is on the nodes of the time mesh
+        Asubdiag = self.getAsubdiag(tInd)
+
+        sol = Ainv * (rhs - Asubdiag * u)
+        if sol.ndim == 1:
+            sol.shape = (sol.size, 1)
+        return sol
+
+    def _receiverProjections(self, f):
+        """
+        Source index, receiver, spatial projection, time weights (as columns
+        over the time mesh) and data [nLoc x nTimes] of each receiver
+        """
+        projections = []
+        for isrc, src in enumerate(self.survey.srcList):
+            for rx in src.rxList:
+                Ps, Pt = rx.getSpaceTimeP(self.mesh, self.timeMesh, f)
+                projections.append((
+                    isrc, rx, Ps, Pt, np.zeros((Ps.shape[0], Pt.shape[0]))
+                ))
+        return projections
+
+    def _projectStep(self, f, projections, u, tInd):
+        """
+        Add the solution u [nu x nSrc] at time index tInd to the data of the
+        receivers
+        """
+        srcList = self.survey.srcList
+        fields = {}
+        for isrc, rx, Ps, Pt, data in projections:
+            start, stop = Pt.indptr[tInd], Pt.indptr[tInd+1]
+            if start == stop:
+                continue  # no receiver time uses this step
+            if rx.projField not in fields:
+                func = getattr(f, f.aliasFields[rx.projField][2])
+                fields[rx.projField] = Utils.mkvc(
+                    func(u, srcList, tInd), 2
+                ).reshape((-1, len(srcList)), order='F')
+            data[:, Pt.indices[start:stop]] += np.outer(
+                Ps * fields[rx.projField][:, isrc], Pt.data[start:stop]
+            )
+
+    def _adjointStep(self, f, projections, v, tInd):
+        """
+        Adjoint of the receivers at time index tInd applied to the data v:
+        the block [nu x nSrc] on the solution and the model part of the
+        field derivatives
+        """
+        srcList = self.survey.srcList
+        if self._fieldType in ['b', 'j']:
+            df_duT_v = np.zeros((self.mesh.nF, len(srcList)))
+        elif self._fieldType in ['e', 'h']:
+            df_duT_v = np.zeros((self.mesh.nE, len(srcList)))
+        df_dmT_v = Utils.Zero()
+
+        for isrc, rx, Ps, Pt, _ in projections:
+            start, stop = Pt.indptr[tInd], Pt.indptr[tInd+1]
+            if start == stop:
+                continue
+            src = srcList[isrc]
+            V = Utils.mkvc(v[src, rx]).reshape((Ps.shape[0], -1), order='F')
+            PT_v = Ps.T * V[:, Pt.indices[start:stop]].dot(
+                Pt.data[start:stop]
+            )
+
+            df_duTFun = getattr(f, '_{}Deriv'.format(rx.projField), None)
+            cur = df_duTFun(tInd, src, None, PT_v, adjoint=True)
+            if not isinstance(cur[0], Utils.Zero):
+                df_duT_v[:, isrc] = df_duT_v[:, isrc] + Utils.mkvc(cur[0])
+            df_dmT_v = cur[1] + df_dmT_v
+
+        return df_duT_v, df_dmT_v
 
     def fields(self, m):
         """
         Solve the forward problem for the fields.
 
+        With :code:`maxStoredSteps`, the solution is only stored at
+        checkpoints (see :code:`CheckpointedSolution`), and the data are
+        projected on the receivers as the time stepping goes
+        (:code:`f.projectedData`).
+
         :param numpy.ndarray m: inversion model (nP,)
         :rtype: SimPEG.EM.TDEM.FieldsTDEM
         :return f: fields object
         """
 
         tic = time.time()
-        self.model = m
+        if m is not None or self.model is not None:
+            # no model with the physical properties set directly
+            self.model = m
+        ftype = self._fieldType + 'Solution'
 
         f = self.fieldsPair(self.mesh, self.survey)
 
+        projections = None
+        if self.maxStoredSteps is not None:
+            f._fields[ftype] = CheckpointedSolution(
+                self, f._storageShape(f.knownFields[ftype]),
+                self.maxStoredSteps
+            )
+            projections = self._receiverProjections(f)
+
         # set initial fields
-        f[:, self._fieldType+'Solution', 0] = self.getInitialFields()
+        u = self.getInitialFields()
+        f[:, ftype, 0] = u
+        if projections is not None:
+            self._projectStep(f, projections, u, 0)
 
         if self.verbose:
             print('{}\nCalculating fields(m)\n{}'.format('*'*50, '*'*50))
 
         # timestep to solve forward
-        Ainv = None
         for tInd, dt in enumerate(self.timeSteps):
-            # keep factors if dt is the same as previous step b/c A will be the
-            # same
-            if Ainv is not None and (
-                tInd > 0 and abs(dt-self.timeSteps[tInd - 1]) >
-                self.dt_threshold
-            ):
-                Ainv.clean()
-                Ainv = None
-
-            if Ainv is None:
-                A = self.getAdiag(tInd)
-                if self.verbose:
-                    print('Factoring...   (dt = {:e})'.format(dt))
-                Ainv = self.Solver(A, **self.solverOpts)
-                if self.verbose:
-                    print('Done')
-
-            rhs = self.getRHS(tInd+1)  # this is on the nodes of the time mesh
-            Asubdiag = self.getAsubdiag(tInd)
 
             if self.verbose:
                 print('    Solving...   (tInd = {:d})'.format(tInd+1))
 
             # taking a step
-            sol = Ainv * (
-                rhs - Asubdiag * f[:, (self._fieldType + 'Solution'), tInd]
-            )
+            u = self._timeStep(tInd, u)
 
             if self.verbose:
                 print('    Done...')
 
-            if sol.ndim == 1:
-                sol.shape = (sol.size, 1)
-            f[:, self._fieldType+'Solution', tInd+1] = sol
+            f[:, ftype, tInd+1] = u
+            if projections is not None:
+                self._projectStep(f, projections, u, tInd+1)
+
+        if projections is not None:
+            f.projectedData = np.hstack([
+                Utils.mkvc(data) for _, _, _, _, data in projections
+            ])
 
         if self.verbose:
             print('{}\nDone calculating fields(m)\n{}'.format('*'*50, '*'*50))
 
-        # clean factors and return
-        Ainv.clean()
+        # clean factors (if not cached) and return
+        self._cleanAdiaginv()
         return f
 
+    def fields_nostore(self, m):
+        """
+        Solve the forward problem without storing fields.
+
+        The solution of each time step is projected on the receivers with
+        their spatial projection and time interpolation weights as the time
+        stepping goes, so only the current and previous steps are kept in
+        memory. The data are in the order of :code:`survey.dpred`.
+
+        :param numpy.ndarray m: inversion model (nP,)
+        :rtype: numpy.ndarray
+        :return numpy.ndarray: numpy.ndarray (nD,)
+        """
+
+        if m is not None or self.model is not None:
+            # no model with the physical properties set directly
+            self.model = m
+
+        # the alias functions of the fields, nothing is stored in it
+        f = self.fieldsPair(self.mesh, self.survey)
+        projections = self._receiverProjections(f)
+
+        if self.verbose:
+            print('{}\nCalculating data(m)\n{}'.format('*'*50, '*'*50))
+
+        u = self.getInitialFields()
+        self._projectStep(f, projections, u, 0)
+
+        for tInd in range(self.nT):
+            # the previous step is only needed for this one
+            u = self._timeStep(tInd, u)
+            self._projectStep(f, projections, u, tInd+1)
+
+        if self.verbose:
+            print('{}\nDone calculating data(m)\n{}'.format('*'*50, '*'*50))
+
+        self._cleanAdiaginv()
+        return np.hstack([
+            Utils.mkvc(data) for _, _, _, _, data in projections
+        ])
+
     def Jvec(self, m, v, f=None):
         """
         Jvec computes the sensitivity times a vector
@@ -147,19 +357,22 @@ class BaseTDEMProblem(Problem.BaseTimeProblem, BaseEMProblem):
         # store the field derivs we need to project to calc full deriv
         df_dm_v = self.Fields_Derivs(self.mesh, self.survey)
 
-        Adiaginv = None
+        # time steps with nonzero time weights of the receivers (footprint)
+        footprints = {}
+        for src in self.survey.srcList:
+            for rx in src.rxList:
+                _, Pt = rx.getSpaceTimeP(self.mesh, self.timeMesh, f)
+                needed = footprints.setdefault(
+                    (src, rx.projField), np.zeros(self.nT+1, dtype=bool)
+                )
+                needed[rx.timeFootprint(Pt)] = True
+        for _, projField in footprints:
+            df_dm_v[:, '{}Deriv'.format(projField), :] = 0.
 
+        nSrc = len(self.survey.srcList)
         for tInd, dt in zip(range(self.nT), self.timeSteps):
-            # keep factors if dt is the same as previous step b/c A will be the
-            # same
-            if Adiaginv is not None and (tInd > 0 and dt !=
-                                         self.timeSteps[tInd - 1]):
-                Adiaginv.clean()
-                Adiaginv = None
-
-            if Adiaginv is None:
-                A = self.getAdiag(tInd)
-                Adiaginv = self.Solver(A, **self.solverOpts)
+            # factors are shared by all time steps with the same dt
+            Adiaginv = self.getAdiagInv(tInd)
 
             Asubdiag = self.getAsubdiag(tInd)
 
@@ -167,33 +380,37 @@ class BaseTDEMProblem(Problem.BaseTimeProblem, BaseEMProblem):
 
                 # here, we are lagging by a timestep, so filling in as we go
                 for projField in set([rx.projField for rx in src.rxList]):
+                    # df_dm_v is dense, but we only need the times in the
+                    # footprint of the receivers
+                    if not footprints[(src, projField)][tInd]:
+                        continue
                     df_dmFun = getattr(f, '_%sDeriv' % projField, None)
-                    # df_dm_v is dense, but we only need the times at
-                    # (rx.P.T * ones > 0)
-                    # This should be called rx.footprint
 
                     df_dm_v[src, '{}Deriv'.format(projField), tInd] = df_dmFun(
                         tInd, src, dun_dm_v[:, i], v
                         )
 
-                un_src = f[src, ftype, tInd+1]
+            # the derivatives and the step are taken for all the sources at
+            # once, on blocks [nu x nSrc]
+            un = self._srcBlock(f[:, ftype, tInd+1], nSrc)
 
-                # cell centered on time mesh
-                dA_dm_v = self.getAdiagDeriv(tInd, un_src, v)
-                # on nodes of time mesh
-                dRHS_dm_v = self.getRHSDeriv(tInd+1, src, v)
+            # cell centered on time mesh
+            dA_dm_v = self.getAdiagDeriv(tInd, un, v)
+            # on nodes of time mesh
+            dRHS_dm_v = self.getRHSDeriv(tInd+1, self.survey.srcList, v)
 
-                dAsubdiag_dm_v = self.getAsubdiagDeriv(
-                    tInd, f[src, ftype, tInd], v
-                )
+            dAsubdiag_dm_v = self.getAsubdiagDeriv(
+                tInd, self._srcBlock(f[:, ftype, tInd], nSrc), v
+            )
 
-                JRHS = dRHS_dm_v - dAsubdiag_dm_v - dA_dm_v
+            JRHS = self._srcBlock(
+                dRHS_dm_v - dAsubdiag_dm_v - dA_dm_v, nSrc
+            )
 
-                # step in time and overwrite
-                if tInd != len(self.timeSteps+1):
-                    dun_dm_v[:, i] = Adiaginv * (
-                        JRHS - Asubdiag * dun_dm_v[:, i]
-                    )
+            # step in time and overwrite
+            dun_dm_v = self._srcBlock(
+                Adiaginv * (JRHS - Asubdiag * dun_dm_v), nSrc
+            )
 
         Jv = []
         for src in self.survey.srcList:
@@ -204,7 +421,7 @@ class BaseTDEMProblem(Problem.BaseTimeProblem, BaseEMProblem):
                         )
                     )
                 )
-        Adiaginv.clean()
+        self._cleanAdiaginv()
         # del df_dm_v, dun_dm_v, Asubdiag
         # return Utils.mkvc(Jv)
         return np.hstack(Jv)
@@ -239,116 +456,58 @@ class BaseTDEMProblem(Problem.BaseTimeProblem, BaseEMProblem):
         if not isinstance(v, self.dataPair):
             v = self.dataPair(self.survey, v)
 
-        df_duT_v = self.Fields_Derivs(self.mesh, self.survey)
-
-        # same size as fields at a single timestep
-        ATinv_df_duT_v = np.zeros(
-            (
-                len(self.survey.srcList),
-                len(f[self.survey.srcList[0], ftype, 0])
-            ),
-            dtype=float
-        )
-        JTv = np.zeros(m.shape, dtype=float)
-
-        # Loop over sources and receivers to create a fields object:
-        # PT_v, df_duT_v, df_dmT_v
-        # initialize storage for PT_v (don't need to preserve over sources)
-        PT_v = self.Fields_Derivs(self.mesh, self.survey)
-        for src in self.survey.srcList:
-            # Looping over initializing field class is appending memory!
-            # PT_v = Fields_Derivs(self.mesh, self.survey) # initialize storage
-            # #for PT_v (don't need to preserve over sources)
-            # initialize size
-            df_duT_v[src, '{}Deriv'.format(self._fieldType), :] = (
-                np.zeros_like(f[src, self._fieldType, :])
-            )
-
-            for rx in src.rxList:
-                PT_v[src, '{}Deriv'.format(rx.projField), :] = rx.evalDeriv(
-                    src, self.mesh, self.timeMesh, f, Utils.mkvc(v[src, rx]),
-                    adjoint=True
-                ) # this is +=
-
-                # PT_v = np.reshape(curPT_v,(len(curPT_v)/self.timeMesh.nN,
-                # self.timeMesh.nN), order='F')
-                df_duTFun = getattr(f, '_{}Deriv'.format(rx.projField), None)
-
-                for tInd in range(self.nT+1):
-                    cur = df_duTFun(
-                        tInd, src, None, Utils.mkvc(
-                            PT_v[src, '{}Deriv'.format(rx.projField), tInd]
-                        ),
-                        adjoint=True
-                    )
-
-                    df_duT_v[src, '{}Deriv'.format(self._fieldType), tInd] = (
-                        df_duT_v[src, '{}Deriv'.format(self._fieldType), tInd] +
-                        Utils.mkvc(cur[0], 2))
-                    JTv = cur[1] + JTv
-
-        del PT_v # no longer need this
-
-        AdiagTinv = None
+        # the adjoint sources of the receivers are formed at each time step
+        # of the back-solve, so no derivative is stored over time
+        projections = self._receiverProjections(f)
+        df_duT_v, df_dmT_v = self._adjointStep(f, projections, v, self.nT)
+        JTv = df_dmT_v + np.zeros(m.shape, dtype=float)
 
         # Do the back-solve through time
-        # if the previous timestep is the same: no need to refactor the matrix
-        # for tInd, dt in zip(range(self.nT), self.timeSteps):
+        # the (symmetric) factors are shared with the forward solves
 
+        nSrc = len(self.survey.srcList)
         for tInd in reversed(range(self.nT)):
-            # tInd = tIndP - 1
-            if AdiagTinv is not None and (
-                tInd <= self.nT and
-                self.timeSteps[tInd] != self.timeSteps[tInd+1]
-            ):
-                AdiagTinv.clean()
-                AdiagTinv = None
-
-            # refactor if we need to
-            if AdiagTinv is None:  # and tInd > -1:
-                Adiag = self.getAdiag(tInd)
-                AdiagTinv = self.Solver(Adiag.T, **self.solverOpts)
-
-            if tInd < self.nT - 1:
-                Asubdiag = self.getAsubdiag(tInd+1)
+            AdiagTinv = self.getAdiagInv(tInd, adjoint=True)
 
-            for isrc, src in enumerate(self.survey.srcList):
+            # solve against df_duT_v, for all the sources at once
+            if tInd >= self.nT-1:
+                # last timestep (first to be solved)
+                ATinv_df_duT_v = AdiagTinv * df_duT_v
+            else:
+                Asubdiag = self.getAsubdiag(tInd+1)
+                ATinv_df_duT_v = AdiagTinv * (
+                    df_duT_v - Asubdiag.T * ATinv_df_duT_v
+                )
+            ATinv_df_duT_v = self._srcBlock(ATinv_df_duT_v, nSrc)
 
-                # solve against df_duT_v
-                if tInd >= self.nT-1:
-                    # last timestep (first to be solved)
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * df_duT_v[
-                        src, '{}Deriv'.format(self._fieldType), tInd+1
-                    ]
-                elif tInd > -1:
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * (
-                        Utils.mkvc(df_duT_v[
-                            src, '{}Deriv'.format(self._fieldType), tInd+1
-                        ]) - Asubdiag.T * Utils.mkvc(ATinv_df_duT_v[isrc, :]))
+            # derivatives summed over the sources
+            dAsubdiagT_dm_v = self.getAsubdiagDeriv(
+                tInd, self._srcBlock(f[:, ftype, tInd], nSrc), ATinv_df_duT_v,
+                adjoint=True
+            )
 
-                dAsubdiagT_dm_v = self.getAsubdiagDeriv(
-                    tInd, f[src, ftype, tInd], ATinv_df_duT_v[isrc, :],
-                    adjoint=True)
+            dRHST_dm_v = self.getRHSDeriv(
+                tInd+1, self.survey.srcList, ATinv_df_duT_v, adjoint=True
+            )  # on nodes of time mesh
 
-                dRHST_dm_v = self.getRHSDeriv(
-                    tInd+1, src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )  # on nodes of time mesh
+            # cell centered on time mesh
+            dAT_dm_v = self.getAdiagDeriv(
+                tInd, self._srcBlock(f[:, ftype, tInd+1], nSrc),
+                ATinv_df_duT_v, adjoint=True
+            )
 
-                un_src = f[src, ftype, tInd+1]
-                # cell centered on time mesh
-                dAT_dm_v = self.getAdiagDeriv(
-                    tInd, un_src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )
+            JTv = JTv + Utils.mkvc(
+                -dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v
+            )
 
-                JTv = JTv + Utils.mkvc(
-                    -dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v
-                )
+            # adjoint sources of the previous time step
+            df_duT_v, df_dmT_v = self._adjointStep(f, projections, v, tInd)
+            JTv = df_dmT_v + JTv
 
         # Treat the initial condition
 
         # del df_duT_v, ATinv_df_duT_v, A, Asubdiag
-        if AdiagTinv is not None:
-            AdiagTinv.clean()
+        self._cleanAdiaginv()
 
         return Utils.mkvc(JTv).astype(float)
 
@@ -599,42 +758,69 @@ class Problem3D_b(BaseTDEMProblem):
 
     def getRHSDeriv(self, tInd, src, v, adjoint=False):
         """
-        Derivative of the RHS
+        Derivative of the RHS. For a list of sources, the derivative is a
+        block [nF x nSrc] and, in the adjoint, v is a block [nF x nSrc] and
+        the derivatives are summed over the sources.
         """
+        if not isinstance(src, list):
+            RHSDeriv = self.getRHSDeriv(
+                tInd, [src], Utils.mkvc(v, 2) if adjoint else v, adjoint
+            )
+            if adjoint or isinstance(RHSDeriv, Utils.Zero):
+                return RHSDeriv
+            return Utils.mkvc(RHSDeriv)
 
         C = self.mesh.edgeCurl
         MeSigmaI = self.MeSigmaI
 
         MfMui = self.MfMui
 
-        _, s_e = src.eval(self, self.times[tInd])
-        s_mDeriv, s_eDeriv = src.evalDeriv(
-            self, self.times[tInd], adjoint=adjoint
-        )
+        srcList = src
+        time = self.times[tInd]
+
+        s_e = [src.eval(self, time)[1] for src in srcList]
+        if all(isinstance(s_ei, Utils.Zero) for s_ei in s_e):
+            s_e = Utils.Zero()
+        else:
+            s_e = np.vstack([
+                s_ei + np.zeros(self.mesh.nE) for s_ei in s_e
+            ]).T
+        srcDerivs = [
+            src.evalDeriv(self, time, adjoint=adjoint) for src in srcList
+        ]
 
         if adjoint:
             if self._makeASymmetric is True:
                 v = self.MfMui * v
             if isinstance(s_e, Utils.Zero):
-                MeSigmaIDerivT_v = Utils.Zero()
+                RHSDeriv = Utils.Zero()
             else:
-                MeSigmaIDerivT_v = self.MeSigmaIDeriv(s_e, C.T * v, adjoint)
+                RHSDeriv = Utils.mkvc(self.MeSigmaIDeriv(s_e, C.T * v, adjoint))
 
-            RHSDeriv = (
-                MeSigmaIDerivT_v + s_eDeriv( MeSigmaI.T * (C.T * v)) +
-                s_mDeriv(v)
-            )
+            MeSigmaIT_CT_v = MeSigmaI.T * (C.T * v)
+            for i, (s_mDeriv, s_eDeriv) in enumerate(srcDerivs):
+                RHSDeriv = (
+                    RHSDeriv + s_eDeriv(MeSigmaIT_CT_v[:, i]) +
+                    s_mDeriv(v[:, i])
+                )
 
             return RHSDeriv
 
         if isinstance(s_e, Utils.Zero):
-            MeSigmaIDeriv_v = Utils.Zero()
+            RHSDeriv = Utils.Zero()
         else:
-            MeSigmaIDeriv_v = self.MeSigmaIDeriv(s_e, v, adjoint)
+            RHSDeriv = self._srcBlock(
+                C * self.MeSigmaIDeriv(s_e, v, adjoint), len(srcList)
+            )
 
-        RHSDeriv = (
-            C * MeSigmaIDeriv_v + C * MeSigmaI * s_eDeriv(v) + s_mDeriv(v)
-        )
+        # model dependent source terms, column by column
+        for i, (s_mDeriv, s_eDeriv) in enumerate(srcDerivs):
+            srcDeriv = C * (MeSigmaI * s_eDeriv(v)) + s_mDeriv(v)
+            if isinstance(srcDeriv, Utils.Zero):
+                continue
+            if isinstance(RHSDeriv, Utils.Zero):
+                RHSDeriv = np.zeros((self.mesh.nF, len(srcList)))
+            RHSDeriv[:, i] = RHSDeriv[:, i] + srcDeriv
 
         if self._makeASymmetric is True:
             return self.MfMui.T * RHSDeriv
@@ -704,113 +890,53 @@ class Problem3D_e(BaseTDEMProblem):
         if not isinstance(v, self.dataPair):
             v = self.dataPair(self.survey, v)
 
-        df_duT_v = self.Fields_Derivs(self.mesh, self.survey)
-
-        # same size as fields at a single timestep
-        ATinv_df_duT_v = np.zeros(
-            (
-                len(self.survey.srcList),
-                len(f[self.survey.srcList[0], ftype, 0])
-            ),
-            dtype=float
-        )
-        JTv = np.zeros(m.shape, dtype=float)
-
-        # Loop over sources and receivers to create a fields object:
-        # PT_v, df_duT_v, df_dmT_v
-        # initialize storage for PT_v (don't need to preserve over sources)
-        PT_v = self.Fields_Derivs(self.mesh, self.survey)
-        for src in self.survey.srcList:
-            # Looping over initializing field class is appending memory!
-            # PT_v = Fields_Derivs(self.mesh, self.survey) # initialize storage
-            # #for PT_v (don't need to preserve over sources)
-            # initialize size
-            df_duT_v[src, '{}Deriv'.format(self._fieldType), :] = (
-                np.zeros_like(f[src, self._fieldType, :])
-            )
-
-            for rx in src.rxList:
-                PT_v[src, '{}Deriv'.format(rx.projField), :] = rx.evalDeriv(
-                    src, self.mesh, self.timeMesh, f, Utils.mkvc(v[src, rx]),
-                    adjoint=True
-                )
-                # this is +=
-
-                # PT_v = np.reshape(curPT_v,(len(curPT_v)/self.timeMesh.nN,
-                # self.timeMesh.nN), order='F')
-                df_duTFun = getattr(f, '_{}Deriv'.format(rx.projField), None)
-
-                for tInd in range(self.nT+1):
-                    cur = df_duTFun(
-                        tInd, src, None, Utils.mkvc(
-                            PT_v[src, '{}Deriv'.format(rx.projField), tInd]
-                        ),
-                        adjoint=True
-                    )
-
-                    df_duT_v[src, '{}Deriv'.format(self._fieldType), tInd] = (
-                        df_duT_v[src, '{}Deriv'.format(self._fieldType), tInd]
-                        + Utils.mkvc(cur[0], 2)
-                        )
-                    JTv = cur[1] + JTv
-
-        # no longer need this
-        del PT_v
-
-        AdiagTinv = None
+        # the adjoint sources of the receivers are formed at each time step
+        # of the back-solve, so no derivative is stored over time
+        projections = self._receiverProjections(f)
+        df_duT_v, df_dmT_v = self._adjointStep(f, projections, v, self.nT)
+        JTv = df_dmT_v + np.zeros(m.shape, dtype=float)
 
         # Do the back-solve through time
-        # if the previous timestep is the same: no need to refactor the matrix
-        # for tInd, dt in zip(range(self.nT), self.timeSteps):
+        # the (symmetric) factors are shared with the forward solves
 
+        nSrc = len(self.survey.srcList)
         for tInd in reversed(range(self.nT)):
-            # tInd = tIndP - 1
-            if AdiagTinv is not None and (
-                tInd <= self.nT and
-                self.timeSteps[tInd] != self.timeSteps[tInd+1]
-            ):
-                AdiagTinv.clean()
-                AdiagTinv = None
-
-            # refactor if we need to
-            if AdiagTinv is None:  # and tInd > -1:
-                Adiag = self.getAdiag(tInd)
-                AdiagTinv = self.Solver(Adiag.T, **self.solverOpts)
-
-            if tInd < self.nT - 1:
-                Asubdiag = self.getAsubdiag(tInd+1)
+            AdiagTinv = self.getAdiagInv(tInd, adjoint=True)
 
-            for isrc, src in enumerate(self.survey.srcList):
+            # solve against df_duT_v, for all the sources at once
+            if tInd >= self.nT-1:
+                # last timestep (first to be solved)
+                ATinv_df_duT_v = AdiagTinv * df_duT_v
+            else:
+                Asubdiag = self.getAsubdiag(tInd+1)
+                ATinv_df_duT_v = AdiagTinv * (
+                    df_duT_v - Asubdiag.T * ATinv_df_duT_v
+                )
+            ATinv_df_duT_v = self._srcBlock(ATinv_df_duT_v, nSrc)
 
-                # solve against df_duT_v
-                if tInd >= self.nT-1:
-                    # last timestep (first to be solved)
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * df_duT_v[
-                        src, '{}Deriv'.format(self._fieldType), tInd+1]
-                elif tInd > -1:
-                    ATinv_df_duT_v[isrc, :] = AdiagTinv * (
-                        Utils.mkvc(df_duT_v[
-                            src, '{}Deriv'.format(self._fieldType), tInd+1
-                        ]
-                        ) - Asubdiag.T * Utils.mkvc(ATinv_df_duT_v[isrc, :]))
+            # derivatives summed over the sources
+            dAsubdiagT_dm_v = self.getAsubdiagDeriv(
+                tInd, self._srcBlock(f[:, ftype, tInd], nSrc), ATinv_df_duT_v,
+                adjoint=True
+            )
 
-                dAsubdiagT_dm_v = self.getAsubdiagDeriv(
-                    tInd, f[src, ftype, tInd], ATinv_df_duT_v[isrc, :],
-                    adjoint=True)
+            dRHST_dm_v = self.getRHSDeriv(
+                tInd+1, self.survey.srcList, ATinv_df_duT_v, adjoint=True
+            )  # on nodes of time mesh
 
-                dRHST_dm_v = self.getRHSDeriv(
-                        tInd+1, src, ATinv_df_duT_v[isrc, :], adjoint=True
-                        )  # on nodes of time mesh
+            # cell centered on time mesh
+            dAT_dm_v = self.getAdiagDeriv(
+                tInd, self._srcBlock(f[:, ftype, tInd+1], nSrc),
+                ATinv_df_duT_v, adjoint=True
+            )
 
-                un_src = f[src, ftype, tInd+1]
-                # cell centered on time mesh
-                dAT_dm_v = self.getAdiagDeriv(
-                    tInd, un_src, ATinv_df_duT_v[isrc, :], adjoint=True
-                )
+            JTv = JTv + Utils.mkvc(
+                -dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v
+            )
 
-                JTv = JTv + Utils.mkvc(
-                    -dAT_dm_v - dAsubdiagT_dm_v + dRHST_dm_v
-                )
+            # adjoint sources of the previous time step
+            df_duT_v, df_dmT_v = self._adjointStep(f, projections, v, tInd)
+            JTv = df_dmT_v + JTv
 
         # Treating initial condition when a galvanic source is included
         tInd = -1
@@ -819,22 +945,20 @@ class Problem3D_e(BaseTDEMProblem):
         for isrc, src in enumerate(self.survey.srcList):
             if src.srcType == "galvanic":
 
-                ATinv_df_duT_v[isrc, :] = Grad*(self.Adcinv*(Grad.T*(
-                    Utils.mkvc(df_duT_v[
-                        src, '{}Deriv'.format(self._fieldType), tInd+1
-                    ]
-                    ) - Asubdiag.T * Utils.mkvc(ATinv_df_duT_v[isrc, :]))
-                ))
+                ATinv_df_duT_v[:, isrc] = Grad*(self.Adcinv*(Grad.T*(
+                    df_duT_v[:, isrc] -
+                    Asubdiag.T * Utils.mkvc(ATinv_df_duT_v[:, isrc])
+                )))
 
                 dRHST_dm_v = self.getRHSDeriv(
-                        tInd+1, src, ATinv_df_duT_v[isrc, :], adjoint=True
+                        tInd+1, src, ATinv_df_duT_v[:, isrc], adjoint=True
                         )  # on nodes of time mesh
 
                 un_src = f[src, ftype, tInd+1]
                 # cell centered on time mesh
                 dAT_dm_v = (
                     self.MeSigmaDeriv(
-                        un_src, ATinv_df_duT_v[isrc, :], adjoint=True
+                        un_src, ATinv_df_duT_v[:, isrc], adjoint=True
                     )
                 )
 
@@ -843,8 +967,7 @@ class Problem3D_e(BaseTDEMProblem):
                 )
 
         # del df_duT_v, ATinv_df_duT_v, A, Asubdiag
-        if AdiagTinv is not None:
-            AdiagTinv.clean()
+        self._cleanAdiaginv()
 
         return Utils.mkvc(JTv).astype(float)
 
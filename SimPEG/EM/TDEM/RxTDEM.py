@@ -1,5 +1,6 @@
 import SimPEG
 from SimPEG import Utils
+import numpy as np
 import scipy.sparse as sp
 
 
@@ -71,6 +72,30 @@ class BaseRx(SimPEG.Survey.BaseTimeRx):
 
         return P
 
+    def getSpaceTimeP(self, mesh, timeMesh, f):
+        """
+            Returns the spatial and time projection matrices (Ps, Pt), applied
+            separably on the (nGrid x nT+1) field of a source as
+            :code:`Ps * u * Pt.T`. kron(Pt, Ps) is never formed.
+
+            .. note::
+
+                Projection matrices are stored as a dictionary (mesh, timeMesh) if storeProjections is True
+        """
+        key = (mesh, timeMesh, 'separable')
+        if key in self._Ps:
+            return self._Ps[key]
+
+        P = (
+            self.getSpatialP(mesh, f),
+            sp.csc_matrix(self.getTimeP(timeMesh, f))
+        )
+
+        if self.storeProjections:
+            self._Ps[key] = P
+
+        return P
+
     def getTimeP(self, timeMesh, f):
         """
             Returns the time projection matrix.
@@ -86,6 +111,16 @@ class BaseRx(SimPEG.Survey.BaseTimeRx):
         # else:
         return timeMesh.getInterpolationMat(self.times, self.projTLoc(f))
 
+    def _evalField(self, src, mesh, timeMesh, f, projField):
+        # only the time steps with nonzero time weights are evaluated
+        Ps, Pt = self.getSpaceTimeP(mesh, timeMesh, f)
+        tInds = self.timeFootprint(Pt)
+        if tInds.stop == tInds.start:
+            return np.zeros(self.nD)
+
+        u = f[src, projField, tInds].reshape((Ps.shape[1], -1), order='F')
+        return Utils.mkvc((Pt[:, tInds] * (Ps * u).T).T)
+
     def eval(self, src, mesh, timeMesh, f):
         """
         Project fields to receivers to get data.
@@ -97,9 +132,7 @@ class BaseRx(SimPEG.Survey.BaseTimeRx):
         :return: fields projected to recievers
         """
 
-        P = self.getP(mesh, timeMesh, f)
-        f_part = Utils.mkvc(f[src, self.projField, :])
-        return P*f_part
+        return self._evalField(src, mesh, timeMesh, f, self.projField)
 
     def evalDeriv(self, src, mesh, timeMesh, f, v, adjoint=False):
         """
@@ -114,13 +147,17 @@ class BaseRx(SimPEG.Survey.BaseTimeRx):
         :return: fields projected to recievers
         """
 
-        P = self.getP(mesh, timeMesh, f)
+        Ps, Pt = self.getSpaceTimeP(mesh, timeMesh, f)
+        tInds = self.timeFootprint(Pt)
         if not adjoint:
-            return P * v # Utils.mkvc(v[src, self.projField+'Deriv', :])
+            # v is the (nGrid x nT+1) field deriv, flattened
+            V = np.reshape(v, (Ps.shape[1], Pt.shape[1]), order='F')
+            return Utils.mkvc((Pt[:, tInds] * (Ps * V[:, tInds]).T).T)
         elif adjoint:
-            # dP_dF_T = P.T * v #[src, self]
-            # newshape = (len(dP_dF_T)/timeMesh.nN, timeMesh.nN )
-            return P.T * v # np.reshape(dP_dF_T, newshape, order='F')
+            V = np.reshape(v, (Ps.shape[0], Pt.shape[0]), order='F')
+            PT_v = np.zeros((Ps.shape[1], Pt.shape[1]))
+            PT_v[:, tInds] = Ps.T * (Pt[:, tInds].T * V.T).T
+            return Utils.mkvc(PT_v)
 
 
 class Point_e(BaseRx):
@@ -169,9 +206,7 @@ class Point_dbdt(BaseRx):
         if self.projField in f.aliasFields:
             return super(Point_dbdt, self).eval(src, mesh, timeMesh, f)
 
-        P = self.getP(mesh, timeMesh, f)
-        f_part = Utils.mkvc(f[src, 'b', :])
-        return P*f_part
+        return self._evalField(src, mesh, timeMesh, f, 'b')
 
     def projGLoc(self, f):
         """Grid Location projection (e.g. Ex Fy ...)"""
@@ -26,6 +26,11 @@ class Survey(SimPEG.Survey.BaseSurvey):
         SimPEG.Survey.BaseSurvey.__init__(self, **kwargs)
 
     def eval(self, u):
+        # data projected during a checkpointed forward
+        projectedData = getattr(u, 'projectedData', None)
+        if projectedData is not None and projectedData.size == self.nD:
+            return SimPEG.Survey.Data(self, projectedData)
+
         data = SimPEG.Survey.Data(self)
         for src in self.srcList:
             for rx in src.rxList:
@@ -0,0 +1,232 @@
+"""
+Automatic design of the time steps of the TDEM problems.
+
+Backward Euler is first order: after a change in the slope of the waveform
+(a breakpoint) at t_b, the fields diffuse on the time scale t - t_b, and a
+step dt has a relative error of about dt / (t - t_b). The steps are thus
+bounded by
+
+    dt(t) <= accuracy * max(t - t_b, floor_b)
+
+where the floor resolves the first receiver time (or the length of the
+waveform segment) after the breakpoint.
+
+Each distinct dt costs a factorization of the system and each step a
+solve. The steps are taken from a geometric family dt_0 * r**k, the
+largest allowed one at each step, and the ratio r and the members of the
+family are chosen to minimize
+
+    nFactors * factorCost + nSteps * solveCost
+"""
+from __future__ import division, print_function
+
+import numpy as np
+
+#: ratios of the geometric families of dt tried by the design
+RATIOS = [1.5, 2., 3., 5., 10.]
+
+
+def _breakpoints(waveform, nSample=2001):
+    """
+    Times at which the slope of the waveform changes
+    """
+    if (
+        getattr(waveform, 'ramp_on', None) is not None and
+        getattr(waveform, 'ramp_off', None) is not None
+    ):
+        return list(waveform.ramp_on) + list(waveform.ramp_off)
+    if getattr(waveform, 'peakTime', None) is not None:
+        return [0., waveform.peakTime, waveform.offTime]
+    if getattr(waveform, 'waveFct', None) is None:
+        return [0., waveform.offTime]
+
+    # raw waveforms: kinks of the waveform sampled until it is off
+    times = np.linspace(0., waveform.offTime, nSample)
+    values = np.array([waveform.eval(t) for t in times])
+    slope = np.diff(values)
+    kinks = times[np.where(
+        np.abs(np.diff(slope)) > 0.1*max(np.abs(slope).max(), 1e-300)
+    )[0] + 1]
+
+    # one breakpoint per kink, a sample apart from the others at least
+    breaks = [0., waveform.offTime]
+    for kink in kinks:
+        if np.abs(np.array(breaks) - kink).min() > 2.*times[1]:
+            breaks.append(kink)
+    return breaks
+
+
+def _floors(breaks, times, tEnd, accuracy):
+    """
+    Smallest steps after each breakpoint
+    """
+    floors = []
+    for ii, tb in enumerate(breaks):
+        stop = breaks[ii+1] if ii+1 < len(breaks) else tEnd
+        scales = [stop - tb] + list(times[times > tb] - tb)
+        floors.append(accuracy*min(scale for scale in scales if scale > 0))
+    return np.array(floors)
+
+
+def _march(breaks, floors, tEnd, levels, accuracy, maxSteps=np.inf):
+    """
+    Steps taking the largest allowed of the levels, None if there are more
+    than maxSteps
+    """
+    steps = []
+    t = breaks[0]
+    for ii in range(len(breaks)):
+        last = ii + 1 == len(breaks)
+        stop = tEnd if last else breaks[ii+1]
+        start = t  # breakpoints are on the nearest node
+        # the last segment covers the last receiver time
+        while (t < stop) if last else (stop - t > 0.5*levels[0]):
+            allowed = max(accuracy*(t - start), floors[ii])
+            if not last:
+                allowed = min(allowed, stop - t)
+            ind = np.searchsorted(levels, allowed*(1. + 1e-10), side='right')
+            dt = levels[max(ind - 1, 0)]
+            steps.append(dt)
+            t += dt
+            if len(steps) > maxSteps:
+                return None
+    return np.array(steps)
+
+
+def designTimeSteps(
+    waveforms, times, accuracy=0.05, factorCost=20., solveCost=1.
+):
+    """
+    TimeStepDesign of the steps covering the receiver times that minimizes
+    the predicted cost for the accuracy, see :code:`TimeStepsTDEM`
+
+    ::
+
+        design = designTimeSteps(StepOffWaveform(), rx.times, accuracy=0.05)
+        prob.t0, prob.timeSteps = design.t0, design.timeSteps
+        design.summary()
+
+    :param waveforms: waveform or list of the waveforms of the sources
+    :param numpy.ndarray times: receiver times
+    :param float accuracy: relative accuracy of a step
+    :param float factorCost: cost of a factorization
+    :param float solveCost: cost of a solve
+    :rtype: TimeStepDesign
+    """
+    if not isinstance(waveforms, (list, tuple)):
+        waveforms = [waveforms]
+    times = np.unique(np.asarray(times, dtype=float))
+    tEnd = times.max()
+
+    breaks = np.unique(np.hstack([
+        _breakpoints(waveform) for waveform in waveforms
+    ]))
+    breaks = breaks[breaks < tEnd]
+    assert breaks.size > 0, 'The receiver times must follow the waveform'
+
+    floors = _floors(breaks, times, tEnd, accuracy)
+    dt0 = floors.min()
+    largest = max(accuracy*(tEnd - breaks[0]), floors.max())
+
+    def cost(steps):
+        return (
+            np.unique(steps).size*factorCost + steps.size*solveCost
+        )
+
+    def maxSteps(cost):
+        # steps beyond which a march cannot beat the cost
+        return cost / solveCost if solveCost > 0 else np.inf
+
+    best, bestCost, bestRatio = None, np.inf, None
+    for ratio in RATIOS:
+        nLevel = int(np.ceil(np.log(largest / dt0) / np.log(ratio))) + 1
+        levels = dt0*ratio**np.arange(nLevel)
+
+        steps = _march(
+            breaks, floors, tEnd, levels, accuracy, maxSteps(bestCost)
+        )
+        if steps is None:
+            continue
+        current = cost(steps)
+
+        # drop the members of the family not worth their factorization
+        improved = True
+        while improved:
+            improved = False
+            for level in np.unique(steps)[1:]:
+                trial = _march(
+                    breaks, floors, tEnd, levels[levels != level],
+                    accuracy, maxSteps(current)
+                )
+                if trial is not None and cost(trial) < current:
+                    levels = levels[levels != level]
+                    steps, current = trial, cost(trial)
+                    improved = True
+                    break
+
+        if current < bestCost:
+            best, bestCost, bestRatio = steps, current, ratio
+
+    return TimeStepDesign(
+        breaks[0], best, accuracy, factorCost, solveCost, bestRatio
+    )
+
+
+class TimeStepDesign(object):
+    """
+    Time steps of :code:`designTimeSteps` and their predicted cost
+
+    ::
+
+        prob.t0, prob.timeSteps = design.t0, design.timeSteps
+
+    """
+
+    def __init__(self, t0, steps, accuracy, factorCost, solveCost, ratio):
+        self.t0 = t0
+        self.steps = steps
+        self.accuracy = accuracy
+        self.factorCost = factorCost
+        self.solveCost = solveCost
+        self.ratio = ratio
+
+    @property
+    def timeSteps(self):
+        """
+        Steps as a list of (dt, repeat)
+        """
+        bounds = np.r_[
+            0, np.where(np.diff(self.steps) != 0)[0] + 1, self.steps.size
+        ]
+        return [
+            (self.steps[start], stop - start)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+    @property
+    def nSteps(self):
+        return self.steps.size
+
+    @property
+    def nFactors(self):
+        """
+        Number of distinct dt, i.e. factorizations
+        """
+        return np.unique(self.steps).size
+
+    @property
+    def cost(self):
+        """
+        Predicted cost of a forward: nFactors * factorCost + nSteps * solveCost
+        """
+        return self.nFactors*self.factorCost + self.nSteps*self.solveCost
+
+    def summary(self):
+        print(
+            "Time steps: {0:d} steps, {1:d} distinct dt from {2:4.2e} to "
+            "{3:4.2e} (ratio {4:g}), predicted cost {5:g} for an accuracy "
+            "of {6:g}".format(
+                self.nSteps, self.nFactors, self.steps.min(),
+                self.steps.max(), self.ratio, self.cost, self.accuracy
+            )
+        )
@@ -5,6 +5,7 @@ from .FieldsTDEM import (
     FieldsTDEM, Fields3D_b, Fields3D_e, Fields3D_h, Fields3D_j
 )
 from .SurveyTDEM import Survey
+from .TimeStepsTDEM import designTimeSteps, TimeStepDesign
 from . import SrcTDEM as Src
 from . import RxTDEM as Rx
 
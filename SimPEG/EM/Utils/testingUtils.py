@@ -12,6 +12,50 @@ MU = mu_0
 freq = 5e-1
 
 
+class CountingSolver(SolverLU):
+    """SolverLU that keeps track of the number of factorizations"""
+    nFactors = 0
+
+    def __init__(self, A, **kwargs):
+        CountingSolver.nFactors += 1
+        SolverLU.__init__(self, A, **kwargs)
+
+
+def getTDEMProblem(
+    tdemType='b', rxList=None, srcZ=(0.,),
+    timeSteps=[(1e-05, 4), (5e-05, 4), (2.5e-4, 4)]
+):
+    """
+    Small TDEM problem solved with the CountingSolver, with a MagDipole
+    source at each height of srcZ observed by the receivers of rxList
+    (a Point_b receiver by default). With timeSteps None, the time steps
+    are left to be set.
+    """
+    cs = 10.
+    h = [(cs, 2, -1.5), (cs, 2), (cs, 2, 1.5)]
+    mesh = Mesh.TensorMesh([h, h, h], 'CCC')
+
+    prb = getattr(EM.TDEM, 'Problem3D_{}'.format(tdemType))(
+        mesh, sigmaMap=Maps.ExpMap(mesh)
+    )
+    if timeSteps is not None:
+        prb.timeSteps = timeSteps
+    prb.Solver = CountingSolver
+
+    if rxList is None:
+        rxList = [
+            EM.TDEM.Rx.Point_b(
+                np.array([[5., 5., 5.]]), np.logspace(-4, -3, 5), 'z'
+            )
+        ]
+    srcList = [
+        EM.TDEM.Src.MagDipole(list(rxList), loc=np.array([0., 0., z]))
+        for z in srcZ
+    ]
+    prb.pair(EM.TDEM.Survey(srcList))
+    return prb
+
+
 def getFDEMProblem(fdemType, comp, SrcList, freq, useMu=False, verbose=False):
     cs = 10.
     ncx, ncy, ncz = 0, 0, 0
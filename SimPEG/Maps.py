@@ -22,6 +22,15 @@ from discretize.Tests import checkDerivative
 from . import Utils
 
 
+def _columns(m):
+    """
+    m as a vector, unless it holds several models in its columns
+    """
+    if np.ndim(m) == 2 and m.shape[1] > 1:
+        return m
+    return Utils.mkvc(m)
+
+
 class IdentityMap(properties.HasProperties):
     """
         SimPEG Map
@@ -48,6 +57,17 @@ class IdentityMap(properties.HasProperties):
         self.mesh = mesh
         self._nP = nP
 
+    @property
+    def supportsEnsemble(self):
+        """
+            The transform applies to models in the columns of a 2D array,
+            see :meth:`transformEnsemble`. Maps opt in with a class
+            attribute, the subclasses of IdentityMap do not by default.
+
+            :rtype: bool
+        """
+        return type(self) is IdentityMap
+
     @property
     def nP(self):
         """
@@ -120,6 +140,25 @@ class IdentityMap(properties.HasProperties):
             return sp.identity(self.nP)
         return Utils.Identity()
 
+    def transformEnsemble(self, M):
+        """
+            Transform each column of M [nP x nModels].
+
+            The columns are transformed in one call when the mapping
+            :attr:`supportsEnsemble`, one at a time otherwise.
+
+            :param numpy.ndarray M: models
+            :rtype: numpy.ndarray
+            :return: transformed models [nC x nModels]
+
+        """
+        M = np.asarray(M)
+        if self.supportsEnsemble:
+            return np.asarray(self * M)
+        return np.column_stack([
+            Utils.mkvc(np.asarray(self * M[:, ii])) for ii in range(M.shape[1])
+        ])
+
     def test(self, m=None, num=4, **kwargs):
         """Test the derivative of the mapping.
 
@@ -280,6 +319,10 @@ class ComboMap(IdentityMap):
            last dimension of the mesh."""
         return self.maps[-1].nP
 
+    @property
+    def supportsEnsemble(self):
+        return all(map_i.supportsEnsemble for map_i in self.maps)
+
     def _transform(self, m):
         for map_i in reversed(self.maps):
             m = map_i * m
@@ -317,6 +360,8 @@ class Projection(IdentityMap):
         :param numpy.ndarray index: indices to select
     """
 
+    supportsEnsemble = True
+
     def __init__(self, nP, index, **kwargs):
         assert isinstance(index, (np.ndarray, slice, list)), (
             'index must be a np.ndarray or slice, not {}'.format(type(index)))
@@ -466,6 +511,8 @@ class SurjectUnits(IdentityMap):
     #     "number of times to repeat the mapping", default=1, min=1
     # )
 
+    supportsEnsemble = True
+
     def __init__(self, indices, **kwargs):
         super(SurjectUnits, self).__init__(**kwargs)
         self.indices = indices
@@ -968,11 +1015,13 @@ class ExpMap(IdentityMap):
             \exp{m} = \exp{\log{\sigma}} = \sigma
     """
 
+    supportsEnsemble = True
+
     def __init__(self, mesh=None, nP=None, **kwargs):
         super(ExpMap, self).__init__(mesh=mesh, nP=nP, **kwargs)
 
     def _transform(self, m):
-        return np.exp(Utils.mkvc(m))
+        return np.exp(_columns(m))
 
     def inverse(self, D):
         """
@@ -1029,11 +1078,14 @@ class ReciprocalMap(IdentityMap):
             \\rho = \\frac{1}{\sigma}
 
     """
+
+    supportsEnsemble = True
+
     def __init__(self, mesh=None, nP=None, **kwargs):
         super(ReciprocalMap, self).__init__(mesh=mesh, nP=nP, **kwargs)
 
     def _transform(self, m):
-        return 1.0 / Utils.mkvc(m)
+        return 1.0 / _columns(m)
 
     def inverse(self, D):
         return 1.0 / Utils.mkvc(D)
@@ -1068,11 +1120,13 @@ class LogMap(IdentityMap):
 
     """
 
+    supportsEnsemble = True
+
     def __init__(self, mesh=None, nP=None, **kwargs):
         super(LogMap, self).__init__(mesh=mesh, nP=nP, **kwargs)
 
     def _transform(self, m):
-        return np.log(Utils.mkvc(m))
+        return np.log(_columns(m))
 
     def deriv(self, m, v=None):
         mod = Utils.mkvc(m)
@@ -1099,6 +1153,8 @@ class ChiMap(IdentityMap):
 
     """
 
+    supportsEnsemble = True
+
     def __init__(self, mesh=None, nP=None, **kwargs):
         super(ChiMap, self).__init__(mesh=mesh, nP=nP, **kwargs)
 
@@ -1123,6 +1179,8 @@ class MuRelative(IdentityMap):
         \mu(m) = \mu_0 * \mathbf{m}
     """
 
+    supportsEnsemble = True
+
     def __init__(self, mesh=None, nP=None, **kwargs):
         super(MuRelative, self).__init__(mesh=mesh, nP=nP, **kwargs)
 
@@ -1393,6 +1451,8 @@ class Mesh2Mesh(IdentityMap):
         "active indices on target mesh", dtype=bool
     )
 
+    supportsEnsemble = True
+
     def __init__(self, meshes, **kwargs):
         Utils.setKwargs(self, **kwargs)
 
@@ -0,0 +1,179 @@
+"""
+Compressed sensitivity matrix for the integral PF problems.
+
+The cells are ordered along a space-filling (Morton) curve, so that the
+smooth far-field part of each row of G varies slowly with the column index
+(within each block of columns of a component of the model, e.g. of a
+magnetization), and each row is transformed with an orthonormal Haar wavelet transform. The
+smallest coefficients of each row are dropped as long as the relative error
+(L2) of the row stays below a tolerance, and the kept coefficients are stored
+in a sparse matrix. Rows are compressed block by block as they are computed,
+so the dense G is never formed.
+"""
+from __future__ import print_function
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _haar(x):
+    """Orthonormal Haar transform along the last axis (length 2**n)"""
+    out = np.array(x, dtype=float)
+    n = out.shape[-1]
+    while n > 1:
+        a = (out[..., 0:n:2] + out[..., 1:n:2]) / np.sqrt(2.)
+        d = (out[..., 0:n:2] - out[..., 1:n:2]) / np.sqrt(2.)
+        out[..., :n//2] = a
+        out[..., n//2:n] = d
+        n //= 2
+    return out
+
+
+def _ihaar(x):
+    """Inverse of :code:`_haar`"""
+    out = np.array(x, dtype=float)
+    n, nMax = 2, out.shape[-1]
+    while n <= nMax:
+        a = out[..., :n//2].copy()
+        d = out[..., n//2:n].copy()
+        out[..., 0:n:2] = (a + d) / np.sqrt(2.)
+        out[..., 1:n:2] = (a - d) / np.sqrt(2.)
+        n *= 2
+    return out
+
+
+def mortonOrder(xyz, nBits=10):
+    """
+    Indices sorting the points xyz [n x 3] along a Morton (Z-order) curve
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    lower, upper = xyz.min(axis=0), xyz.max(axis=0)
+    scale = np.where(upper > lower, upper - lower, 1.)
+    ijk = ((xyz - lower) / scale * (2**nBits - 1)).astype(np.int64)
+
+    code = np.zeros(xyz.shape[0], dtype=np.int64)
+    for bit in range(nBits):
+        for dim in range(3):
+            code |= ((ijk[:, dim] >> bit) & 1) << (3*bit + dim)
+    return np.argsort(code, kind='mergesort')
+
+
+class CompressedG(object):
+    """
+    Wavelet-compressed G [nRows x nC].
+
+    ::
+
+        G = CompressedG(cellCenters, tol=1e-3)
+        for rows in blocks:
+            G.append(rows)
+        G.finalize()
+        d = G.dot(m)
+
+    Each row is stored with a relative L2 error below :code:`tol`. The
+    columns are nComp blocks of the cells (e.g. the x, y and z components of
+    a magnetization), each ordered along the curve.
+    """
+
+    def __init__(self, cellCenters, tol=1e-3, dtype=np.float32, nComp=1):
+        nCell = cellCenters.shape[0]
+        self.nC = nComp*nCell
+        order = mortonOrder(cellCenters)
+        self.order = np.hstack([c*nCell + order for c in range(nComp)])
+        self.nPad = int(2**np.ceil(np.log2(max(self.nC, 2))))
+        self.tol = tol
+        self.dtype = np.dtype(dtype)
+        self._blocks = []
+        self.W = None
+
+    @property
+    def shape(self):
+        nRows = sum(b.shape[0] for b in self._blocks) if self.W is None else self.W.shape[0]
+        return (nRows, self.nC)
+
+    def append(self, rows):
+        """
+        Compress a block of dense rows [nRows x nC]
+        """
+        rows = np.atleast_2d(rows)
+        padded = np.zeros((rows.shape[0], self.nPad))
+        padded[:, :self.nC] = rows[:, self.order]
+        coeffs = _haar(padded)
+
+        # drop the smallest coefficients up to tol**2 of the energy of a row
+        energy = coeffs**2.
+        sortedEnergy = np.sort(energy, axis=1)
+        budget = self.tol**2. * sortedEnergy.sum(axis=1)
+        nDrop = (np.cumsum(sortedEnergy, axis=1) <= budget[:, None]).sum(axis=1)
+        threshold = np.where(
+            nDrop > 0,
+            sortedEnergy[np.arange(rows.shape[0]), np.maximum(nDrop - 1, 0)],
+            -1.
+        )
+        coeffs[energy <= threshold[:, None]] = 0.
+
+        self._blocks.append(sp.csr_matrix(coeffs.astype(self.dtype)))
+
+    def finalize(self):
+        """
+        Assemble the compressed blocks, after the rows already assembled
+        """
+        blocks = self._blocks if self.W is None else [self.W] + self._blocks
+        self.W = sp.vstack(blocks, format='csr')
+        self._blocks = []
+        return self
+
+    def select(self, rows):
+        """
+        Keep the given rows only
+        """
+        self.W = self.W[rows]
+        return self
+
+    @property
+    def compressionRatio(self):
+        """
+        Size of the dense G over the size of the compressed G
+        """
+        W = self.W
+        dense = W.shape[0] * self.nC * self.dtype.itemsize
+        compressed = W.data.nbytes + W.indices.nbytes + W.indptr.nbytes
+        return dense / float(compressed)
+
+    def dot(self, v):
+        """
+        G*v
+        """
+        vp = np.zeros(self.nPad)
+        vp[:self.nC] = v[self.order]
+        return self.W.dot(_haar(vp).astype(self.dtype)).astype(np.float64)
+
+    def dotT(self, v):
+        """
+        G.T*v
+        """
+        z = _ihaar(self.W.T.dot(np.asarray(v).astype(self.dtype)))
+        out = np.empty(self.nC)
+        out[self.order] = z[:self.nC]
+        return out
+
+    def rows(self, start, stop):
+        """
+        Dense rows start:stop of G
+        """
+        dense = _ihaar(self.W[start:stop].toarray())
+        out = np.empty((dense.shape[0], self.nC))
+        out[:, self.order] = dense[:, :self.nC]
+        return out
+
+    def __getitem__(self, key):
+        row, cols = key
+        return self.rows(row, row + 1)[0, cols]
+
+    def summary(self):
+        print(
+            "Compressed G: {0:d} x {1:d}, tol={2:4.2e}, "
+            "compression ratio {3:4.1f}".format(
+                self.W.shape[0], self.nC, self.tol, self.compressionRatio
+            )
+        )
@@ -7,7 +7,13 @@ import scipy as sp
 import scipy.constants as constants
 import os
 import time
+import multiprocessing
 import numpy as np
+from . import ParallelForward
+from . import SensitivityStore
+from . import CompressedSensitivity
+from . import GriddedSensitivity
+from . import LocalSensitivity
 
 class GravityIntegral(Problem.LinearProblem):
 
@@ -21,11 +27,19 @@ class GravityIntegral(Problem.LinearProblem):
     actInd = None  #: Active cell indices provided
     rx_type = 'z'
     silent = False
-    memory_saving_mode = False
+    memory_saving_mode = False  #: Store G in single precision
+    sensitivity_path = None  #: Directory where G is stored and re-used across runs
+    compression_tol = None  #: Relative error of the rows of a compressed G
+    gridded_fft = False  #: Apply G with FFTs when the survey is gridded
+    footprint_radius = None  #: Radius of the exact part of the rows of G
+    regional_block_size = None  #: Size of the blocks of the regional part
     parallelized = False
     n_cpu = None
     progress_index = -1
     gtgdiag = None
+    _gtgdiagMap = None
+    _gtgdiagW = None  #: Data weights of gtgdiag
+    _gtgdiagDeriv = None  #: Map derivative of gtgdiag
 
     aa = []
 
@@ -44,29 +58,70 @@ class GravityIntegral(Problem.LinearProblem):
             return mkvc(fields)
 
         else:
-            vec = np.dot(self.G, model.astype(np.float32))
+            return SensitivityStore.dot(self.G, model)
 
-            return vec.astype(np.float64)
 
+    def fieldsEnsemble(self, M):
+        """
+            Fields [nD x nModels] of the models M [nP x nModels], mapped
+            together and multiplied by G at once (one pass over a stored
+            G), or in one pass over the receivers if forwardOnly
+        """
+        M = np.asarray(M, dtype=np.float64)
+
+        if self.forwardOnly:
+            d = np.empty((self.survey.nRx, M.shape[1]))
+            for start, stop, block in self.streamFields(M):
+                d[start:stop] = block
+            return d
+
+        return SensitivityStore.dot(self.G, self.rhoMap.transformEnsemble(M))
+
+    def streamFields(self, m):
+        """
+            Generator of the data predicted for the model m [nP] or the
+            models m [nP x nModels], without storing G.
+
+            Yields (start, stop, d) with d the data of the receivers
+            start:stop. The rows of G are computed for blocks of receivers
+            and contracted right away, in parallel if parallelized.
+        """
+        ms = np.asarray(m, dtype=np.float64)
+        single = ms.ndim == 1
+        models = self.rhoMap.transformEnsemble(ms.reshape((ms.shape[0], -1)))
+
+        for start, stop, d in ParallelForward.stream(
+            self.forwardJob(), models, n_cpu=self._nCpu
+        ):
+            yield start, stop, d[:, 0] if single else d
+
+    @property
+    def _nCpu(self):
+        if not self.parallelized:
+            return None
+        if self.n_cpu is None:
+            return max(1, int(multiprocessing.cpu_count()/2))
+        return self.n_cpu
 
     def getJtJdiag(self, m, W=None):
         """
             Return the diagonal of JtJ
         """
 
-        if self.gtgdiag is None:
+        # Re-computed when the map changes
+        if self.gtgdiag is None or self._gtgdiagMap is not self.rhoMap:
 
             if W is None:
-                w = np.ones(self.G.shape[1])
+                w = None
             else:
                 w = W.diagonal()
 
             dmudm = self.rhoMap.deriv(m)
-            self.gtgdiag = np.zeros(dmudm.shape[1])
-
-            for ii in range(self.G.shape[0]):
-
-                self.gtgdiag += (w[ii]*self.G[ii, :]*dmudm)**2.
+            self.gtgdiag = SensitivityStore.jtjDiag(
+                self.G, w=w, dmudm=dmudm, n_cpu=self._nCpu
+            )
+            self._gtgdiagMap = self.rhoMap
+            self._gtgdiagW, self._gtgdiagDeriv = w, dmudm
 
         return self.gtgdiag
 
@@ -78,11 +133,11 @@ class GravityIntegral(Problem.LinearProblem):
 
     def Jvec(self, m, v, f=None):
         dmudm = self.rhoMap.deriv(m)
-        return self.G.dot(dmudm*v)
+        return SensitivityStore.dot(self.G, dmudm*v)
 
     def Jtvec(self, m, v, f=None):
         dmudm = self.rhoMap.deriv(m)
-        return dmudm.T * (self.G.T.dot(v))
+        return dmudm.T * SensitivityStore.dotT(self.G, v)
 
     @property
     def G(self):
@@ -96,26 +151,11 @@ class GravityIntegral(Problem.LinearProblem):
             print("Linear forward calculation ended in: " + str(time.time()-start) + " sec")
         return self._G
 
-    def Intrgl_Fwr_Op(self, m=None, rx_type='z'):
-
+    def forwardJob(self):
+        """
+            Forward job (geometry of the active cells and receivers) used to
+            compute G or the data
         """
-
-        Gravity forward operator in integral form
-
-        flag        = 'z' | 'xyz'
-
-        Return
-        _G        = Linear forward modeling operation
-
-        Created on March, 15th 2016
-
-        @author: dominiquef
-
-         """
-
-        if m is not None:
-            self.model = self.rhoMap*m
-
         if getattr(self, 'actInd', None) is not None:
 
             if self.actInd.dtype == 'bool':
@@ -174,12 +214,195 @@ class GravityIntegral(Problem.LinearProblem):
                 rxLoc=self.rxLoc, Xn=self.Xn, Yn=self.Yn, Zn=self.Zn,
                 n_cpu=self.n_cpu, forwardOnly=self.forwardOnly,
                 model=self.model, rx_type=self.rx_type,
-                parallelized=self.parallelized
+                parallelized=self.parallelized,
+                dtype=np.float32 if self.memory_saving_mode else np.float64,
+                sensitivity_path=self.sensitivity_path
                 )
 
-        G = job.calculate()
+        return job
 
-        return G
+    def Intrgl_Fwr_Op(self, m=None, rx_type='z'):
+
+        """
+
+        Gravity forward operator in integral form
+
+        flag        = 'z' | 'xyz'
+
+        Return
+        _G        = Linear forward modeling operation
+
+        Created on March, 15th 2016
+
+        @author: dominiquef
+
+         """
+
+        if m is not None:
+            self.model = self.rhoMap*m
+
+        job = self.forwardJob()
+
+        if self.gridded_fft:
+            G = GriddedSensitivity.griddedG(self.mesh, self.actInd, job)
+            if G is not None:
+                G.summary()
+                if self.forwardOnly:
+                    return G.dot(self.model)
+                return G
+            print("Survey not gridded over the mesh, using the dense G")
+
+        if self.footprint_radius is not None and not self.forwardOnly:
+            # Exact sensitivities near the receivers, blocks beyond
+            if self.sensitivity_path is not None:
+                raise ValueError(
+                    'A footprint G is not stored, set sensitivity_path or '
+                    'footprint_radius only'
+                )
+            kwargs = {}
+            if self.compression_tol is not None:
+                kwargs['tol'] = self.compression_tol
+            G = LocalSensitivity.localG(
+                job, self.footprint_radius, blockSize=self.regional_block_size,
+                **kwargs
+            )
+            G.summary()
+            return G
+
+        if self.compression_tol is not None and not self.forwardOnly:
+            # Compress the rows as they are computed
+            job.compressor = CompressedSensitivity.CompressedG(
+                np.c_[self.Xn.mean(1), self.Yn.mean(1), self.Zn.mean(1)],
+                tol=self.compression_tol
+            )
+            G = job.calculate()
+            G.summary()
+            return G
+
+        if self.forwardOnly or self.sensitivity_path is None:
+            return job.calculate()
+
+        # Map G from disk, computing it first if needed
+        store = self._sensitivityStore(job)
+        if store.exists:
+            print("Loading sensitivities from " + store.filename)
+        else:
+            job.nD = self.nD
+            shape, dtype = job.resultShape
+            job.out = store.create(shape, dtype)
+            G = job.calculate()
+            job.out = None
+            store.commit(G)
+
+        return store.load()
+
+    def _sensitivityStore(self, job):
+        """
+            Store of the G of a forward job
+        """
+        return SensitivityStore.SensitivityStore(
+            self.sensitivity_path,
+            SensitivityStore.sensitivityKey(
+                self.__class__.__name__, job.Xn, job.Yn, job.Zn,
+                job.rxLoc, self.rx_type, np.dtype(job.dtype).str
+            )
+        )
+
+    def appendReceivers(self, locs, dobs=None, std=None):
+        """
+            Append receivers to the survey. Only the rows of G of the new
+            locations are computed, then appended to the stored G (in memory,
+            in the sensitivity store or compressed) and added to a cached
+            gtgdiag, unless it is weighted: the data weights change with the
+            data, so it is re-computed when needed. dobs and std of the new
+            data are appended to those of the survey, and required if the
+            survey has them.
+        """
+        for attr, value in [('dobs', dobs), ('std', std)]:
+            if getattr(self.survey, attr, None) is not None and value is None:
+                raise ValueError(
+                    'The survey has {0}, the {0} of the new receivers are '
+                    'required'.format(attr)
+                )
+
+        locs = np.atleast_2d(locs)
+        rx = self.survey.srcField.rxList[0]
+        rx.locs = np.vstack([rx.locs, locs])
+        for attr, value in [('dobs', dobs), ('std', std)]:
+            if getattr(self.survey, attr, None) is not None:
+                setattr(
+                    self.survey, attr,
+                    np.r_[getattr(self.survey, attr), mkvc(value)]
+                )
+
+        if getattr(self, '_G', None) is None or self.forwardOnly:
+            return
+
+        if isinstance(
+            self._G, (GriddedSensitivity.GriddedG, LocalSensitivity.LocalG)
+        ):
+            # the grid or the blocks changed, re-computed when needed
+            self._G, self.gtgdiag = None, None
+            return
+
+        job = self.forwardJob()
+        store = None
+        if self.sensitivity_path is not None:
+            store = self._sensitivityStore(job)
+        job.rxLoc = locs
+        job.forwardOnly = False
+        rows = job.calculate()
+
+        self._G = SensitivityStore.appendRows(self._G, rows, store)
+
+        if self.gtgdiag is not None and self._gtgdiagW is not None:
+            # weighted by W of the data misfit, which depends on all the data
+            self.gtgdiag, self._gtgdiagW = None, None
+        elif self.gtgdiag is not None:
+            self.gtgdiag = self.gtgdiag + SensitivityStore.jtjDiag(
+                rows, dmudm=self._gtgdiagDeriv
+            )
+
+    def dropReceivers(self, ind):
+        """
+            Remove the receivers ind from the survey, with their rows of the
+            stored G, their data and their contribution to a cached gtgdiag
+        """
+        rx = self.survey.srcField.rxList[0]
+        nRow = 1
+        keep = np.setdiff1d(np.arange(rx.locs.shape[0]), ind)
+        drop = np.setdiff1d(np.arange(rx.locs.shape[0]), keep)
+        keepRows = mkvc((nRow*keep[None, :] + np.arange(nRow)[:, None]).T)
+        dropRows = mkvc((nRow*drop[None, :] + np.arange(nRow)[:, None]).T)
+
+        rx.locs = rx.locs[keep]
+        for attr in ['dobs', 'std']:
+            if getattr(self.survey, attr, None) is not None:
+                setattr(self.survey, attr, getattr(self.survey, attr)[keepRows])
+
+        if getattr(self, '_G', None) is None or self.forwardOnly:
+            return
+
+        if isinstance(
+            self._G, (GriddedSensitivity.GriddedG, LocalSensitivity.LocalG)
+        ):
+            self._G, self.gtgdiag = None, None
+            return
+
+        if self.gtgdiag is not None:
+            w = None
+            if self._gtgdiagW is not None:
+                w = self._gtgdiagW[dropRows]
+                self._gtgdiagW = self._gtgdiagW[keepRows]
+            self.gtgdiag = self.gtgdiag - SensitivityStore.jtjDiag(
+                SensitivityStore.takeRows(self._G, dropRows), w=w,
+                dmudm=self._gtgdiagDeriv
+            )
+
+        store = None
+        if self.sensitivity_path is not None:
+            store = self._sensitivityStore(self.forwardJob())
+        self._G = SensitivityStore.selectRows(self._G, keepRows, store)
 
     @property
     def modelMap(self):
@@ -202,40 +425,92 @@ class Forward(object):
     forwardOnly = False
     model = None
     rx_type = 'z'
+    dtype = np.float64  #: dtype of the rows of G
+    out = None  #: Preallocated array (e.g. memmap) the result is written to
+    sensitivity_path = None  #: Fallback directory of the shared files
+    compressor = None  #: CompressedG the rows are appended to
+    nRow = 1  #: Number of rows of G per receiver
+    blockSize = 100  #: Number of receivers computed at once
 
     def __init__(self, **kwargs):
         super(Forward, self).__init__()
         Utils.setKwargs(self, **kwargs)
 
+    @property
+    def resultShape(self):
+        """
+            Shape and dtype of G | (forwardOnly) of the data
+        """
+        if self.forwardOnly:
+            return (self.nD, 1), np.float64
+        return (self.nD, self.Xn.shape[0]), self.dtype
+
     def calculate(self):
 
         self.nD = self.rxLoc.shape[0]
 
+        if self.compressor is not None and not self.forwardOnly:
+
+            # Compress blocks of rows, the dense G is never formed
+            for ii in range(0, self.nD, self.blockSize):
+                jj = min(ii + self.blockSize, self.nD)
+                self.compressor.append(self.calcTblock(self.rxLoc[ii:jj, :]))
+                self.progress(jj - 1, self.nD)
+
+            return self.compressor.finalize()
+
         if self.parallelized:
             if self.n_cpu is None:
 
                 # By default take half the cores, turns out be faster
                 # than running full threads
-                self.n_cpu = int(multiprocessing.cpu_count()/2)
+                self.n_cpu = max(1, int(multiprocessing.cpu_count()/2))
 
-            pool = multiprocessing.Pool(self.n_cpu)
+        if self.forwardOnly:
 
-            result = pool.map(self.calcTrow, [self.rxLoc[ii, :] for ii in range(self.nD)])
-            pool.close()
-            pool.join()
+            # Contract the rows with the model as they are computed
+            data = np.empty(self.nD)
+            for start, stop, d in ParallelForward.stream(
+                self, self.model,
+                n_cpu=self.n_cpu if self.parallelized else None
+            ):
+                data[start:stop] = d[:, 0]
+                self.progress(stop - 1, self.nD)
 
-        else:
+            return data
 
-            result = []
-            for ii in range(self.nD):
-                result += [self.calcTrow(self.rxLoc[ii, :])]
-                self.progress(ii, self.nD)
+        if self.parallelized:
 
-        if self.forwardOnly:
-            return mkvc(np.vstack(result))
+            # Workers write chunks of receivers in place in shared memory
+            return ParallelForward.calculate(self, self.n_cpu, out=self.out)
 
+        # Write the blocks of rows in place
+        shape, dtype = self.resultShape
+        if self.out is not None:
+            result = self.out
         else:
-            return np.vstack(result)
+            result = np.empty(shape, dtype=dtype)
+
+        for ii in range(0, self.nD, self.blockSize):
+            jj = min(ii + self.blockSize, self.nD)
+            result[ii:jj, :] = self.calcTblock(self.rxLoc[ii:jj, :])
+            self.progress(jj - 1, self.nD)
+
+        return result
+
+    def calcTblock(self, xyzLocs):
+        """
+            Rows of the forward operator for a block of observation
+            locations [nRx x 3]
+
+            OUTPUT:
+            rows [nRx x nC] | (forwardOnly) data [nRx x 1]
+
+        """
+        return np.vstack([
+            np.atleast_2d(self.calcTrow(xyzLoc)).reshape((1, -1))
+            for xyzLoc in xyzLocs
+        ])
 
     def calcTrow(self, xyzLoc):
         """
@@ -305,7 +580,7 @@ class Forward(object):
         if self.forwardOnly:
             return np.dot(row, self.model)
         else:
-            return row
+            return row.astype(self.dtype)
 
     def progress(self, ind, total):
         """
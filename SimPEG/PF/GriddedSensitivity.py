@@ -0,0 +1,247 @@
+"""
+FFT forward and adjoint operators of the integral PF problems for gridded
+surveys.
+
+When the receivers sit on a regular horizontal grid at a constant height,
+with the spacing of the cells of a :code:`TensorMesh` of uniform horizontal
+cell sizes, the rows of G only depend on the horizontal offset between the
+receiver and the cell: each layer of cells is a 2D convolution. The kernel
+of each layer is computed once, for every offset, by the :code:`Forward`
+job of the problem (one receiver and one translated cell per offset), and
+G*m and G.T*v are applied with 2D FFTs in O(nC log n) without storing G.
+"""
+from __future__ import print_function
+
+import copy
+
+import numpy as np
+import scipy.sparse as sp
+
+from SimPEG import Mesh
+from SimPEG.Utils import mkvc
+
+
+def _gridIndices(values, h, tol):
+    """
+    Indices of values on a regular grid of spacing h, None otherwise
+    """
+    index = np.round((values - values.min()) / h)
+    if np.any(np.abs(values - values.min() - index*h) > tol*h):
+        return None
+    return index.astype(int)
+
+
+def _cellMagnetization(Mxyz, nC):
+    """
+    Magnetization [3 x nComp] of the model components, the same for every
+    cell, or None if it varies between cells
+    """
+    nComp = Mxyz.shape[1] // nC
+    Mxyz = sp.csr_matrix(Mxyz)
+    M = np.zeros((3, nComp))
+    for r in range(3):
+        for c in range(nComp):
+            block = Mxyz[r*nC:(r+1)*nC, c*nC:(c+1)*nC]
+            diag = block.diagonal()
+            if (
+                abs(block - sp.diags(diag)).sum() > 0 or
+                not np.allclose(diag, diag[0])
+            ):
+                return None
+            M[r, c] = diag[0]
+    return M
+
+
+def griddedG(mesh, actInd, job, tol=1e-6):
+    """
+    GriddedG for the Forward job of a problem, or None if the mesh and
+    receivers are not gridded (the dense G is then required)
+    """
+    if not isinstance(mesh, Mesh.TensorMesh) or mesh.dim != 3:
+        return None
+
+    hx, hy = mesh.hx[0], mesh.hy[0]
+    if not (np.allclose(mesh.hx, hx) and np.allclose(mesh.hy, hy)):
+        return None
+
+    rxLoc = job.rxLoc
+    if np.ptp(rxLoc[:, 2]) > tol*max(hx, hy):
+        return None
+
+    ix = _gridIndices(rxLoc[:, 0], hx, tol)
+    iy = _gridIndices(rxLoc[:, 1], hy, tol)
+    if ix is None or iy is None:
+        return None
+
+    # every grid node observed once
+    nRxX, nRxY = ix.max() + 1, iy.max() + 1
+    if (
+        nRxX*nRxY != rxLoc.shape[0] or
+        np.unique(ix + nRxX*iy).size != rxLoc.shape[0]
+    ):
+        return None
+
+    if actInd is None:
+        inds = np.arange(mesh.nC)
+    elif actInd.dtype == 'bool':
+        inds = np.where(actInd)[0]
+    else:
+        inds = np.asarray(actInd)
+
+    M = None
+    if getattr(job, 'Mxyz', None) is not None:
+        M = _cellMagnetization(job.Mxyz, len(inds))
+        if M is None:
+            return None
+
+    return GriddedG(mesh, inds, job, ix, iy, M=M)
+
+
+class GriddedG(object):
+    """
+    G [nRow*nD x nComp*nC] of a gridded survey, applied with 2D FFTs.
+
+    ::
+
+        G = griddedG(mesh, actInd, job)
+        d = G.dot(m)
+        g = G.dotT(d)
+
+    Rows are ordered as in the dense G (nRow rows per receiver).
+    """
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, mesh, inds, job, ix, iy, M=None):
+        self.inds = inds
+        self.ix, self.iy = ix, iy
+        self.nCx, self.nCy, self.nCz = mesh.vnC
+        self.nRxX, self.nRxY = ix.max() + 1, iy.max() + 1
+        self.Lx = self.nRxX + self.nCx - 1
+        self.Ly = self.nRxY + self.nCy - 1
+        self.nRow = getattr(job, 'nRow', 1)
+        self.nComp = 1 if M is None else M.shape[1]
+
+        # grid indices of the active cells
+        self.pA = inds % self.nCx
+        self.qA = (inds // self.nCx) % self.nCy
+        self.kA = inds // (self.nCx*self.nCy)
+
+        self.K = self._kernels(mesh, job, M)
+        self.FK = np.fft.rfft2(self.K, axes=(2, 3))
+
+    @property
+    def shape(self):
+        return (self.nRow*self.ix.size, self.nComp*self.inds.size)
+
+    def _kernels(self, mesh, job, M):
+        """
+        Rows of G for every offset (tx, ty) between the receivers and the
+        cells of each layer [nRow x nComp x Lx x Ly x nCz]
+        """
+        hx, hy = mesh.hx[0], mesh.hy[0]
+        x1, y1 = mesh.vectorNx[0], mesh.vectorNy[0]
+
+        kjob = copy.copy(job)
+        kjob.forwardOnly = False
+        kjob.parallelized = False
+        kjob.dtype = np.float64
+        kjob.out = None
+        kjob.compressor = None
+
+        # receiver (0, 0) and the cell translated by minus the offset
+        rx0 = job.rxLoc[(self.ix == 0) & (self.iy == 0)]
+        tx, ty = np.meshgrid(
+            np.arange(self.Lx), np.arange(self.Ly), indexing='ij'
+        )
+        ax = mkvc(tx) - (self.nCx - 1)
+        ay = mkvc(ty) - (self.nCy - 1)
+        nCell = ax.size
+
+        # cells per call so that the kernel intermediates fit in memory
+        maxMemory = getattr(job, 'max_block_memory', 2.5e8)
+        nChunk = int(max(1, maxMemory // (48*8)))
+
+        K = np.zeros((self.nRow, self.nComp, nCell, self.nCz))
+        for k in np.unique(self.kA):
+            # layer geometry from an active cell, e.g. equivalent source
+            cell = np.where(self.kA == k)[0][0]
+            zn = job.Zn[cell, :]
+            for start in range(0, nCell, nChunk):
+                stop = min(start + nChunk, nCell)
+                n = stop - start
+                kjob.Xn = np.c_[
+                    x1 - ax[start:stop]*hx, x1 + hx - ax[start:stop]*hx
+                ]
+                kjob.Yn = np.c_[
+                    y1 - ay[start:stop]*hy, y1 + hy - ay[start:stop]*hy
+                ]
+                kjob.Zn = np.kron(np.ones((n, 1)), zn)
+                if M is not None:
+                    kjob.Mxyz = sp.bmat([
+                        [sp.identity(n)*M[r, c] for c in range(self.nComp)]
+                        for r in range(3)
+                    ])
+                rows = kjob.calcTblock(rx0[:1, :])
+                K[:, :, start:stop, k] = rows.reshape((self.nRow, self.nComp, n))
+
+        return K.reshape(
+            (self.nRow, self.nComp, self.Ly, self.Lx, self.nCz)
+        ).swapaxes(2, 3)
+
+    def _grid(self, v):
+        """
+        Model of the active cells on the full cell grid [nComp x nCx x nCy x nCz]
+        """
+        full = np.zeros((self.nComp, self.nCx*self.nCy*self.nCz))
+        full[:, self.inds] = np.asarray(v).reshape((self.nComp, -1))
+        return full.reshape(
+            (self.nComp, self.nCz, self.nCy, self.nCx)
+        ).transpose((0, 3, 2, 1))
+
+    def dot(self, v):
+        """
+        G*v
+        """
+        FM = np.fft.rfft2(self._grid(v), s=(self.Lx, self.Ly), axes=(1, 2))
+        D = np.einsum('rcxyk,cxyk->rxy', self.FK, FM)
+        d = np.fft.irfft2(D, s=(self.Lx, self.Ly), axes=(1, 2))
+        d = d[:, self.ix + self.nCx - 1, self.iy + self.nCy - 1]
+        return d.T.reshape(-1)
+
+    def dotT(self, v):
+        """
+        G.T*v
+        """
+        V = np.asarray(v, dtype=np.float64).reshape((-1, self.nRow))
+        dpad = np.zeros((self.nRow, self.Lx, self.Ly))
+        dpad[:, self.ix + self.nCx - 1, self.iy + self.nCy - 1] = V.T
+        FD = np.fft.rfft2(dpad, axes=(1, 2))
+        R = np.einsum('rcxyk,rxy->cxyk', np.conj(self.FK), FD)
+        r = np.fft.irfft2(R, s=(self.Lx, self.Ly), axes=(1, 2))
+        return r[:, self.pA, self.qA, self.kA].reshape(-1)
+
+    def rows(self, start, stop):
+        """
+        Dense rows start:stop of G
+        """
+        out = np.empty((stop - start, self.shape[1]))
+        for ii, row in enumerate(range(start, stop)):
+            datum, r = divmod(row, self.nRow)
+            tx = self.ix[datum] - self.pA + self.nCx - 1
+            ty = self.iy[datum] - self.qA + self.nCy - 1
+            out[ii] = self.K[r][:, tx, ty, self.kA].reshape(-1)
+        return out
+
+    def __getitem__(self, key):
+        row, cols = key
+        return self.rows(row, row + 1)[0, cols]
+
+    def summary(self):
+        print(
+            "Gridded G: {0:d} x {1:d} receivers, {2:d} x {3:d} x {4:d} "
+            "cells, FFT size {5:d} x {6:d}".format(
+                self.nRxX, self.nRxY, self.nCx, self.nCy, self.nCz,
+                self.Lx, self.Ly
+            )
+        )
@@ -0,0 +1,229 @@
+"""
+Local-footprint sensitivities of the integral PF problems.
+
+Each row of G is computed exactly only for the cells within a footprint
+radius of its receiver and stored in a sparse matrix. The rest of the row
+(the regional field) is approximated on a regular lattice of coarse
+blocks: the kernel of each block prism is computed for every receiver, and
+the kernel of a cell interpolated (trilinearly, per unit volume) between
+those of the blocks around it. The regional part of the cells inside the
+footprint is subtracted from the sparse part, so that
+
+    G ~ S + F B
+
+with S sparse [nRow*nD x nP], F [nRow*nD x nBlock] the block kernels,
+computed in blocks of rows and wavelet-compressed (see
+CompressedSensitivity), and B the sparse interpolation of the cells from
+the blocks.
+"""
+from __future__ import print_function
+
+import copy
+import itertools
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+
+from SimPEG.Utils import mkvc
+
+from . import CompressedSensitivity
+
+
+def _prepare(job):
+    job = copy.copy(job)
+    job.forwardOnly = False
+    job.dtype = np.float64
+    job.out = None
+    job.compressor = None
+    return job
+
+
+def _subJob(job, cells):
+    """
+    Job restricted to the given cells
+    """
+    sub = _prepare(job)
+    sub.parallelized = False
+    sub.Xn, sub.Yn, sub.Zn = job.Xn[cells], job.Yn[cells], job.Zn[cells]
+    if getattr(job, 'Mxyz', None) is not None:
+        nC = job.Xn.shape[0]
+        nComp = job.Mxyz.shape[1] // nC
+        rows = np.hstack([c*nC + cells for c in range(3)])
+        cols = np.hstack([c*nC + cells for c in range(nComp)])
+        sub.Mxyz = sp.csr_matrix(job.Mxyz)[rows][:, cols]
+    return sub
+
+
+def localG(job, radius, blockSize=None, tol=1e-4, nCheck=10):
+    """
+    LocalG of a Forward job, exact within radius of each receiver and
+    approximated with blocks of blockSize (default radius/2) beyond. The
+    rows of the block kernels are compressed to a relative error tol.
+    """
+    if blockSize is None:
+        blockSize = radius / 2.
+
+    nC = job.Xn.shape[0]
+    nComp = 1 if getattr(job, 'Mxyz', None) is None else job.Mxyz.shape[1] // nC
+    nRow = getattr(job, 'nRow', 1)
+    rxLoc = job.rxLoc
+    nD = rxLoc.shape[0]
+    xyz = np.c_[job.Xn.mean(1), job.Yn.mean(1), job.Zn.mean(1)]
+    vol = (
+        (job.Xn[:, 1] - job.Xn[:, 0]) * (job.Yn[:, 1] - job.Yn[:, 0]) *
+        (job.Zn[:, 1] - job.Zn[:, 0])
+    )
+
+    # Regular lattice of blocks, the kernel of a cell interpolated
+    # (trilinearly) between those of the blocks around its center
+    origin = xyz.min(axis=0)
+    u = (xyz - origin) / blockSize - 0.5
+    lower = np.floor(u).astype(np.int64)
+    frac = u - lower
+    corners, weights = [], []
+    for offset in itertools.product([0, 1], repeat=3):
+        offset = np.array(offset)
+        corners += [lower + offset]
+        weights += [np.prod(np.where(offset, frac, 1. - frac), axis=1)]
+    corners = np.vstack(corners)
+    nodes, block = np.unique(corners, axis=0, return_inverse=True)
+    nB = nodes.shape[0]
+    bounds = [
+        np.c_[origin[dim] + nodes[:, dim]*blockSize,
+              origin[dim] + (nodes[:, dim] + 1)*blockSize]
+        for dim in range(3)
+    ]
+    agg = sp.csr_matrix(
+        (
+            np.hstack(weights)*np.tile(vol, 8) / blockSize**3.,
+            (mkvc(block), np.tile(np.arange(nC), 8))
+        ), shape=(nB, nC)
+    )
+
+    # Block kernels F, magnetized by the cells through B
+    bjob = _prepare(job)
+    bjob.Xn, bjob.Yn, bjob.Zn = bounds
+    if nComp == 1 and getattr(job, 'Mxyz', None) is None:
+        B, nCompB = agg, 1
+    else:
+        bjob.Mxyz = sp.identity(3*nB)
+        B, nCompB = sp.kron(sp.identity(3), agg) * sp.csr_matrix(job.Mxyz), 3
+    bjob.compressor = CompressedSensitivity.CompressedG(
+        np.c_[[b.mean(axis=1) for b in bounds]].T, tol=tol,
+        dtype=np.float64, nComp=nCompB
+    )
+    F = bjob.calculate()
+    B = sp.csc_matrix(B)
+
+    # Exact rows within the footprints, less their regional part
+    tree = cKDTree(xyz)
+    data, indices, indptr = [], [], [0]
+    chunk = int(getattr(job, 'blockSize', 100))
+    for start in range(0, nD, chunk):
+        stop = min(start + chunk, nD)
+        near = [
+            np.sort(np.asarray(n, dtype=int))
+            for n in tree.query_ball_point(rxLoc[start:stop], radius)
+        ]
+        cells = np.unique(np.hstack(near + [np.zeros(0, dtype=int)]))
+
+        if cells.size:
+            cols = np.hstack([c*nC + cells for c in range(nComp)])
+            rows = _subJob(job, cells).calcTblock(rxLoc[start:stop])
+            rows = rows - F.rows(nRow*start, nRow*stop).dot(
+                B[:, cols].toarray()
+            )
+        position = np.full(nC, -1)
+        position[cells] = np.arange(cells.size)
+
+        for ii, n in enumerate(near):
+            ind = np.hstack([c*cells.size + position[n] for c in range(nComp)])
+            cols = np.hstack([c*nC + n for c in range(nComp)])
+            for r in range(nRow):
+                data += [rows[nRow*ii + r, ind] if ind.size else np.zeros(0)]
+                indices += [cols]
+                indptr += [indptr[-1] + ind.size]
+
+    S = sp.csr_matrix(
+        (np.hstack(data), np.hstack(indices).astype(int), np.asarray(indptr)),
+        shape=(nRow*nD, nComp*nC)
+    )
+    G = LocalG(S, F, B, radius, blockSize)
+    G.nBlocks = nB
+
+    # Worst relative error of the rows of a sample of receivers
+    sample = np.unique(np.linspace(0, nD - 1, min(nCheck, nD)).astype(int))
+    exact = _prepare(job).calcTblock(rxLoc[sample])
+    approx = np.vstack([
+        G.rows(nRow*ii, nRow*(ii + 1)) for ii in sample
+    ])
+    G.truncationError = np.max(
+        np.linalg.norm(exact - approx, axis=1) /
+        np.maximum(np.linalg.norm(exact, axis=1), np.finfo(float).tiny)
+    )
+    return G
+
+
+class LocalG(object):
+    """
+    G ~ S + F B, with F a CompressedG, see :code:`localG`
+
+    ::
+
+        G = localG(job, radius)
+        d = G.dot(m)
+        g = G.dotT(d)
+
+    """
+
+    dtype = np.dtype(np.float64)
+    nBlocks = None  #: Number of regional blocks
+    truncationError = None  #: Worst relative error of sampled rows
+
+    def __init__(self, S, F, B, radius, blockSize):
+        self.S = S
+        self.F = F
+        self.B = sp.csr_matrix(B)
+        self.radius = radius
+        self.blockSize = blockSize
+
+    @property
+    def shape(self):
+        return self.S.shape
+
+    def dot(self, v):
+        """
+        G*v
+        """
+        return self.S.dot(v) + self.F.dot(self.B.dot(v))
+
+    def dotT(self, v):
+        """
+        G.T*v
+        """
+        return self.S.T.dot(v) + self.B.T.dot(self.F.dotT(v))
+
+    def rows(self, start, stop):
+        """
+        Dense rows start:stop of G
+        """
+        return (
+            self.S[start:stop].toarray() +
+            np.asarray(self.B.T.dot(self.F.rows(start, stop).T)).T
+        )
+
+    def __getitem__(self, key):
+        row, cols = key
+        return self.rows(row, row + 1)[0, cols]
+
+    def summary(self):
+        print(
+            "Local G: footprint radius {0:4.2e}, {1:d} regional blocks, "
+            "{2:4.1f}% of the entries exact, sampled truncation error "
+            "{3:4.2e}".format(
+                self.radius, self.nBlocks,
+                100.*self.S.nnz / float(np.prod(self.S.shape)),
+                self.truncationError
+            )
+        )
@@ -10,9 +10,15 @@ from SimPEG import Solver
 from SimPEG import Props
 from SimPEG import Mesh
 import multiprocessing
+from multiprocessing.pool import ThreadPool
 import properties
 from SimPEG.Utils import mkvc, matutils, sdiag
 from . import BaseMag as MAG
+from . import ParallelForward
+from . import SensitivityStore
+from . import CompressedSensitivity
+from . import GriddedSensitivity
+from . import LocalSensitivity
 from .MagAnalytics import spheremodel, CongruousMagBC
 
 
@@ -32,9 +38,18 @@ class MagneticIntegral(Problem.LinearProblem):
     silent = False  # Don't display progress on screen
     W = None
     gtgdiag = None
+    _gtgdiagMap = None
+    _gtgdiagW = None  #: Data weights of gtgdiag
+    _gtgdiagDeriv = None  #: Map derivative of gtgdiag
     memory_saving_mode = False
+    sensitivity_path = None  #: Directory where G is stored and re-used across runs
     n_cpu = None
     parallelized = False
+    max_block_memory = 2.5e8  #: Memory (bytes) used to compute a block of G rows
+    compression_tol = None  #: Relative error of the rows of a compressed G
+    gridded_fft = False  #: Apply G with FFTs when the survey is gridded
+    footprint_radius = None  #: Radius of the exact part of the rows of G
+    regional_block_size = None  #: Size of the blocks of the regional part
     coordinate_system = properties.StringChoice(
         "Type of coordinate system we are regularizing in",
         choices=['cartesian', 'spherical'],
@@ -67,10 +82,10 @@ class MagneticIntegral(Problem.LinearProblem):
 
             if getattr(self, '_Mxyz', None) is not None:
 
-                fields = np.dot(self.G, (self.Mxyz*m).astype(np.float32))
+                fields = SensitivityStore.dot(self.G, self.Mxyz*m)
 
             else:
-                fields = np.dot(self.G, m.astype(np.float32))
+                fields = SensitivityStore.dot(self.G, m)
 
             if self.modelType == 'amplitude':
 
@@ -78,6 +93,73 @@ class MagneticIntegral(Problem.LinearProblem):
 
         return fields.astype(np.float64)
 
+    def _mapEnsemble(self, M):
+        """
+            Magnetization models of the columns of M
+        """
+        if self.coordinate_system == 'spherical':
+            nC = int(M.shape[0]/3)
+            M = np.column_stack([
+                matutils.spherical2cartesian(M[:, ii].reshape((nC, 3), order='F'))
+                for ii in range(M.shape[1])
+            ])
+        return self.chiMap.transformEnsemble(M)
+
+    def fieldsEnsemble(self, M):
+        """
+            Fields [nD x nModels] of the models M [nP x nModels], mapped
+            together and multiplied by G at once (one pass over a stored
+            G), or in one pass over the receivers if forwardOnly
+        """
+        M = np.asarray(M, dtype=np.float64)
+
+        if self.forwardOnly:
+            nRow = 3 if self.rx_type == 'xyz' else 1
+            d = np.empty((nRow*self.nD, M.shape[1]))
+            for start, stop, block in self.streamFields(M):
+                d[nRow*start:nRow*stop] = block
+
+            # components in blocks, as returned by fields
+            return d.reshape((self.nD, nRow, -1)).transpose(
+                (1, 0, 2)
+            ).reshape((nRow*self.nD, -1))
+
+        models = self._mapEnsemble(M)
+        if getattr(self, '_Mxyz', None) is not None:
+            models = self.Mxyz*models
+
+        fields = SensitivityStore.dot(self.G, models)
+
+        if self.modelType == 'amplitude':
+            fields = np.column_stack([
+                self.calcAmpData(fields[:, ii]) for ii in range(M.shape[1])
+            ])
+
+        return fields.astype(np.float64)
+
+    def streamFields(self, m):
+        """
+            Generator of the data predicted for the model m [nP] or the
+            models m [nP x nModels], without storing G.
+
+            Yields (start, stop, d) with d the data of the receivers
+            start:stop, rows ordered as in G. The rows of G are computed
+            for blocks of receivers and contracted right away, in parallel
+            if parallelized.
+        """
+        ms = np.asarray(m, dtype=np.float64)
+        single = ms.ndim == 1
+        models = self._mapEnsemble(ms.reshape((ms.shape[0], -1)))
+
+        if self.modelType == 'vector':
+            self.magType = 'full'
+        job = self.forwardJob(magType=self.magType)
+
+        for start, stop, d in ParallelForward.stream(
+            job, models, n_cpu=self._nCpu
+        ):
+            yield start, stop, d[:, 0] if single else d
+
     def calcAmpData(self, Bxyz):
         """
             Compute amplitude of the field
@@ -128,6 +210,14 @@ class MagneticIntegral(Problem.LinearProblem):
 
         return self._ProjTMI
 
+    @property
+    def _nCpu(self):
+        if not self.parallelized:
+            return None
+        if self.n_cpu is None:
+            return max(1, int(multiprocessing.cpu_count()/2))
+        return self.n_cpu
+
     def getJtJdiag(self, m, W=None):
         """
             Return the diagonal of JtJ
@@ -136,30 +226,49 @@ class MagneticIntegral(Problem.LinearProblem):
         self._dSdm = None
         self._dfdm = None
         self.model = m
-        if (self.gtgdiag is None) and (self.modelType != 'amplitude'):
+        # Re-computed when the map changes
+        if (
+            (self.gtgdiag is None or self._gtgdiagMap is not self.chiMap) and
+            (self.modelType != 'amplitude')
+        ):
 
             if W is None:
-                w = np.ones(self.G.shape[1])
+                w = None
             else:
                 w = W.diagonal()
 
-            self.gtgdiag = np.zeros(dmudm.shape[1])
-
-            for ii in range(self.G.shape[0]):
-
-                self.gtgdiag += (w[ii]*self.G[ii, :]*dmudm)**2.
+            self.gtgdiag = SensitivityStore.jtjDiag(
+                self.G, w=w, dmudm=dmudm,
+                n_cpu=self._nCpu
+            )
+            self._gtgdiagMap = self.chiMap
+            self._gtgdiagW, self._gtgdiagDeriv = w, dmudm
 
         if self.coordinate_system == 'cartesian':
             if self.modelType == 'amplitude':
-                return np.sum((W * self.dfdm * self.G * dmudm)**2., axis=0)
+                return np.sum(
+                    (W * self.dfdm * SensitivityStore.dot(self.G, dmudm))**2.,
+                    axis=0
+                )
             else:
                 return self.gtgdiag
 
         else:  # spherical
             if self.modelType == 'amplitude':
-                return np.sum(((W * self.dfdm) * self.G * (self.dSdm * dmudm))**2., axis=0)
+                return np.sum(((W * self.dfdm) * SensitivityStore.dot(
+                    self.G, self.dSdm.tosparse() * dmudm
+                ))**2., axis=0)
             else:
-                Japprox = sdiag(mkvc(self.gtgdiag)**0.5*dmudm.T) * (self.dSdm * dmudm)
+                w = mkvc(np.asarray(mkvc(self.gtgdiag)**0.5*dmudm.T))
+                if not sp.issparse(dmudm):
+                    # identity, fused on the 3x3 blocks of dSdm
+                    return self.dSdm.columnNorms(w)
+                if SensitivityStore._isDiagonal(dmudm):
+                    return (
+                        self.dSdm.columnNorms(w) *
+                        sp.csr_matrix(dmudm).diagonal()**2.
+                    )
+                Japprox = sdiag(w) * (self.dSdm.tosparse() * dmudm)
                 return mkvc(np.sum(Japprox.power(2), axis=0))
 
     def getJ(self, m, f=None):
@@ -169,26 +278,25 @@ class MagneticIntegral(Problem.LinearProblem):
         if self.coordinate_system == 'cartesian':
             dmudm = self.chiMap.deriv(m)
         else:  # spherical
-            dmudm = self.dSdm * self.chiMap.deriv(m)
+            dmudm = self.dSdm.tosparse() * self.chiMap.deriv(m)
 
         if self.modelType == 'amplitude':
-            return self.dfdm * (self.G * dmudm)
+            return self.dfdm * SensitivityStore.dot(self.G, dmudm)
         else:
-            return self.G * dmudm
+            return SensitivityStore.dot(self.G, dmudm)
 
     def Jvec(self, m, v, f=None):
 
-        if self.coordinate_system == 'cartesian':
-            dmudm = self.chiMap.deriv(m)
-        else:
-            dmudm = self.dSdm * self.chiMap.deriv(m)
+        dmudm_v = self.chiMap.deriv(m) * v
+        if self.coordinate_system == 'spherical':
+            dmudm_v = self.dSdm * dmudm_v
 
         if getattr(self, '_Mxyz', None) is not None:
 
-            vec = np.dot(self.G, (self.Mxyz*(dmudm*v)).astype(np.float32))
+            vec = SensitivityStore.dot(self.G, self.Mxyz*dmudm_v)
 
         else:
-            vec = np.dot(self.G, (dmudm*v).astype(np.float32))
+            vec = SensitivityStore.dot(self.G, dmudm_v)
 
         if self.modelType == 'amplitude':
             return self.dfdm*vec.astype(np.float64)
@@ -197,24 +305,23 @@ class MagneticIntegral(Problem.LinearProblem):
 
     def Jtvec(self, m, v, f=None):
 
-        if self.coordinate_system == 'spherical':
-            dmudm = self.dSdm * self.chiMap.deriv(m)
-        else:
-            dmudm = self.chiMap.deriv(m)
-
         if self.modelType == 'amplitude':
             if getattr(self, '_Mxyz', None) is not None:
 
-                vec = self.Mxyz.T*np.dot(self.G.T, (self.dfdm.T*v).astype(np.float32)).astype(np.float64)
+                vec = self.Mxyz.T*SensitivityStore.dotT(self.G, self.dfdm.T*v)
 
             else:
-                vec = np.dot(self.G.T, (self.dfdm.T*v).astype(np.float32))
+                vec = SensitivityStore.dotT(self.G, self.dfdm.T*v)
 
         else:
 
-            vec = np.dot(self.G.T, v.astype(np.float32))
+            vec = SensitivityStore.dotT(self.G, v)
+
+        vec = vec.astype(np.float64)
+        if self.coordinate_system == 'spherical':
+            vec = self.dSdm.T * vec
 
-        return dmudm.T * vec.astype(np.float64)
+        return self.chiMap.deriv(m).T * vec
 
     @property
     def dSdm(self):
@@ -235,19 +342,7 @@ class MagneticIntegral(Problem.LinearProblem):
             t = m_atp[nC:2*nC]
             p = m_atp[2*nC:]
 
-            Sx = sp.hstack([sp.diags(np.cos(t)*np.cos(p), 0),
-                            sp.diags(-a*np.sin(t)*np.cos(p), 0),
-                            sp.diags(-a*np.cos(t)*np.sin(p), 0)])
-
-            Sy = sp.hstack([sp.diags(np.cos(t)*np.sin(p), 0),
-                            sp.diags(-a*np.sin(t)*np.sin(p), 0),
-                            sp.diags(a*np.cos(t)*np.cos(p), 0)])
-
-            Sz = sp.hstack([sp.diags(np.sin(t), 0),
-                            sp.diags(a*np.cos(t), 0),
-                            sp.csr_matrix((nC, nC))])
-
-            self._dSdm = sp.vstack([Sx, Sy, Sz])
+            self._dSdm = SphericalDeriv(a, t, p)
 
         return self._dSdm
 
@@ -289,30 +384,22 @@ class MagneticIntegral(Problem.LinearProblem):
             m = matutils.atp2xyz(m)
 
         if getattr(self, '_Mxyz', None) is not None:
-            Bxyz = np.dot(self.G, (self.Mxyz*m).astype(np.float32))
+            Bxyz = SensitivityStore.dot(self.G, self.Mxyz*m)
         else:
-            Bxyz = np.dot(self.G, m.astype(np.float32))
+            Bxyz = SensitivityStore.dot(self.G, m)
 
         amp = self.calcAmpData(Bxyz.astype(np.float64))
         Bamp = sp.spdiags(1./amp, 0, self.nD, self.nD)
 
         return (Bxyz.reshape((3, self.nD), order='F')*Bamp)
 
-    def Intrgl_Fwr_Op(self, m=None, magType='H0', rx_type='tmi'):
+    def forwardJob(self, magType='H0'):
         """
+            Forward job (geometry of the active cells, receivers and
+            magnetization) used to compute G or the data
 
-        Magnetic forward operator in integral form
-
-        magType  = 'H0' | 'x' | 'y' | 'z'
-        rx_type  = 'tmi' | 'x' | 'y' | 'z'
-
-        Return
-        _G = Linear forward operator | (forwardOnly)=data
-
-         """
-        if m is not None:
-            self.model = self.chiMap*m
-
+            magType  = 'H0' | 'full'
+        """
         # Find non-zero cells
         if getattr(self, 'actInd', None) is not None:
             if self.actInd.dtype == 'bool':
@@ -387,12 +474,256 @@ class MagneticIntegral(Problem.LinearProblem):
                 rxLoc=self.rxLoc, Xn=self.Xn, Yn=self.Yn, Zn=self.Zn,
                 n_cpu=self.n_cpu, forwardOnly=self.forwardOnly,
                 model=self.model, rx_type=self.rx_type, Mxyz=self.Mxyz,
-                P=self.ProjTMI, parallelized=self.parallelized
+                P=self.ProjTMI, parallelized=self.parallelized,
+                max_block_memory=self.max_block_memory,
+                sensitivity_path=self.sensitivity_path
+                )
+
+        return job
+
+    def Intrgl_Fwr_Op(self, m=None, magType='H0', rx_type='tmi'):
+        """
+
+        Magnetic forward operator in integral form
+
+        magType  = 'H0' | 'x' | 'y' | 'z'
+        rx_type  = 'tmi' | 'x' | 'y' | 'z'
+
+        Return
+        _G = Linear forward operator | (forwardOnly)=data
+
+         """
+        if m is not None:
+            self.model = self.chiMap*m
+
+        job = self.forwardJob(magType=magType)
+
+        if self.gridded_fft:
+            G = GriddedSensitivity.griddedG(self.mesh, self.actInd, job)
+            if G is not None:
+                G.summary()
+                if self.forwardOnly:
+                    return mkvc(G.dot(self.model).reshape((-1, job.nRow)))
+                return G
+            print("Survey not gridded over the mesh, using the dense G")
+
+        if self.footprint_radius is not None and not self.forwardOnly:
+            # Exact sensitivities near the receivers, blocks beyond
+            if self.sensitivity_path is not None:
+                raise ValueError(
+                    'A footprint G is not stored, set sensitivity_path or '
+                    'footprint_radius only'
+                )
+            kwargs = {}
+            if self.compression_tol is not None:
+                kwargs['tol'] = self.compression_tol
+            G = LocalSensitivity.localG(
+                job, self.footprint_radius, blockSize=self.regional_block_size,
+                **kwargs
+            )
+            G.summary()
+            return G
+
+        if self.compression_tol is not None and not self.forwardOnly:
+            # Compress the blocks of rows as they are computed
+            cellCenters = np.c_[
+                self.Xn.mean(1), self.Yn.mean(1), self.Zn.mean(1)
+            ]
+            nComp = self.Mxyz.shape[1] // self.Xn.shape[0]
+            job.compressor = CompressedSensitivity.CompressedG(
+                cellCenters, tol=self.compression_tol, nComp=nComp
+            )
+            G = job.calculate()
+            G.summary()
+            return G
+
+        if self.forwardOnly or self.sensitivity_path is None:
+            return job.calculate()
+
+        # Map G from disk, computing it first if needed
+        store = self._sensitivityStore(job, magType)
+        if store.exists:
+            print("Loading sensitivities from " + store.filename)
+        else:
+            job.nD = self.rxLoc.shape[0]
+            shape, dtype = job.resultShape
+            job.out = store.create(shape, dtype)
+            G = job.calculate()
+            job.out = None
+            store.commit(G)
+
+        return store.load()
+
+    def _sensitivityStore(self, job, magType):
+        """
+            Store of the G of a forward job
+        """
+        return SensitivityStore.SensitivityStore(
+            self.sensitivity_path,
+            SensitivityStore.sensitivityKey(
+                self.__class__.__name__, job.Xn, job.Yn, job.Zn,
+                job.rxLoc, self.rx_type, magType, job.Mxyz,
+                np.asarray(self.ProjTMI)
+            )
+        )
+
+    def appendReceivers(self, locs, dobs=None, std=None):
+        """
+            Append receivers to the survey. Only the rows of G of the new
+            locations are computed, then appended to the stored G (in memory,
+            in the sensitivity store or compressed) and added to a cached
+            gtgdiag, unless it is weighted: the data weights change with the
+            data, so it is re-computed when needed. dobs and std of the new
+            data are appended to those of the survey, and required if the
+            survey has them.
+        """
+        for attr, value in [('dobs', dobs), ('std', std)]:
+            if getattr(self.survey, attr, None) is not None and value is None:
+                raise ValueError(
+                    'The survey has {0}, the {0} of the new receivers are '
+                    'required'.format(attr)
+                )
+
+        locs = np.atleast_2d(locs)
+        rx = self.survey.srcField.rxList[0]
+        rx.locs = np.vstack([rx.locs, locs])
+        for attr, value in [('dobs', dobs), ('std', std)]:
+            if getattr(self.survey, attr, None) is not None:
+                setattr(
+                    self.survey, attr,
+                    np.r_[getattr(self.survey, attr), mkvc(value)]
                 )
+        # amplitude derivatives depend on the data
+        self._dfdm = None
+
+        if getattr(self, '_G', None) is None or self.forwardOnly:
+            return
+
+        if isinstance(
+            self._G, (GriddedSensitivity.GriddedG, LocalSensitivity.LocalG)
+        ):
+            # the grid or the blocks changed, re-computed when needed
+            self._G, self.gtgdiag = None, None
+            return
+
+        job = self.forwardJob(magType=self.magType)
+        store = None
+        if self.sensitivity_path is not None:
+            store = self._sensitivityStore(job, self.magType)
+        job.rxLoc = locs
+        job.forwardOnly = False
+        rows = job.calculate()
+
+        self._G = SensitivityStore.appendRows(self._G, rows, store)
+
+        if self.gtgdiag is not None and self._gtgdiagW is not None:
+            # weighted by W of the data misfit, which depends on all the data
+            self.gtgdiag, self._gtgdiagW = None, None
+        elif self.gtgdiag is not None:
+            self.gtgdiag = self.gtgdiag + SensitivityStore.jtjDiag(
+                rows, dmudm=self._gtgdiagDeriv
+            )
+
+    def dropReceivers(self, ind):
+        """
+            Remove the receivers ind from the survey, with their rows of the
+            stored G, their data and their contribution to a cached gtgdiag
+        """
+        rx = self.survey.srcField.rxList[0]
+        nRow = 3 if self.rx_type == 'xyz' else 1
+        keep = np.setdiff1d(np.arange(rx.locs.shape[0]), ind)
+        drop = np.setdiff1d(np.arange(rx.locs.shape[0]), keep)
+        keepRows = mkvc((nRow*keep[None, :] + np.arange(nRow)[:, None]).T)
+        dropRows = mkvc((nRow*drop[None, :] + np.arange(nRow)[:, None]).T)
+
+        rx.locs = rx.locs[keep]
+        for attr in ['dobs', 'std']:
+            if getattr(self.survey, attr, None) is not None:
+                setattr(self.survey, attr, getattr(self.survey, attr)[keepRows])
+        # amplitude derivatives depend on the data
+        self._dfdm = None
+
+        if getattr(self, '_G', None) is None or self.forwardOnly:
+            return
+
+        if isinstance(
+            self._G, (GriddedSensitivity.GriddedG, LocalSensitivity.LocalG)
+        ):
+            self._G, self.gtgdiag = None, None
+            return
+
+        if self.gtgdiag is not None:
+            w = None
+            if self._gtgdiagW is not None:
+                w = self._gtgdiagW[dropRows]
+                self._gtgdiagW = self._gtgdiagW[keepRows]
+            self.gtgdiag = self.gtgdiag - SensitivityStore.jtjDiag(
+                SensitivityStore.takeRows(self._G, dropRows), w=w,
+                dmudm=self._gtgdiagDeriv
+            )
+
+        store = None
+        if self.sensitivity_path is not None:
+            store = self._sensitivityStore(self.forwardJob(magType=self.magType), self.magType)
+        self._G = SensitivityStore.selectRows(self._G, keepRows, store)
 
-        G = job.calculate()
 
-        return G
+class SphericalDeriv(object):
+    """
+        Derivative of the cartesian magnetization [mx, my, mz] with respect
+        to its amplitude and angles [a, t, p], for nC cells.
+
+        The 3nC x 3nC operator is made of 3x3 diagonal blocks, stored as
+        nine arrays of nC and applied with elementwise products.
+    """
+
+    def __init__(self, a, t, p, blocks=None):
+        if blocks is None:
+            ct, st = np.cos(t), np.sin(t)
+            cp, sp_ = np.cos(p), np.sin(p)
+            blocks = np.array([
+                [ct*cp, -a*st*cp, -a*ct*sp_],
+                [ct*sp_, -a*st*sp_, a*ct*cp],
+                [st, a*ct, np.zeros_like(a)]
+            ])
+        self.blocks = blocks
+
+    @property
+    def nC(self):
+        return self.blocks.shape[2]
+
+    @property
+    def shape(self):
+        return (3*self.nC, 3*self.nC)
+
+    @property
+    def T(self):
+        return SphericalDeriv(
+            None, None, None, blocks=self.blocks.transpose((1, 0, 2))
+        )
+
+    def __mul__(self, v):
+        if not isinstance(v, np.ndarray):
+            return self.tosparse() * v
+
+        V = v.reshape((3, self.nC) + v.shape[1:])
+        out = np.einsum('ijc,jc...->ic...', self.blocks, V)
+        return out.reshape(v.shape)
+
+    def columnNorms(self, w):
+        """
+            Weighted squared norms of the columns, sum_i (w_i S_ij)^2
+        """
+        W = np.asarray(w).reshape((3, self.nC))**2.
+        return np.einsum('ic,ijc->jc', W, self.blocks**2.).reshape(-1)
+
+    def tosparse(self):
+        """
+            The operator as a sparse matrix
+        """
+        return sp.bmat([
+            [sp.diags(self.blocks[i, j]) for j in range(3)] for i in range(3)
+        ], format='csr')
 
 
 class Forward(object):
@@ -407,39 +738,100 @@ class Forward(object):
     rx_type = 'z'
     Mxyz = None
     P = None
+    max_block_memory = 2.5e8  #: Memory (bytes) used to compute a block of rows
+    out = None  #: Preallocated array (e.g. memmap) the result is written to
+    sensitivity_path = None  #: Fallback directory of the shared files
+    compressor = None  #: CompressedG the blocks of rows are appended to
+    dtype = np.float32  #: dtype of the rows of G
 
     def __init__(self, **kwargs):
         super(Forward, self).__init__()
         Utils.setKwargs(self, **kwargs)
 
+    @property
+    def nRow(self):
+        """
+            Number of rows of G per receiver
+        """
+        return 3 if self.rx_type == 'xyz' else 1
+
+    @property
+    def blockSize(self):
+        """
+            Number of receivers computed at once, so that the intermediate
+            arrays of the kernel (about 48 arrays of nC) fit in
+            max_block_memory
+        """
+        nC = self.Xn.shape[0]
+        return int(max(1, min(self.nD, self.max_block_memory // (48*8*nC))))
+
+    @property
+    def resultShape(self):
+        """
+            Shape and dtype of G | (forwardOnly) of the data
+        """
+        if self.forwardOnly:
+            return (self.nD, self.nRow), np.float64
+        return (self.nRow*self.nD, self.Mxyz.shape[1]), self.dtype
+
     def calculate(self):
         self.nD = self.rxLoc.shape[0]
 
+        if self.compressor is not None and not self.forwardOnly:
+
+            # Compress each block of rows, the dense G is never formed
+            for ii in range(0, self.nD, self.blockSize):
+                ind = slice(ii, min(ii + self.blockSize, self.nD))
+                self.compressor.append(self.calcTblock(self.rxLoc[ind, :]))
+                self.progress(ind.stop - 1, self.nD)
+
+            return self.compressor.finalize()
+
         if self.parallelized:
             if self.n_cpu is None:
 
                 # By default take half the cores, turns out be faster
                 # than running full threads
-                self.n_cpu = int(multiprocessing.cpu_count()/2)
+                self.n_cpu = max(1, int(multiprocessing.cpu_count()/2))
 
-            pool = multiprocessing.Pool(self.n_cpu)
+        if self.forwardOnly:
 
-            result = pool.map(self.calcTrow, [self.rxLoc[ii, :] for ii in range(self.nD)])
-            pool.close()
-            pool.join()
+            # Contract the rows with the model as they are computed
+            data = np.empty(self.nRow*self.nD)
+            for start, stop, d in ParallelForward.stream(
+                self, self.model,
+                n_cpu=self.n_cpu if self.parallelized else None
+            ):
+                data[self.nRow*start:self.nRow*stop] = d[:, 0]
+                self.progress(stop - 1, self.nD)
 
-        else:
+            return mkvc(data.reshape((self.nD, self.nRow)))
 
-            result = []
-            for ii in range(self.nD):
-                result += [self.calcTrow(self.rxLoc[ii, :])]
-                self.progress(ii, self.nD)
+        if self.parallelized:
 
-        if self.forwardOnly:
-            return mkvc(np.vstack(result))
+            # Workers write chunks of receivers in place in shared memory
+            result = ParallelForward.calculate(self, self.n_cpu, out=self.out)
 
         else:
-            return np.vstack(result)
+
+            # Write the blocks of rows in place
+            shape, dtype = self.resultShape
+            if self.out is not None:
+                result = self.out
+            else:
+                result = np.empty(shape, dtype=dtype)
+
+            blocks = [
+                slice(ii, min(ii + self.blockSize, self.nD))
+                for ii in range(0, self.nD, self.blockSize)
+            ]
+
+            for ind in blocks:
+                rows = slice(self.nRow*ind.start, self.nRow*ind.stop)
+                result[rows, :] = self.calcTblock(self.rxLoc[ind, :])
+                self.progress(ind.stop - 1, self.nD)
+
+        return result
 
     def calcTrow(self, xyzLoc):
         """
@@ -456,32 +848,48 @@ class Forward(object):
             Tz = [Tzx Tzy Tzz]
 
         """
-        tx, ty, tz = calcRow(self.Xn, self.Yn, self.Zn, xyzLoc)
+        return self.calcTblock(np.atleast_2d(xyzLoc))
+
+    def calcTblock(self, xyzLocs):
+        """
+            Rows of the forward operator for a block of observation
+            locations [nRx x 3]. For rx_type 'xyz' the rows are ordered
+            [x, y, z] for each receiver.
+
+            OUTPUT:
+            rows [nRow*nRx x nC] (float32) | (forwardOnly) data [nRx x nRow]
+
+        """
+        tx, ty, tz = calcRow(self.Xn, self.Yn, self.Zn, xyzLocs)
+        nRx = xyzLocs.shape[0]
 
         if self.rx_type == 'tmi':
-            row = self.P.dot(np.vstack((tx, ty, tz)))*self.Mxyz
+            P = np.asarray(self.P).reshape(-1)
+            rows = (P[0]*tx + P[1]*ty + P[2]*tz)*self.Mxyz
 
         elif self.rx_type == 'x':
-            row = tx*self.Mxyz
+            rows = tx*self.Mxyz
 
         elif self.rx_type == 'y':
-            row = ty*self.Mxyz
+            rows = ty*self.Mxyz
 
         elif self.rx_type == 'z':
-            row = tz*self.Mxyz
+            rows = tz*self.Mxyz
 
         elif self.rx_type == 'xyz':
-            row = tx*self.Mxyz
-            row = np.r_[row, ty*self.Mxyz]
-            row = np.r_[row, tz*self.Mxyz]
+            rows = np.empty((nRx, 3, self.Mxyz.shape[1]))
+            rows[:, 0, :] = tx*self.Mxyz
+            rows[:, 1, :] = ty*self.Mxyz
+            rows[:, 2, :] = tz*self.Mxyz
+            rows = rows.reshape((3*nRx, -1))
         else:
             raise Exception('rx_type must be: "tmi", "x", "y" or "z"')
 
         if self.forwardOnly:
 
-            return np.dot(row, self.model)
+            return np.dot(rows, self.model).reshape((nRx, self.nRow))
         else:
-            return np.float32(row)
+            return rows.astype(self.dtype)
 
     def progress(self, ind, total):
         """
@@ -890,21 +1298,22 @@ def MagneticsDiffSecondaryInv(mesh, model, data, **kwargs):
 def calcRow(Xn, Yn, Zn, rxLoc):
     """
     Load in the active nodes of a tensor mesh and computes the magnetic tensor
-    for a given observation location rxLoc[obsx, obsy, obsz]
+    for a block of observation locations rxLoc[obsx, obsy, obsz]
 
     INPUT:
     Xn, Yn, Zn: Node location matrix for the lower and upper most corners of
                 all cells in the mesh shape[nC,2]
-    M
+    rxLoc: Observation location [obsx, obsy, obsz] or a block of
+           locations shape[nRx,3]
     OUTPUT:
     Tx = [Txx Txy Txz]
     Ty = [Tyx Tyy Tyz]
     Tz = [Tzx Tzy Tzz]
 
-    where each elements have dimension 1-by-nC.
+    where each elements have dimension nRx-by-nC.
     Only the upper half 5 elements have to be computed since symetric.
-    Currently done as for-loops but will eventually be changed to vector
-    indexing, once the topography has been figured out.
+    The kernel is evaluated for all receivers of the block at once, and the
+    distances to the 8 corners of the cells are shared by all the terms.
 
     Created on Oct, 20th 2015
 
@@ -915,20 +1324,23 @@ def calcRow(Xn, Yn, Zn, rxLoc):
     eps = 1e-8  # add a small value to the locations to avoid /0
 
     nC = Xn.shape[0]
+    rxLoc = np.atleast_2d(rxLoc)
+    nRx = rxLoc.shape[0]
 
-    # Pre-allocate space for 1D array
-    Tx = np.zeros((1, 3*nC))
-    Ty = np.zeros((1, 3*nC))
-    Tz = np.zeros((1, 3*nC))
+    # Pre-allocate space for the block of rows
+    Tx = np.empty((nRx, 3*nC))
+    Ty = np.empty((nRx, 3*nC))
+    Tz = np.empty((nRx, 3*nC))
 
-    dz2 = Zn[:, 1] - rxLoc[2] + eps
-    dz1 = Zn[:, 0] - rxLoc[2] + eps
+    # Distances from the receivers (rows) to the cell faces (columns)
+    dz2 = Zn[:, 1] - rxLoc[:, 2:3] + eps
+    dz1 = Zn[:, 0] - rxLoc[:, 2:3] + eps
 
-    dy2 = Yn[:, 1] - rxLoc[1] + eps
-    dy1 = Yn[:, 0] - rxLoc[1] + eps
+    dy2 = Yn[:, 1] - rxLoc[:, 1:2] + eps
+    dy1 = Yn[:, 0] - rxLoc[:, 1:2] + eps
 
-    dx2 = Xn[:, 1] - rxLoc[0] + eps
-    dx1 = Xn[:, 0] - rxLoc[0] + eps
+    dx2 = Xn[:, 1] - rxLoc[:, 0:1] + eps
+    dx1 = Xn[:, 0] - rxLoc[:, 0:1] + eps
 
     dx2dx2 = dx2**2.
     dx1dx1 = dx1**2.
@@ -944,16 +1356,19 @@ def calcRow(Xn, Yn, Zn, rxLoc):
     R3 = (dy1dy1 + dx2dx2)
     R4 = (dy1dy1 + dx1dx1)
 
-    arg1 = np.sqrt(dz2dz2 + R2)
-    arg2 = np.sqrt(dz2dz2 + R1)
-    arg3 = np.sqrt(dz1dz1 + R1)
-    arg4 = np.sqrt(dz1dz1 + R2)
-    arg5 = np.sqrt(dz2dz2 + R3)
-    arg6 = np.sqrt(dz2dz2 + R4)
-    arg7 = np.sqrt(dz1dz1 + R4)
-    arg8 = np.sqrt(dz1dz1 + R3)
+    # Distances to the 8 corners of the cells
+    arg1 = np.sqrt(dz2dz2 + R2)  # x1, y2, z2
+    arg2 = np.sqrt(dz2dz2 + R1)  # x2, y2, z2
+    arg3 = np.sqrt(dz1dz1 + R1)  # x2, y2, z1
+    arg4 = np.sqrt(dz1dz1 + R2)  # x1, y2, z1
+    arg5 = np.sqrt(dz2dz2 + R3)  # x2, y1, z2
+    arg6 = np.sqrt(dz2dz2 + R4)  # x1, y1, z2
+    arg7 = np.sqrt(dz1dz1 + R4)  # x1, y1, z1
+    arg8 = np.sqrt(dz1dz1 + R3)  # x2, y1, z1
 
-    Tx[0, 0:nC] = (
+    del R1, R2, R3, R4, dx2dx2, dx1dx1, dy2dy2, dy1dy1, dz2dz2, dz1dz1
+
+    Tx[:, 0:nC] = (
         np.arctan2(dy1 * dz2, (dx2 * arg5 + eps)) -
         np.arctan2(dy2 * dz2, (dx2 * arg2 + eps)) +
         np.arctan2(dy2 * dz1, (dx2 * arg3 + eps)) -
@@ -964,14 +1379,14 @@ def calcRow(Xn, Yn, Zn, rxLoc):
         np.arctan2(dy2 * dz1, (dx1 * arg4 + eps))
     )
 
-    Ty[0, 0:nC] = (
+    Ty[:, 0:nC] = (
         np.log((dz2 + arg2 + eps) / (dz1 + arg3 + eps)) -
         np.log((dz2 + arg1 + eps) / (dz1 + arg4 + eps)) +
         np.log((dz2 + arg6 + eps) / (dz1 + arg7 + eps)) -
         np.log((dz2 + arg5 + eps) / (dz1 + arg8 + eps))
     )
 
-    Ty[0, nC:2*nC] = (
+    Ty[:, nC:2*nC] = (
         np.arctan2(dx1 * dz2, (dy2 * arg1 + eps)) -
         np.arctan2(dx2 * dz2, (dy2 * arg2 + eps)) +
         np.arctan2(dx2 * dz1, (dy2 * arg3 + eps)) -
@@ -982,46 +1397,28 @@ def calcRow(Xn, Yn, Zn, rxLoc):
         np.arctan2(dx2 * dz1, (dy1 * arg8 + eps))
     )
 
-    R1 = (dy2dy2 + dz1dz1)
-    R2 = (dy2dy2 + dz2dz2)
-    R3 = (dy1dy1 + dz1dz1)
-    R4 = (dy1dy1 + dz2dz2)
-
-    Ty[0, 2*nC:] = (
-        np.log((dx1 + np.sqrt(dx1dx1 + R1) + eps) /
-               (dx2 + np.sqrt(dx2dx2 + R1) + eps)) -
-        np.log((dx1 + np.sqrt(dx1dx1 + R2) + eps) /
-               (dx2 + np.sqrt(dx2dx2 + R2) + eps)) +
-        np.log((dx1 + np.sqrt(dx1dx1 + R4) + eps) /
-               (dx2 + np.sqrt(dx2dx2 + R4) + eps)) -
-        np.log((dx1 + np.sqrt(dx1dx1 + R3) + eps) /
-               (dx2 + np.sqrt(dx2dx2 + R3) + eps))
+    Ty[:, 2*nC:] = (
+        np.log((dx1 + arg4 + eps) / (dx2 + arg3 + eps)) -
+        np.log((dx1 + arg1 + eps) / (dx2 + arg2 + eps)) +
+        np.log((dx1 + arg6 + eps) / (dx2 + arg5 + eps)) -
+        np.log((dx1 + arg7 + eps) / (dx2 + arg8 + eps))
     )
 
-    R1 = (dx2dx2 + dz1dz1)
-    R2 = (dx2dx2 + dz2dz2)
-    R3 = (dx1dx1 + dz1dz1)
-    R4 = (dx1dx1 + dz2dz2)
-
-    Tx[0, 2*nC:] = (
-        np.log((dy1 + np.sqrt(dy1dy1 + R1) + eps) /
-               (dy2 + np.sqrt(dy2dy2 + R1) + eps)) -
-        np.log((dy1 + np.sqrt(dy1dy1 + R2) + eps) /
-               (dy2 + np.sqrt(dy2dy2 + R2) + eps)) +
-        np.log((dy1 + np.sqrt(dy1dy1 + R4) + eps) /
-               (dy2 + np.sqrt(dy2dy2 + R4) + eps)) -
-        np.log((dy1 + np.sqrt(dy1dy1 + R3) + eps) /
-               (dy2 + np.sqrt(dy2dy2 + R3) + eps))
+    Tx[:, 2*nC:] = (
+        np.log((dy1 + arg8 + eps) / (dy2 + arg3 + eps)) -
+        np.log((dy1 + arg5 + eps) / (dy2 + arg2 + eps)) +
+        np.log((dy1 + arg6 + eps) / (dy2 + arg1 + eps)) -
+        np.log((dy1 + arg7 + eps) / (dy2 + arg4 + eps))
     )
 
-    Tz[0, 2*nC:] = -(Ty[0, nC:2*nC] + Tx[0, 0:nC])
-    Tz[0, nC:2*nC] = Ty[0, 2*nC:]
-    Tx[0, nC:2*nC] = Ty[0, 0:nC]
-    Tz[0, 0:nC] = Tx[0, 2*nC:]
+    Tz[:, 2*nC:] = -(Ty[:, nC:2*nC] + Tx[:, 0:nC])
+    Tz[:, nC:2*nC] = Ty[:, 2*nC:]
+    Tx[:, nC:2*nC] = Ty[:, 0:nC]
+    Tz[:, 0:nC] = Tx[:, 2*nC:]
 
-    Tx = Tx/(4*np.pi)
-    Ty = Ty/(4*np.pi)
-    Tz = Tz/(4*np.pi)
+    Tx /= (4*np.pi)
+    Ty /= (4*np.pi)
+    Tz /= (4*np.pi)
 
     return Tx, Ty, Tz
 
@@ -1047,19 +1444,27 @@ def progress(iter, prog, final):
     return prog
 
 
-def get_dist_wgt(mesh, rxLoc, actv, R, R0):
+def get_dist_wgt(
+    mesh, rxLoc, actv, R, R0, n_cpu=None, dtype=np.float64, G=None,
+    max_block_memory=2.5e8
+):
     """
-    get_dist_wgt(xn,yn,zn,rxLoc,R,R0)
+    get_dist_wgt(mesh,rxLoc,actv,R,R0)
 
     Function creating a distance weighting function required for the magnetic
     inverse problem.
 
     INPUT
-    xn, yn, zn : Node location
+    mesh        : TensorMesh or TreeMesh
     rxLoc       : Observation locations [obsx, obsy, obsz]
     actv        : Active cell vector [0:air , 1: ground]
     R           : Decay factor (mag=3, grav =2)
     R0          : Small factor added (default=dx/4)
+    n_cpu       : Number of threads sharing the blocks of receivers
+    dtype       : Precision of the distance calculations
+    G           : Sensitivities (dense, stored or compressed) used instead
+                  of the distances when provided
+    max_block_memory : Memory (bytes) used by a block of receivers
 
     OUTPUT
     wr       : [nC] Vector of distance weighting
@@ -1077,60 +1482,73 @@ def get_dist_wgt(mesh, rxLoc, actv, R, R0):
 
     nC = len(inds)
 
-    # Create active cell projector
-    P = sp.csr_matrix((np.ones(nC), (inds, range(nC))),
-                      shape=(mesh.nC, nC))
-
     # Geometrical constant
     p = 1 / np.sqrt(3)
 
-    # Create cell center location
-    Ym, Xm, Zm = np.meshgrid(mesh.vectorCCy, mesh.vectorCCx, mesh.vectorCCz)
-    hY, hX, hZ = np.meshgrid(mesh.hy, mesh.hx, mesh.hz)
-
-    # Remove air cells
-    Xm = P.T * mkvc(Xm)
-    Ym = P.T * mkvc(Ym)
-    Zm = P.T * mkvc(Zm)
-
-    hX = P.T * mkvc(hX)
-    hY = P.T * mkvc(hY)
-    hZ = P.T * mkvc(hZ)
-
-    V = P.T * mkvc(mesh.vol)
-    wr = np.zeros(nC)
+    # Create cell center location and size
+    if isinstance(mesh, Mesh.TreeMesh):
+        xyz = mesh.gridCC[inds, :]
+        hxyz = mesh.h_gridded[inds, :]
 
-    ndata = rxLoc.shape[0]
-    count = -1
-    print("Begin calculation of distance weighting for R= " + str(R))
-
-    for dd in range(ndata):
-
-        nx1 = (Xm - hX * p - rxLoc[dd, 0])**2
-        nx2 = (Xm + hX * p - rxLoc[dd, 0])**2
+    else:
+        Ym, Xm, Zm = np.meshgrid(mesh.vectorCCy, mesh.vectorCCx, mesh.vectorCCz)
+        hY, hX, hZ = np.meshgrid(mesh.hy, mesh.hx, mesh.hz)
 
-        ny1 = (Ym - hY * p - rxLoc[dd, 1])**2
-        ny2 = (Ym + hY * p - rxLoc[dd, 1])**2
+        xyz = np.c_[mkvc(Xm), mkvc(Ym), mkvc(Zm)][inds, :]
+        hxyz = np.c_[mkvc(hX), mkvc(hY), mkvc(hZ)][inds, :]
 
-        nz1 = (Zm - hZ * p - rxLoc[dd, 2])**2
-        nz2 = (Zm + hZ * p - rxLoc[dd, 2])**2
+    V = mkvc(mesh.vol)[inds]
 
-        R1 = np.sqrt(nx1 + ny1 + nz1)
-        R2 = np.sqrt(nx1 + ny1 + nz2)
-        R3 = np.sqrt(nx2 + ny1 + nz1)
-        R4 = np.sqrt(nx2 + ny1 + nz2)
-        R5 = np.sqrt(nx1 + ny2 + nz1)
-        R6 = np.sqrt(nx1 + ny2 + nz2)
-        R7 = np.sqrt(nx2 + ny2 + nz1)
-        R8 = np.sqrt(nx2 + ny2 + nz2)
+    if G is not None:
+        print("Begin calculation of sensitivity weighting from G")
 
-        temp = (R1 + R0)**-R + (R2 + R0)**-R + (R3 + R0)**-R + \
-            (R4 + R0)**-R + (R5 + R0)**-R + (R6 + R0)**-R + \
-            (R7 + R0)**-R + (R8 + R0)**-R
+        # Column norms of G, V*temp/8 above approximates the entries of G
+        wr = SensitivityStore.jtjDiag(G, n_cpu=n_cpu)
+        wr = wr.reshape((-1, nC)).sum(axis=0)
 
-        wr = wr + (V * temp / 8.)**2.
+    else:
+        print("Begin calculation of distance weighting for R= " + str(R))
+
+        # Distances to the lower and upper points of the cells along each axis
+        lower = (xyz - hxyz * p).astype(dtype)
+        upper = (xyz + hxyz * p).astype(dtype)
+        rxLoc = np.asarray(rxLoc, dtype=dtype)
+        scaledV = (V / 8.).astype(dtype)
+
+        # about 12 arrays [nRx x nC] per block of receivers
+        nBlock = int(max(
+            1, max_block_memory // (12 * nC * np.dtype(dtype).itemsize)
+        ))
+        ndata = rxLoc.shape[0]
+
+        def blockWeight(start):
+            loc = rxLoc[start:start+nBlock, None, :]
+            n1 = (lower[None, :, :] - loc)**2
+            n2 = (upper[None, :, :] - loc)**2
+
+            temp = np.zeros((loc.shape[0], nC), dtype=dtype)
+            for nx in [n1[:, :, 0], n2[:, :, 0]]:
+                for ny in [n1[:, :, 1], n2[:, :, 1]]:
+                    for nz in [n1[:, :, 2], n2[:, :, 2]]:
+                        temp += (np.sqrt(nx + ny + nz) + R0)**-R
+
+            return np.sum((scaledV * temp)**2., axis=0, dtype=np.float64)
+
+        starts = range(0, ndata, nBlock)
+        if n_cpu is not None and n_cpu > 1 and len(starts) > 1:
+            pool = ThreadPool(n_cpu)
+            try:
+                wr = np.sum(pool.map(blockWeight, starts), axis=0)
+            finally:
+                pool.close()
+                pool.join()
 
-        count = progress(dd, count, ndata)
+        else:
+            wr = np.zeros(nC)
+            count = -1
+            for start in starts:
+                wr += blockWeight(start)
+                count = progress(min(start + nBlock, ndata), count, ndata)
 
     wr = np.sqrt(wr) / V
     wr = mkvc(wr)
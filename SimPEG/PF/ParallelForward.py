@@ -0,0 +1,317 @@
+"""
+Shared-memory parallel construction of the potential field forward operators.
+
+The arrays of a :code:`Forward` job (cell geometry, receiver locations,
+magnetization, model) and its result are placed in memory-mapped files
+that the workers map instead of receiving pickled copies. The files go in
+:code:`sharedDirectory` if set, else in /dev/shm when it has room for them,
+else under the :code:`sensitivity_path` of the job or the temporary
+directory. Each worker computes a contiguous chunk of receivers and writes
+its rows of the result in place, and the result is returned as a view of
+its file, not copied. The worker pool is kept alive between calls.
+
+:code:`stream` predicts data without storing G: the rows of each block of
+receivers are contracted with one or many models as soon as they are
+computed, and the data are yielded chunk by chunk.
+"""
+from __future__ import print_function
+
+import atexit
+import copy
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+_pool = None
+_poolSize = None
+
+#: Arrays smaller than this (number of entries) are sent with the task
+minSharedSize = 1000
+#: Number of receiver chunks per worker, for load balancing
+chunksPerWorker = 4
+#: Directory of the memory-mapped files shared with the workers, chosen
+#: from the available space when None
+sharedDirectory = None
+
+
+def getPool(n_cpu):
+    """
+    Return the persistent pool of n_cpu workers, (re)starting it if needed
+    """
+    global _pool, _poolSize
+    if _pool is None or _poolSize != n_cpu:
+        closePool()
+        _pool = multiprocessing.Pool(n_cpu)
+        _poolSize = n_cpu
+    return _pool
+
+
+def closePool():
+    """
+    Terminate the persistent pool of workers
+    """
+    global _pool, _poolSize
+    if _pool is not None:
+        _pool.close()
+        _pool.join()
+    _pool, _poolSize = None, None
+
+
+atexit.register(closePool)
+
+
+def _freeBytes(directory):
+    try:
+        stat = os.statvfs(directory)
+    except (AttributeError, OSError):
+        return 0
+    return stat.f_bavail * stat.f_frsize
+
+
+def _sharedDir(job, nBytes):
+    """
+    Directory for nBytes of memory-mapped files of a job: /dev/shm is
+    often small in containers, and running out of it kills the workers
+    """
+    if sharedDirectory is not None:
+        return sharedDirectory
+    shm = '/dev/shm'
+    if (
+        os.path.isdir(shm) and os.access(shm, os.W_OK) and
+        _freeBytes(shm) > 1.1*nBytes
+    ):
+        return shm
+    path = getattr(job, 'sensitivity_path', None)
+    if path is not None and os.path.isdir(path):
+        return path
+    return tempfile.gettempdir()
+
+
+def _sharedBytes(job):
+    """
+    Size of the attributes of a job placed in memory-mapped files
+    """
+    nBytes = 0
+    for key, value in vars(job).items():
+        if key == 'out':
+            continue
+        elif isinstance(value, np.ndarray) and value.size >= minSharedSize:
+            nBytes += value.nbytes
+        elif sp.issparse(value) and value.nnz >= minSharedSize:
+            value = value.tocsr()
+            nBytes += (
+                value.data.nbytes + value.indices.nbytes +
+                value.indptr.nbytes
+            )
+    return nBytes
+
+
+def _share(directory, name, array=None, shape=None, dtype=None):
+    """
+    Write an array (or create an empty one) in a memory-mapped file and
+    return the spec used by the workers to map it
+    """
+    if array is not None:
+        shape, dtype = array.shape, array.dtype
+    spec = (os.path.join(directory, name + '.dat'), tuple(shape), np.dtype(dtype).str)
+    mm = np.memmap(spec[0], dtype=spec[2], mode='w+', shape=spec[1])
+    if array is not None:
+        mm[...] = array
+    mm.flush()
+    return spec
+
+
+def _attach(spec, mode='r'):
+    filename, shape, dtype = spec[:3]
+    offset = spec[3] if len(spec) > 3 else 0
+    return np.memmap(
+        filename, dtype=dtype, mode=mode, shape=shape, offset=offset
+    )
+
+
+def _attachAttribute(spec):
+    if spec[0] == 'sparse':
+        _, shape, data, indices, indptr = spec
+        return sp.csr_matrix(
+            (_attach(data), _attach(indices), _attach(indptr)), shape=shape
+        )
+    return _attach(spec[1])
+
+
+def _attachJob(cls, attributes, specs):
+    job = cls.__new__(cls)
+    job.__dict__.update(attributes)
+    for key, spec in specs.items():
+        setattr(job, key, _attachAttribute(spec))
+    return job
+
+
+def _shareJob(job, directory):
+    """
+    Split the attributes of a job into those sent with the tasks and the
+    specs of those placed in memory-mapped files
+    """
+    attributes, specs = {}, {}
+    for key, value in vars(job).items():
+        if key == 'out':
+            continue
+        elif isinstance(value, np.ndarray) and value.size >= minSharedSize:
+            specs[key] = ('dense', _share(directory, key, np.asarray(value)))
+        elif sp.issparse(value) and value.nnz >= minSharedSize:
+            value = value.tocsr()
+            specs[key] = (
+                'sparse', value.shape,
+                _share(directory, key + '_data', value.data),
+                _share(directory, key + '_indices', value.indices),
+                _share(directory, key + '_indptr', value.indptr)
+            )
+        else:
+            attributes[key] = value
+    return attributes, specs
+
+
+def _computeChunk(args):
+    """
+    Worker: compute the rows of receivers start:stop and write them in place
+    """
+    cls, attributes, specs, start, stop, resultSpec = args
+
+    job = _attachJob(cls, attributes, specs)
+    result = _attach(resultSpec, mode='r+')
+    nRow = result.shape[0] // job.nD
+    blockSize = getattr(job, 'blockSize', stop - start)
+
+    for ii in range(start, stop, blockSize):
+        jj = min(ii + blockSize, stop)
+        result[nRow*ii:nRow*jj] = job.calcTblock(job.rxLoc[ii:jj, :])
+
+    result.flush()
+    del result
+
+
+def calculate(job, n_cpu, out=None):
+    """
+    Compute the result of a Forward job (G or forwardOnly data) in parallel.
+
+    The job must have nD, rxLoc, calcTblock (rows for a block of receivers)
+    and resultShape (shape and dtype of the result). If out is a
+    memory-mapped array, the workers write the result directly into it.
+    Otherwise the result is a memmap of its (unlinked) shared file, released
+    with the array.
+    """
+    pool = getPool(n_cpu)
+    nBytes = _sharedBytes(job)
+    if not isinstance(out, np.memmap):
+        shape, dtype = job.resultShape
+        nBytes += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    directory = tempfile.mkdtemp(
+        prefix='simpeg_pf_', dir=_sharedDir(job, nBytes)
+    )
+
+    try:
+        attributes, specs = _shareJob(job, directory)
+
+        if isinstance(out, np.memmap):
+            out.flush()
+            resultSpec = (out.filename, out.shape, out.dtype.str, out.offset)
+        else:
+            shape, dtype = job.resultShape
+            resultSpec = _share(directory, 'result', shape=shape, dtype=dtype)
+
+        nChunk = max(1, min(job.nD, chunksPerWorker*n_cpu))
+        bounds = np.linspace(0, job.nD, nChunk + 1).astype(int)
+        tasks = [
+            (job.__class__, attributes, specs, bounds[ii], bounds[ii+1], resultSpec)
+            for ii in range(nChunk) if bounds[ii+1] > bounds[ii]
+        ]
+        pool.map(_computeChunk, tasks)
+
+        if isinstance(out, np.memmap):
+            result = out
+        else:
+            # the mapping outlives the removal of the file
+            result = _attach(resultSpec, mode='r+')
+            if out is not None:
+                out[...] = result
+                result = out
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return result
+
+
+def _contract(job, start, stop):
+    """
+    Data of receivers start:stop for the models of the job, computed on
+    blocks of rows that are discarded once contracted
+    """
+    nRow = job.nRow
+    blockSize = getattr(job, 'blockSize', stop - start)
+    data = np.empty((nRow*(stop - start), job.models.shape[1]))
+    for ii in range(start, stop, blockSize):
+        jj = min(ii + blockSize, stop)
+        data[nRow*(ii - start):nRow*(jj - start)] = np.dot(
+            job.calcTblock(job.rxLoc[ii:jj, :]), job.models
+        )
+    return data
+
+
+def _streamChunk(args):
+    """
+    Worker: data of receivers start:stop
+    """
+    cls, attributes, specs, start, stop = args
+    job = _attachJob(cls, attributes, specs)
+    return start, stop, _contract(job, start, stop)
+
+
+def stream(job, models, n_cpu=None):
+    """
+    Generator of the data predicted by a Forward job for the models
+    [nC x nModels], for chunks of receivers.
+
+    Yields (start, stop, data) with data [nRow*(stop-start) x nModels] the
+    data of receivers start:stop, rows ordered as in G. The rows of G are
+    computed in blocks and contracted right away, so memory stays bounded by
+    the block size whatever the number of receivers. With n_cpu > 1 the
+    chunks are computed by the persistent pool, in order.
+    """
+    job = copy.copy(job)
+    job.forwardOnly = False
+    job.dtype = np.float64
+    job.out = None
+    job.models = np.asarray(models, dtype=np.float64)
+    if job.models.ndim == 1:
+        job.models = job.models[:, None]
+    job.nD = job.rxLoc.shape[0]
+
+    chunkSize = getattr(job, 'blockSize', job.nD)
+    if n_cpu is None or n_cpu <= 1:
+        for start in range(0, job.nD, chunkSize):
+            stop = min(start + chunkSize, job.nD)
+            yield start, stop, _contract(job, start, stop)
+        return
+
+    chunkSize = max(1, min(
+        chunkSize, int(np.ceil(job.nD / float(chunksPerWorker*n_cpu)))
+    ))
+    pool = getPool(n_cpu)
+    directory = tempfile.mkdtemp(
+        prefix='simpeg_pf_', dir=_sharedDir(job, _sharedBytes(job))
+    )
+    try:
+        attributes, specs = _shareJob(job, directory)
+        tasks = [
+            (job.__class__, attributes, specs, start,
+             min(start + chunkSize, job.nD))
+            for start in range(0, job.nD, chunkSize)
+        ]
+        for chunk in pool.imap(_streamChunk, tasks):
+            yield chunk
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,380 @@
+"""
+On-disk store of the sensitivity matrices of the integral PF problems.
+
+G is written to a memory-mapped .npy file named after a hash of everything
+it depends on (cell geometry of the active cells, receiver locations,
+receiver type and, for magnetics, the magnetization), so later runs and
+parallel inversions map the existing file instead of recomputing it. The
+blocked products below let Jvec, Jtvec and fields work out-of-core on a
+mapped G.
+"""
+from __future__ import print_function
+
+import hashlib
+import os
+import struct
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import scipy.sparse as sp
+
+#: Memory (bytes) of the rows of G read at once by the blocked products
+blockMemory = 2.5e8
+
+
+def sensitivityKey(*args):
+    """
+    Hash of the arrays, sparse matrices and values G depends on
+    """
+    sha = hashlib.sha1()
+    for arg in args:
+        if sp.issparse(arg):
+            arg = arg.tocsr()
+            for array in [arg.data, arg.indices, arg.indptr]:
+                sha.update(np.ascontiguousarray(array))
+            sha.update(str(arg.shape).encode())
+        elif isinstance(arg, np.ndarray):
+            sha.update(np.ascontiguousarray(arg))
+            sha.update(str((arg.shape, arg.dtype.str)).encode())
+        else:
+            sha.update(repr(arg).encode())
+    return sha.hexdigest()
+
+
+class SensitivityStore(object):
+    """
+    Memory-mapped G stored under path, keyed on :code:`sensitivityKey`
+
+    ::
+
+        store = SensitivityStore(path, key)
+        if not store.exists:
+            G = store.create(shape, dtype)
+            ...  # write the rows of G
+            store.commit(G)
+        G = store.load()
+
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+
+    @property
+    def filename(self):
+        return os.path.join(self.path, 'G_{}.npy'.format(self.key))
+
+    @property
+    def exists(self):
+        return os.path.isfile(self.filename)
+
+    def create(self, shape, dtype):
+        """
+        Create a temporary memory-mapped file for the rows of G
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._tmp = '{}.{}.tmp'.format(self.filename, os.getpid())
+        return np.lib.format.open_memmap(
+            self._tmp, mode='w+', dtype=dtype, shape=shape
+        )
+
+    def reuse(self, filename):
+        """
+        Move the file of a superseded G to a temporary file of this store, to
+        be rewritten in place and committed
+        """
+        self._tmp = '{}.{}.tmp'.format(self.filename, os.getpid())
+        os.rename(filename, self._tmp)
+        return self._tmp
+
+    def commit(self, G=None):
+        """
+        Flush the rows of G and make the file available to later runs
+        """
+        if G is not None:
+            G.flush()
+            del G
+        os.rename(self._tmp, self.filename)
+
+    def load(self):
+        """
+        Map the stored G (read-only)
+        """
+        return np.load(self.filename, mmap_mode='r')
+
+
+def _blockRows(G):
+    return int(max(1, blockMemory // (G.shape[1]*G.dtype.itemsize)))
+
+
+def _rows(G, start, stop):
+    if hasattr(G, 'rows'):
+        # compressed G
+        return G.rows(start, stop)
+    return np.asarray(G[start:stop], dtype=np.float64)
+
+
+def _isDiagonal(A):
+    A = sp.coo_matrix(A)
+    return A.shape[0] == A.shape[1] and np.all(A.row == A.col)
+
+
+def dot(G, v):
+    """
+    G*v, reading G in blocks of rows when it is memory-mapped. v can hold
+    several vectors in columns, or be a sparse matrix (or Identity) [nC x k]
+    in which case the dense G*v is formed on blocks of rows.
+    """
+    if not isinstance(v, np.ndarray):
+        if not sp.issparse(v):
+            # Utils.Identity
+            v = v * sp.identity(G.shape[1], format='csr')
+        out = np.empty((G.shape[0], v.shape[1]))
+        nRows = _blockRows(G)
+        for ii in range(0, G.shape[0], nRows):
+            rows = _rows(G, ii, min(ii + nRows, G.shape[0]))
+            out[ii:ii+nRows] = (v.T * rows.T).T
+        return out
+    if hasattr(G, 'dotT'):
+        # compressed, gridded or local G
+        if np.ndim(v) == 2:
+            return np.column_stack([G.dot(v[:, ii]) for ii in range(v.shape[1])])
+        return G.dot(v)
+    v = v.astype(G.dtype)
+    if not isinstance(G, np.memmap):
+        return np.dot(G, v).astype(np.float64)
+
+    out = np.empty((G.shape[0],) + v.shape[1:])
+    nRows = _blockRows(G)
+    for ii in range(0, G.shape[0], nRows):
+        out[ii:ii+nRows] = np.dot(G[ii:ii+nRows], v)
+    return out
+
+
+def dotT(G, v):
+    """
+    G.T*v, reading G in blocks of rows when it is memory-mapped. v can hold
+    several vectors in columns.
+    """
+    if hasattr(G, 'dotT'):
+        # compressed, gridded or local G
+        if np.ndim(v) == 2:
+            return np.column_stack([G.dotT(v[:, ii]) for ii in range(v.shape[1])])
+        return G.dotT(v)
+    v = v.astype(G.dtype)
+    if not isinstance(G, np.memmap):
+        return np.dot(G.T, v).astype(np.float64)
+
+    out = np.zeros((G.shape[1],) + v.shape[1:])
+    nRows = _blockRows(G)
+    for ii in range(0, G.shape[0], nRows):
+        out += np.dot(G[ii:ii+nRows].T, v[ii:ii+nRows])
+    return out
+
+
+def takeRows(G, rows):
+    """
+    Dense rows of G (dense, memory-mapped or compressed) at the given indices
+    """
+    if hasattr(G, 'rows'):
+        return np.vstack(
+            [G.rows(row, row + 1) for row in rows] or [np.zeros((0, G.shape[1]))]
+        )
+    return np.asarray(G[np.asarray(rows, dtype=int)], dtype=np.float64)
+
+
+def _superseded(G, store):
+    """
+    Whether the memory-mapped G is another file of the path of store
+    """
+    filename = getattr(G, 'filename', None)
+    return (
+        store is not None and filename is not None and
+        os.path.isfile(filename) and
+        os.path.abspath(filename) != os.path.abspath(store.filename) and
+        os.path.dirname(os.path.abspath(filename)) ==
+        os.path.abspath(store.path)
+    )
+
+
+def _header(filename, shape):
+    """
+    Data offset of the C-ordered .npy file and its header rewritten for
+    shape, padded to the length of the old one. None if the file has another
+    layout or the new header does not fit.
+    """
+    with open(filename, 'rb') as fp:
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            _, fortran, dtype = np.lib.format.read_array_header_1_0(fp)
+        elif version == (2, 0):
+            _, fortran, dtype = np.lib.format.read_array_header_2_0(fp)
+        else:
+            return None
+        offset = fp.tell()
+    if fortran:
+        return None
+
+    fmt = '<H' if version == (1, 0) else '<I'
+    # magic string, version and header length
+    room = offset - np.lib.format.MAGIC_LEN - struct.calcsize(fmt)
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': tuple(int(n) for n in shape),
+    })
+    if len(header) + 1 > room:
+        return None
+    header = header.ljust(room - 1) + '\n'
+    return offset, struct.pack(fmt, room) + header.encode('latin1')
+
+
+def _writeHeader(filename, header):
+    with open(filename, 'r+b') as fp:
+        fp.seek(np.lib.format.MAGIC_LEN)
+        fp.write(header)
+
+
+def _copyRows(G, rows, store, shape):
+    # G[rows] (G for rows None) followed by the appended rows, copied to a
+    # new file of store
+    nRows = _blockRows(G)
+    out = store.create(shape, G.dtype)
+    nG = G.shape[0] if rows is None else len(rows)
+    for ii in range(0, nG, nRows):
+        stop = min(ii + nRows, nG)
+        out[ii:stop] = G[ii:stop] if rows is None else G[rows[ii:stop]]
+    return out
+
+
+def appendRows(G, rows, store=None):
+    """
+    G with rows appended: in place for a compressed G, in the file of store
+    for a memory-mapped G.
+
+    The file of a memory-mapped G is moved to the new key of store and only
+    the new rows are written to it, so maps of the previous G must not be
+    used afterwards. A file whose header can not be rewritten in place is
+    copied to the new key (an O(size of G) read and write). The file of
+    the previous key is removed.
+    """
+    if hasattr(G, 'select'):
+        # compressed G
+        G.append(rows)
+        return G.finalize()
+
+    if store is None or not isinstance(G, np.memmap):
+        return np.vstack([G, np.asarray(rows, dtype=G.dtype)])
+
+    if not store.exists:
+        shape = (G.shape[0] + rows.shape[0], G.shape[1])
+        header = _header(G.filename, shape) if _superseded(G, store) else None
+        if header is None:
+            out = _copyRows(G, None, store, shape)
+            out[G.shape[0]:] = rows
+            store.commit(out)
+        else:
+            offset, header = header
+            tmp = store.reuse(G.filename)
+            with open(tmp, 'r+b') as fp:
+                fp.seek(offset + G.shape[0]*G.shape[1]*G.dtype.itemsize)
+                fp.write(np.ascontiguousarray(rows, dtype=G.dtype).tobytes())
+            _writeHeader(tmp, header)
+            store.commit()
+    if _superseded(G, store):
+        os.remove(G.filename)
+    return store.load()
+
+
+def selectRows(G, rows, store=None):
+    """
+    G reduced to the given rows: in place for a compressed G, in the file
+    of store for a memory-mapped G.
+
+    The kept rows of a memory-mapped G are moved up in its file, which is
+    then moved to the new key of store: the rows after the first dropped one
+    are read and written once, and maps of the previous G must not be used
+    afterwards. The file keeps its size, the space is reused by later
+    appends. Unsorted rows, or a file whose header can not be
+    rewritten in place, are copied to the new key. The file of the previous
+    key is removed.
+    """
+    if hasattr(G, 'select'):
+        # compressed G
+        return G.select(rows)
+
+    if store is None or not isinstance(G, np.memmap):
+        return G[rows]
+
+    if not store.exists:
+        rows = np.asarray(rows, dtype=int)
+        shape = (len(rows), G.shape[1])
+        header = None
+        if _superseded(G, store) and np.all(np.diff(rows) > 0):
+            header = _header(G.filename, shape)
+        if header is None:
+            store.commit(_copyRows(G, rows, store, shape))
+        else:
+            offset, header = header
+            nRows = _blockRows(G)
+            tmp = store.reuse(G.filename)
+            out = np.memmap(
+                tmp, dtype=G.dtype, mode='r+', offset=offset, shape=G.shape
+            )
+            # the sorted rows only move up: a block never overwrites rows
+            # that are still to be read
+            moved = np.flatnonzero(rows != np.arange(len(rows)))
+            start = moved[0] if len(moved) else len(rows)
+            for ii in range(start, len(rows), nRows):
+                stop = min(ii + nRows, len(rows))
+                out[ii:stop] = out[rows[ii:stop]]
+            out.flush()
+            del out
+            _writeHeader(tmp, header)
+            store.commit()
+    if _superseded(G, store):
+        os.remove(G.filename)
+    return store.load()
+
+
+def jtjDiag(G, w=None, dmudm=None, n_cpu=None):
+    """
+    Diagonal of (W G dmudm).T (W G dmudm) with W = diag(w), computed on
+    blocks of rows of G (dense, memory-mapped or compressed). The blocks are
+    shared between n_cpu threads when n_cpu > 1.
+    """
+    nD, nC = G.shape
+    w = np.ones(nD) if w is None else np.asarray(w, dtype=np.float64)
+    if not (dmudm is None or sp.issparse(dmudm) or isinstance(dmudm, np.ndarray)):
+        # Utils.Identity
+        dmudm = None
+
+    # A diagonal dmudm is applied once to the summed squares
+    diagonal = dmudm is None or _isDiagonal(dmudm)
+
+    def blockSum(start):
+        stop = min(start + nRows, nD)
+        rows = w[start:stop, None] * _rows(G, start, stop)
+        if not diagonal:
+            rows = (dmudm.T * rows.T).T
+        return np.sum(rows**2., axis=0)
+
+    nRows = _blockRows(G)
+    starts = range(0, nD, nRows)
+    if n_cpu is not None and n_cpu > 1 and len(starts) > 1:
+        pool = ThreadPool(n_cpu)
+        try:
+            out = np.sum(pool.map(blockSum, starts), axis=0)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        out = np.zeros(nC if diagonal else dmudm.shape[1])
+        for start in starts:
+            out += blockSum(start)
+
+    if dmudm is not None and diagonal:
+        out = np.asarray(sp.csr_matrix(dmudm).diagonal())**2. * out
+
+    return out
@@ -1,5 +1,10 @@
 from . import MagAnalytics
 from . import GravAnalytics
+from . import ParallelForward
+from . import SensitivityStore
+from . import CompressedSensitivity
+from . import GriddedSensitivity
+from . import LocalSensitivity
 from . import BaseMag
 from . import Magnetics
 from . import BaseGrav
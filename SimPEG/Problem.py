@@ -144,12 +144,15 @@ class BaseProblem(Props.HasModel):
                 delattr(self, prop)
 
         # matrix factors to clear
+        self._clean_factors()
+
+    def _clean_factors(self):
+        """Clean the matrix factors listed in clean_on_model_update"""
         for mat in self.clean_on_model_update:
             if getattr(self, mat, None) is not None:
                 getattr(self, mat).clean()  # clean factors
                 setattr(self, mat, None)  # set to none
 
-
     @property
     def ispaired(self):
         """True if the problem is paired to a survey."""
@@ -308,6 +311,15 @@ class LinearProblem(BaseProblem):
     def fields(self, m):
         return self.G.dot(self.modelMap * m)
 
+    def fieldsEnsemble(self, M):
+        """
+            Fields of the models M [nP x nModels], as one product with G
+
+            :rtype: numpy.ndarray
+            :return: fields [nD x nModels]
+        """
+        return self.G.dot(self.modelMap.transformEnsemble(M))
+
     def getJ(self, m, f=None):
         """
             Sensitivity matrix
@@ -97,6 +97,15 @@ class StraightRayProblem(Problem.LinearProblem):
         self.model = m
         return self.A * self.slowness
 
+    def fieldsEnsemble(self, M):
+        """
+            Travel times of the models M [nP x nModels], as one product
+            with A
+        """
+        if self.slownessMap is None:
+            return self.A * np.asarray(M)
+        return self.A * self.slownessMap.transformEnsemble(M)
+
     def Jvec(self, m, v, f=None):
         self.model = m
         # mt = self.model.transformDeriv
@@ -125,6 +125,39 @@ class BaseTimeRx(BaseRx):
 
         return P
 
+    def getSpaceTimeP(self, mesh, timeMesh):
+        """
+            Returns the spatial and time projection matrices (Ps, Pt), to be
+            applied separably on the space and time axes of a field, as
+            :code:`Ps * u * Pt.T`, instead of forming kron(Pt, Ps).
+
+            .. note::
+
+                Pt is in csc format, so that the weights of a time index are
+                a column.
+        """
+        key = (mesh, timeMesh, 'separable')
+        if key in self._Ps:
+            return self._Ps[key]
+
+        P = self.getSpatialP(mesh), sp.csc_matrix(self.getTimeP(timeMesh))
+
+        if self.storeProjections:
+            self._Ps[key] = P
+
+        return P
+
+    @staticmethod
+    def timeFootprint(Pt):
+        """
+            Slice of the time indices with nonzero weights in the time
+            projection Pt (csc)
+        """
+        tInds = np.flatnonzero(np.diff(Pt.indptr))
+        if tInds.size == 0:
+            return slice(0, 0)
+        return slice(tInds[0], tInds[-1] + 1)
+
 
 class BaseSrc(Props.BaseSimPEG):
     """SimPEG Source Object"""
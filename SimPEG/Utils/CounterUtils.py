@@ -38,15 +38,31 @@ class Counter(object):
     def __init__(self):
         self._countList = {}
         self._timeList = {}
+        self._valueList = {}
 
-    def count(self, prop):
+    def count(self, prop, n=1):
         """
-            Increases the count of the property.
+            Increases the count of the property by n.
         """
         assert isinstance(prop, string_types), 'The property must be a string.'
         if prop not in self._countList:
             self._countList[prop] = 0
-        self._countList[prop] += 1
+        self._countList[prop] += n
+
+    def record(self, prop, value):
+        """
+            Records a value (e.g. a residual) of the property.
+        """
+        assert isinstance(prop, string_types), 'The property must be a string.'
+        if prop not in self._valueList:
+            self._valueList[prop] = []
+        self._valueList[prop].append(value)
+
+    def values(self, prop):
+        """
+            Returns the recorded values of the property.
+        """
+        return np.array(self._valueList.get(prop, []))
 
     def countTic(self, prop):
         """
@@ -77,6 +93,13 @@ class Counter(object):
             l = len(self._timeList[prop])
             a = np.array(self._timeList[prop])
             print("  {0:<40}: {1:4.2e}, {2:4.2e}, {3:4d}x".format(prop, a.mean(), a.sum(), l))
+        if len(self._valueList) == 0:
+            return
+        print('\nValues:'+' '*39+'mean      max')
+        for prop in sorted(self._valueList):
+            l = len(self._valueList[prop])
+            a = np.array(self._valueList[prop])
+            print("  {0:<40}: {1:4.2e}, {2:4.2e}, {3:4d}x".format(prop, a.mean(), a.max(), l))
 
 
 def count(f):
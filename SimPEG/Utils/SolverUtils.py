@@ -1,7 +1,14 @@
 from __future__ import print_function
 import numpy as np
+import scipy.sparse as sp
 from scipy.sparse import linalg
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import time
 from .matutils import mkvc
+from six import string_types
 import warnings
 
 def _checkAccuracy(A, b, X, accuracyTol):
@@ -13,18 +20,125 @@ def _checkAccuracy(A, b, X, accuracyTol):
         msg = '### SolverWarning ###: Accuracy on solve is above tolerance: {0:e} > {1:e}'.format(nrm, accuracyTol)
         print(msg)
         warnings.warn(msg, RuntimeWarning)
+    return nrm
 
 
-def SolverWrapD(fun, factorize=True, checkAccuracy=True, accuracyTol=1e-6, name=None):
+def _checkThisSolve(self):
+    """
+    Count a solve and tell if its accuracy is checked, following the
+    :code:`checkAccuracy` policy of the solver: :code:`True` (every solve),
+    :code:`False` (never) or an integer N (every Nth solve).
+    """
+    self._nSolves = getattr(self, '_nSolves', 0) + 1
+    check = self.checkAccuracy
+    if not check:
+        return False
+    return check is True or (self._nSolves - 1) % int(check) == 0
+
+
+def _sampledCheckAccuracy(self, b, X):
+    """
+    Check the accuracy of a solve following the :code:`checkAccuracy`
+    policy of the solver (see :code:`_checkThisSolve`). If
+    :code:`checkColumns` is set, only that many randomly chosen columns of
+    a multiple RHS solve are checked. Returns the relative residual, or
+    None if it was not checked.
+    """
+    if not _checkThisSolve(self):
+        return None
+
+    nCols = getattr(self, 'checkColumns', None)
+    if nCols is not None and X.ndim == 2 and X.shape[1] > nCols:
+        cols = np.sort(np.random.choice(X.shape[1], nCols, replace=False))
+        b, X = b[:, cols], X[:, cols]
+    return _checkAccuracy(self.A, b, X, self.accuracyTol)
+
+
+class SolverDiagnostics(object):
+    """
+    Opt-in record of the cost of the solvers.
+
+    ::
+
+        diagnostics = SolverDiagnostics()
+        prob.solverOpts = {'diagnostics': diagnostics, 'checkAccuracy': 10}
+        ...
+        diagnostics.summary()
+        diagnostics.query(event='factor', tag=3)
+
+    Solvers created with a :code:`diagnostics` option record a
+    :code:`'factor'` event (factor time, fill-in and factor memory) and a
+    :code:`'solve'` event (solve time, number of RHS and the residual, if
+    it was checked) per call. Set :code:`tag` (e.g. to the inversion
+    iteration) to label the records that follow.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.tag = None
+
+    def record(self, solver, event, **values):
+        """Add a record for a solver instance"""
+        values.update({
+            'solver': solver.__class__.__name__, 'id': id(solver),
+            'event': event, 'tag': self.tag
+        })
+        self.records.append(values)
+
+    def query(self, **filters):
+        """Records whose fields match all of the given values"""
+        return [
+            r for r in self.records
+            if all(r.get(key) == value for key, value in filters.items())
+        ]
+
+    def total(self, key, **filters):
+        """Sum of a numeric field over the matching records"""
+        return sum(
+            r[key] for r in self.query(**filters) if r.get(key) is not None
+        )
+
+    def summary(self):
+        """Print the cost per solver class"""
+        print('Solver diagnostics:')
+        for name in sorted(set(r['solver'] for r in self.records)):
+            factors = self.query(solver=name, event='factor')
+            solves = self.query(solver=name, event='solve')
+            residuals = [
+                r['residual'] for r in solves if r['residual'] is not None
+            ]
+            print(
+                "  {0:<20}: {1:4d} factors {2:4.2e} s, {3:6d} rhs "
+                "{4:4.2e} s, {5:4.2e} bytes, max residual {6}".format(
+                    name, len(factors), self.total('time', solver=name,
+                                                   event='factor'),
+                    self.total('nRHS', solver=name, event='solve'),
+                    self.total('time', solver=name, event='solve'),
+                    self.total('memory', solver=name, event='factor'),
+                    '{:4.2e}'.format(max(residuals)) if residuals else '-'
+                )
+            )
+
+
+def SolverWrapD(fun, factorize=True, checkAccuracy=True, accuracyTol=1e-6, blockSize=None, name=None):
     """
     Wraps a direct Solver.
 
+    The :code:`checkAccuracy`, :code:`checkColumns` and :code:`diagnostics`
+    options are described in :code:`_sampledCheckAccuracy` and
+    :code:`SolverDiagnostics`.
+
     ::
 
         import scipy.sparse as sp
         Solver   = SolverUtils.SolverWrapD(sp.linalg.spsolve, factorize=False)
         SolverLU = SolverUtils.SolverWrapD(sp.linalg.splu, factorize=True)
 
+    Multiple right hand sides are handed to the wrapped solver in blocks of
+    :code:`blockSize` columns (all columns at once if :code:`None`), and the
+    solutions are written in place into a single preallocated output array.
+    If the wrapped solver cannot take a 2D block, the columns are solved one
+    at a time.
     """
 
     def __init__(self, A, **kwargs):
@@ -34,16 +148,54 @@ def SolverWrapD(fun, factorize=True, checkAccuracy=True, accuracyTol=1e-6, name=
         if "checkAccuracy" in kwargs: del kwargs["checkAccuracy"]
         self.accuracyTol = kwargs.get("accuracyTol", accuracyTol)
         if "accuracyTol" in kwargs: del kwargs["accuracyTol"]
+        self.blockSize = kwargs.get("blockSize", blockSize)
+        if "blockSize" in kwargs: del kwargs["blockSize"]
+        self.checkColumns = kwargs.pop("checkColumns", None)
+        self.diagnostics = kwargs.pop("diagnostics", None)
 
         self.kwargs = kwargs
+        self._blockSolve = True
 
         if factorize:
+            tic = time.time()
             self.solver = fun(self.A, **kwargs)
+            if self.diagnostics is not None:
+                nnz = getattr(self.solver, 'nnz', None)
+                self.diagnostics.record(
+                    self, 'factor', time=time.time() - tic,
+                    fillIn=None if nnz is None else float(nnz) / max(self.A.nnz, 1),
+                    memory=_factorMemory(self)
+                )
+
+    def _solveBlock(self, b):
+        if factorize:
+            return self.solver.solve(b)
+        return fun(self.A, b, **self.kwargs)
+
+    def _solveM(self, b, X):
+        n = b.shape[1]
+        bs = n if self.blockSize is None else max(int(self.blockSize), 1)
+
+        for start in range(0, n, bs):
+            cols = slice(start, min(start + bs, n))
+            if self._blockSolve:
+                try:
+                    X[:, cols] = self._solveBlock(b[:, cols]).reshape(
+                        (b.shape[0], -1)
+                    )
+                    continue
+                except (ValueError, TypeError):
+                    # the wrapped solver only handles a single RHS
+                    self._blockSolve = False
+            for i in range(cols.start, cols.stop):
+                X[:, i] = self._solveBlock(b[:, i])
+        return X
 
     def __mul__(self, b):
         if type(b) is not np.ndarray:
             raise TypeError('Can only multiply by a numpy array.')
 
+        tic = time.time()
         if len(b.shape) == 1 or b.shape[1] == 1:
             b = b.flatten()
             # Just one RHS
@@ -51,31 +203,37 @@ def SolverWrapD(fun, factorize=True, checkAccuracy=True, accuracyTol=1e-6, name=
             if b.dtype is np.dtype('O'):
                 b = b.astype(type(b[0]))
 
-            if factorize:
-                X = self.solver.solve(b, **self.kwargs)
-            else:
-                X = fun(self.A, b, **self.kwargs)
+            X = self._solveBlock(b)
         else: # Multiple RHSs
             if b.dtype is np.dtype('O'):
                 b = b.astype(type(b[0,0]))
 
-            X = np.empty_like(b)
-
-            for i in range(b.shape[1]):
-                if factorize:
-                    X[:,i] = self.solver.solve(b[:,i])
-                else:
-                    X[:,i] = fun(self.A, b[:,i], **self.kwargs)
+            X = np.empty(
+                b.shape, dtype=np.result_type(self.A.dtype, b.dtype),
+                order='F'
+            )
+            X = self._solveM(b, X)
+        elapsed = time.time() - tic
 
-        if self.checkAccuracy:
-            _checkAccuracy(self.A, b, X, self.accuracyTol)
+        nrm = _sampledCheckAccuracy(self, b, X)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=elapsed, residual=nrm,
+                nRHS=1 if X.ndim == 1 else X.shape[1]
+            )
         return X
 
     def clean(self):
         if factorize and hasattr(self.solver, 'clean'):
             return self.solver.clean()
 
-    return type(name if name is not None else fun.__name__, (object,), {"__init__": __init__, "clean": clean, "__mul__": __mul__})
+    return type(
+        name if name is not None else fun.__name__, (object,),
+        {
+            "__init__": __init__, "clean": clean, "__mul__": __mul__,
+            "_solveBlock": _solveBlock, "_solveM": _solveM
+        }
+    )
 
 
 
@@ -97,6 +255,8 @@ def SolverWrapI(fun, checkAccuracy=True, accuracyTol=1e-5, name=None):
         if "checkAccuracy" in kwargs: del kwargs["checkAccuracy"]
         self.accuracyTol = kwargs.get("accuracyTol", accuracyTol)
         if "accuracyTol" in kwargs: del kwargs["accuracyTol"]
+        self.checkColumns = kwargs.pop("checkColumns", None)
+        self.diagnostics = kwargs.pop("diagnostics", None)
 
         self.kwargs = kwargs
 
@@ -104,6 +264,7 @@ def SolverWrapI(fun, checkAccuracy=True, accuracyTol=1e-5, name=None):
         if type(b) is not np.ndarray:
             raise TypeError('Can only multiply by a numpy array.')
 
+        tic = time.time()
         if len(b.shape) == 1 or b.shape[1] == 1:
             b = b.flatten()
             # Just one RHS
@@ -124,9 +285,14 @@ def SolverWrapI(fun, checkAccuracy=True, accuracyTol=1e-5, name=None):
                     self.info = out[1]
                 else:
                     X[:,i] = out
+        elapsed = time.time() - tic
 
-        if self.checkAccuracy:
-            _checkAccuracy(self.A, b, X, self.accuracyTol)
+        nrm = _sampledCheckAccuracy(self, b, X)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=elapsed, residual=nrm,
+                nRHS=1 if X.ndim == 1 else X.shape[1]
+            )
         return X
 
     def clean(self):
@@ -135,26 +301,100 @@ def SolverWrapI(fun, checkAccuracy=True, accuracyTol=1e-5, name=None):
     return type(name if name is not None else fun.__name__, (object,), {"__init__": __init__, "clean": clean, "__mul__": __mul__})
 
 
+class SpluReuse(object):
+    """
+    :code:`scipy.sparse.linalg.splu` factorization that re-uses the
+    fill-reducing column ordering of an earlier matrix with the same sparsity
+    pattern.
+
+    The ordering (and its elimination tree post-ordering) from the first
+    factorization of a pattern is stored, and later matrices with that
+    pattern (e.g. the system matrix of a problem for a new model) are
+    factored in the stored order, so only the numeric phase is repeated.
+    Set :code:`reuseOrdering=False` to always compute a new ordering.
+    """
+
+    maxOrderings = 16  #: number of sparsity patterns whose ordering is kept
+    _orderings = OrderedDict()
+
+    def __init__(self, A, reuseOrdering=True, **kwargs):
+        A = A.tocsc()
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+
+        key = self._patternKey(A)
+        perm_c = self._orderings.get(key) if reuseOrdering else None
+
+        if perm_c is None:
+            self.lu = linalg.splu(A, **kwargs)
+            self._q = None
+            if reuseOrdering:
+                self._storeOrdering(key, self.lu.perm_c)
+        else:
+            # perm_c[i] = j: column i of A is column j of the permuted matrix
+            self._q = np.argsort(perm_c)
+            kwargs['permc_spec'] = 'NATURAL'
+            self.lu = linalg.splu(A[:, self._q], **kwargs)
+
+    @staticmethod
+    def _patternKey(A):
+        sha = hashlib.sha1()
+        sha.update(np.ascontiguousarray(A.indptr))
+        sha.update(np.ascontiguousarray(A.indices))
+        return (A.shape, A.nnz, sha.hexdigest())
+
+    @classmethod
+    def _storeOrdering(cls, key, perm_c):
+        cls._orderings[key] = perm_c
+        while len(cls._orderings) > cls.maxOrderings:
+            cls._orderings.popitem(last=False)
+
+    @property
+    def nnz(self):
+        return self.lu.nnz
+
+    def solve(self, b, trans='N'):
+        if self._q is None:
+            return self.lu.solve(b, trans=trans)
+        if trans == 'N':
+            # A[:, q] y = b  =>  A x = b with x[q] = y
+            y = self.lu.solve(b)
+            x = np.empty_like(y)
+            x[self._q] = y
+            return x
+        # (A[:, q])^T z = b[q]  <=>  A^T z = b
+        return self.lu.solve(b[self._q], trans=trans)
+
+
 Solver   = SolverWrapD(linalg.spsolve, factorize=False, name="Solver")
 SolverLU = SolverWrapD(linalg.splu, factorize=True, name="SolverLU")
+SolverLUReuse = SolverWrapD(SpluReuse, factorize=True, name="SolverLUReuse")
 SolverCG = SolverWrapI(linalg.cg, name="SolverCG")
 SolverBiCG = SolverWrapI(linalg.bicgstab, name="SolverBiCG")
 
 class SolverDiag(object):
     """docstring for SolverDiag"""
-    def __init__(self, A):
+    def __init__(self, A, diagnostics=None):
         self.A = A
         self._diagonal = A.diagonal()
+        self.diagnostics = diagnostics
 
     def __mul__(self, rhs):
         n = self.A.shape[0]
         assert rhs.size % n == 0, 'Incorrect shape of rhs.'
         nrhs = rhs.size // n
 
+        tic = time.time()
         if len(rhs.shape) == 1 or rhs.shape[1] == 1:
             x = self._solve1(rhs)
         else:
             x = self._solveM(rhs)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=time.time() - tic, residual=None,
+                nRHS=nrhs
+            )
 
         if nrhs == 1:
             return x.flatten()
@@ -171,3 +411,614 @@ class SolverDiag(object):
 
     def clean(self):
         pass
+
+
+def _iterativeSolve(fun, A, b, tol, **kwargs):
+    # scipy >= 1.12 renamed the relative tolerance from tol to rtol
+    try:
+        return fun(A, b, rtol=tol, **kwargs)
+    except TypeError:
+        return fun(A, b, tol=tol, **kwargs)
+
+
+class SolverIterative(object):
+    """
+    Preconditioned iterative solver for systems too large to factor.
+
+    ::
+
+        prob.Solver = SolverPCG
+        prob.solverOpts = {
+            'preconditioner': 'ilu', 'tol': 1e-8, 'counter': prob.counter
+        }
+
+    The preconditioner (:code:`None`, :code:`'jacobi'`,
+    :code:`'blockjacobi'` or :code:`'ilu'`) is built once per matrix, when the
+    solver is created, and re-used by every solve. With :code:`warmStart`,
+    the solution for each RHS column is kept and used as the initial guess
+    for the same column of the next solve of the same shape with this
+    solver (e.g. successive time steps sharing a system), until
+    :code:`clean`. If a :code:`counter` is given,
+    the number of solves and iterations, and the relative residual of each
+    column, are recorded on it. :code:`checkAccuracy` and
+    :code:`diagnostics` are the options of :code:`SolverWrapD`.
+    """
+
+    method = 'bicgstab'  #: 'cg', 'bicgstab', 'gmres' or 'minres'
+    preconditioner = 'jacobi'  #: None, 'jacobi', 'blockjacobi' or 'ilu'
+    tol = 1e-6  #: relative tolerance of the iterative method
+    maxiter = None  #: maximum number of iterations per RHS
+    warmStart = True  #: start from the previous solution of each RHS column
+    blockSize = 64  #: size of the diagonal blocks for 'blockjacobi'
+    dropTol = 1e-4  #: drop tolerance of the incomplete LU factors for 'ilu'
+    fillFactor = 10  #: fill factor of the incomplete LU factors for 'ilu'
+    checkAccuracy = True
+    accuracyTol = 1e-5
+    counter = None
+    diagnostics = None
+
+    _methods = {
+        'cg': linalg.cg, 'bicgstab': linalg.bicgstab, 'gmres': linalg.gmres,
+        'minres': linalg.minres
+    }
+
+    def __init__(self, A, **kwargs):
+        for key, value in kwargs.items():
+            if not hasattr(self, key):
+                raise TypeError(
+                    '{} is not a valid option of {}'.format(
+                        key, self.__class__.__name__
+                    )
+                )
+            setattr(self, key, value)
+
+        if self.method not in self._methods:
+            raise ValueError(
+                'method must be one of {}, not {}'.format(
+                    sorted(self._methods.keys()), self.method
+                )
+            )
+
+        self.A = A.tocsr()
+        tic = time.time()
+        self.M = self._getPreconditioner()
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'factor', time=time.time() - tic, fillIn=None,
+                memory=_factorMemory(self)
+            )
+        self.iterations = []
+        self.residuals = []
+        self._lastSolutions = {}  # previous solution of this A per shape
+
+    def _getPreconditioner(self):
+        A = self.A
+        n = A.shape[0]
+
+        if self.preconditioner is None:
+            return None
+
+        elif self.preconditioner == 'jacobi':
+            d = A.diagonal()
+            d[d == 0] = 1.
+            return sp.diags(1./d)
+
+        elif self.preconditioner == 'blockjacobi':
+            # the block diagonal part of A, factored as a single matrix
+            Ac = A.tocoo()
+            inBlock = Ac.row // self.blockSize == Ac.col // self.blockSize
+            Ab = sp.csc_matrix(
+                (Ac.data[inBlock], (Ac.row[inBlock], Ac.col[inBlock])),
+                shape=A.shape
+            )
+            lu = linalg.splu(Ab)
+            return linalg.LinearOperator(A.shape, lu.solve, dtype=A.dtype)
+
+        elif self.preconditioner == 'ilu':
+            ilu = linalg.spilu(
+                A.tocsc(), drop_tol=self.dropTol, fill_factor=self.fillFactor
+            )
+            return linalg.LinearOperator(A.shape, ilu.solve, dtype=A.dtype)
+
+        raise ValueError(
+            'preconditioner must be None, jacobi, blockjacobi or ilu, '
+            'not {}'.format(self.preconditioner)
+        )
+
+    def _solve1(self, b, x0):
+        iters = [0]
+
+        def callback(xk):
+            iters[0] += 1
+
+        x, info = _iterativeSolve(
+            self._methods[self.method], self.A, b, self.tol, x0=x0,
+            M=self.M, maxiter=self.maxiter, callback=callback
+        )
+        if info < 0:
+            raise RuntimeError(
+                '{} failed with info = {}'.format(self.method, info)
+            )
+
+        nrm_b = np.linalg.norm(b)
+        res = np.linalg.norm(b - self.A*x)
+        self.iterations.append(iters[0])
+        self.residuals.append(res/nrm_b if nrm_b > 0 else res)
+        return x
+
+    def __mul__(self, b):
+        if type(b) is not np.ndarray:
+            raise TypeError('Can only multiply by a numpy array.')
+
+        single = len(b.shape) == 1 or b.shape[1] == 1
+        if single:
+            b = b.flatten()
+            B = b.reshape((-1, 1), order='F')
+        else:
+            B = b
+        if B.dtype is np.dtype('O'):
+            B = B.astype(type(B.flat[0]))
+
+        tic = time.time()
+        X = np.empty(
+            B.shape, dtype=np.result_type(self.A.dtype, B.dtype), order='F'
+        )
+        key = (B.shape, X.dtype)
+        X0 = self._lastSolutions.get(key) if self.warmStart else None
+
+        nSolves = len(self.iterations)
+        for i in range(B.shape[1]):
+            X[:, i] = self._solve1(B[:, i], None if X0 is None else X0[:, i])
+
+        if self.warmStart:
+            self._lastSolutions.clear()
+            self._lastSolutions[key] = X.copy()
+
+        if self.counter is not None:
+            name = self.__class__.__name__
+            self.counter.count(name+'.solve', B.shape[1])
+            self.counter.count(
+                name+'.iterations', sum(self.iterations[nSolves:])
+            )
+            for res in self.residuals[nSolves:]:
+                self.counter.record(name+'.residual', res)
+
+        nrm = None
+        if _checkThisSolve(self):
+            # the residuals of the solves are already known
+            nrm = max(self.residuals[nSolves:])
+            if nrm > self.accuracyTol:
+                msg = '### SolverWarning ###: Accuracy on solve is above tolerance: {0:e} > {1:e}'.format(nrm, self.accuracyTol)
+                print(msg)
+                warnings.warn(msg, RuntimeWarning)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=time.time() - tic, residual=nrm,
+                nRHS=B.shape[1]
+            )
+
+        if single:
+            X = X.flatten()
+        return X
+
+    def clean(self):
+        self.M = None
+        self._lastSolutions = {}
+
+
+class SolverPCG(SolverIterative):
+    """Preconditioned conjugate gradient, for symmetric positive definite A"""
+    method = 'cg'
+
+
+class SolverPBiCG(SolverIterative):
+    """Preconditioned BiCGStab"""
+    method = 'bicgstab'
+
+
+class SolverPGMRES(SolverIterative):
+    """Preconditioned GMRES"""
+    method = 'gmres'
+
+
+class SolverLUMixed(object):
+    """
+    LU solver that factors in single precision and refines to double.
+
+    ::
+
+        prob.Solver = SolverLUMixed
+        prob.solverOpts = {'accuracyTol': 1e-8}
+
+    The matrix is factored with :code:`scipy.sparse.linalg.splu` in
+    float32 (complex64 for complex matrices), halving the memory of the
+    factors, and each solve is refined against the double precision matrix
+    until the relative residual (infinity norm) is below
+    :code:`accuracyTol`. If the refinement stalls or :code:`maxRefine`
+    steps are not enough, the matrix is factored in double precision and
+    that factor is used from then on. :code:`checkAccuracy` (for the
+    double precision solves), :code:`checkColumns` and :code:`diagnostics`
+    are the options of :code:`SolverWrapD`.
+    """
+
+    def __init__(
+        self, A, accuracyTol=1e-6, maxRefine=10, checkAccuracy=True,
+        checkColumns=None, diagnostics=None, **kwargs
+    ):
+        self.A = A.tocsc()
+        self.accuracyTol = accuracyTol
+        self.maxRefine = maxRefine
+        self.checkAccuracy = checkAccuracy
+        self.checkColumns = checkColumns
+        self.diagnostics = diagnostics
+        self.kwargs = kwargs
+
+        self.factorDtype = (
+            np.complex64 if np.iscomplexobj(self.A.data) else np.float32
+        )
+        self._factor(self.A.astype(self.factorDtype))
+        self.fallback = False
+        self.refinements = []
+
+    def _factor(self, A):
+        tic = time.time()
+        self.solver = linalg.splu(A, **self.kwargs)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'factor', time=time.time() - tic,
+                fillIn=float(self.solver.nnz) / max(self.A.nnz, 1),
+                memory=_factorMemory(self)
+            )
+
+    def _fallback(self):
+        # single precision is not enough for this matrix
+        self.factorDtype = self.A.dtype
+        self._factor(self.A)
+        self.fallback = True
+
+    def _residual(self, b, X):
+        r = b - self.A*X
+        # per column, a single RHS is a 1D b
+        nrm_b = np.atleast_1d(np.abs(b).max(axis=0))
+        nrm_b[nrm_b == 0] = 1.
+        return r, (np.atleast_1d(np.abs(r).max(axis=0))/nrm_b).max()
+
+    def _solveLow(self, r):
+        # scale before casting so small residuals are not lost to underflow
+        scale = np.abs(r).max()
+        if scale == 0:
+            return np.zeros_like(r)
+        rLow = (r/scale).astype(self.factorDtype)
+        return self.solver.solve(rLow).astype(r.dtype)*scale
+
+    def __mul__(self, b):
+        if type(b) is not np.ndarray:
+            raise TypeError('Can only multiply by a numpy array.')
+
+        if len(b.shape) == 1 or b.shape[1] == 1:
+            b = b.flatten()
+        if b.dtype is np.dtype('O'):
+            b = b.astype(type(b.flat[0]))
+        b = b.astype(np.result_type(self.A.dtype, b.dtype))
+
+        tic = time.time()
+        X, nrm = self._solve(b)
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=time.time() - tic, residual=nrm,
+                nRHS=1 if X.ndim == 1 else X.shape[1]
+            )
+        return X
+
+    def _solve(self, b):
+        if self.fallback:
+            return self._solveDouble(b)
+
+        X = self._solveLow(b)
+        r, nrm = self._residual(b, X)
+        nRefine = 0
+        while nrm > self.accuracyTol:
+            if nRefine == self.maxRefine:
+                self._fallback()
+                return self._solveDouble(b)
+            X += self._solveLow(r)
+            r, nrm_new = self._residual(b, X)
+            nRefine += 1
+            if nrm_new > 0.5*nrm:
+                # refinement is not converging
+                self._fallback()
+                return self._solveDouble(b)
+            nrm = nrm_new
+
+        self.refinements.append(nRefine)
+        return X, nrm
+
+    def _solveDouble(self, b):
+        X = self.solver.solve(b)
+        return X, _sampledCheckAccuracy(self, b, X)
+
+    def clean(self):
+        self.solver = None
+
+
+def _solverCandidates(accuracyTol=1e-6):
+    """
+    Solvers probed by :code:`SolverAuto`, as name: (Solver, solverOpts).
+    Optional direct solvers from pymatsolver are included when installed.
+    """
+    # the accuracy is checked by SolverAuto when probing
+    opts = {'checkAccuracy': False, 'accuracyTol': accuracyTol}
+    # the iterative solvers stop at the accuracy that is checked
+    iterOpts = dict(opts, maxiter=1000, tol=accuracyTol)
+    candidates = OrderedDict([
+        ('Solver', (Solver, opts)),
+        ('SolverLU', (SolverLU, opts)),
+        ('SolverLUMixed', (SolverLUMixed, opts)),
+        ('SolverCG', (SolverCG, iterOpts)),
+        ('SolverBiCG', (SolverBiCG, iterOpts)),
+        ('SolverPBiCG', (SolverPBiCG, iterOpts)),
+    ])
+    try:
+        from pymatsolver import Pardiso
+        candidates['Pardiso'] = (Pardiso, {})
+    except ImportError:
+        pass
+    try:
+        from pymatsolver import Mumps
+        candidates['Mumps'] = (Mumps, {})
+    except ImportError:
+        pass
+    return candidates
+
+
+class SolverAuto(object):
+    """
+    Solver that picks the fastest available backend for a matrix.
+
+    ::
+
+        prob.Solver = SolverAuto
+        prob.solverOpts = {'problemClass': prob.__class__.__name__}
+
+    The first time a kind of matrix is seen, each candidate solver (see
+    :code:`candidates`) is set up and used to solve :code:`nProbe` random
+    right hand sides. The fastest one that reaches :code:`accuracyTol` is
+    used, and the decision is stored in :code:`cacheFile` (JSON) keyed on
+    the problem class, the size, the number of non-zeros, the dtype and the
+    sparsity pattern of the matrix, so later runs skip the probing. Set
+    :code:`cacheFile=None` to only keep decisions for the current session.
+    The default candidates solve to :code:`accuracyTol`; candidates that
+    fail to set up or solve (missing backend, singular or ill-conditioned
+    matrix) are skipped. With :code:`diagnostics`, the set up (probing
+    included) of the chosen solver and its solves are recorded under
+    SolverAuto, the candidates do not need to support the option.
+    """
+
+    #: errors of a candidate that fails on a matrix, or is not installed
+    _probeErrors = (
+        ImportError, RuntimeError, MemoryError, ValueError,
+        np.linalg.LinAlgError
+    )
+
+    cacheFile = os.path.join(
+        os.path.expanduser('~'), '.simpeg', 'solver_decisions.json'
+    )  #: file the decisions are stored in
+    _decisions = {}
+
+    def __init__(
+        self, A, problemClass=None, candidates=None, nProbe=2,
+        accuracyTol=1e-6, cacheFile='default', diagnostics=None, **kwargs
+    ):
+        tic = time.time()
+        self.diagnostics = diagnostics
+        if cacheFile != 'default':
+            self.cacheFile = cacheFile
+        if candidates is None:
+            candidates = _solverCandidates(accuracyTol)
+        if not isinstance(problemClass, string_types + (type(None),)):
+            problemClass = problemClass.__name__
+
+        # the pattern tells apart matrices of problems of the same size
+        Ac = A.tocsc()
+        if not Ac.has_canonical_format:
+            Ac = Ac.copy()
+            Ac.sum_duplicates()
+        self.key = '{}:{}:{}:{}:{}'.format(
+            problemClass, A.shape[0], Ac.nnz, np.dtype(A.dtype).kind,
+            SpluReuse._patternKey(Ac)[2][:16]
+        )
+        self.name = self._loadDecision()
+
+        if self.name in candidates:
+            Solver, opts = candidates[self.name]
+            opts = dict(opts, **kwargs)
+            self.solver = Solver(A, **opts)
+        else:
+            self.name, self.solver = self._probe(
+                A, candidates, nProbe, accuracyTol, kwargs
+            )
+            self._storeDecision(self.name)
+
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'factor', time=time.time() - tic, fillIn=None,
+                memory=_factorMemory(self), choice=self.name
+            )
+
+    def _probe(self, A, candidates, nProbe, accuracyTol, kwargs):
+        b = A*np.random.rand(A.shape[0], nProbe)
+        best, bestTime, bestSolver = None, np.inf, None
+
+        for name, (Solver, opts) in candidates.items():
+            opts = dict(opts, **kwargs)
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    tic = time.time()
+                    Ainv = Solver(A, **opts)
+                    X = Ainv * b
+                    elapsed = time.time() - tic
+            except self._probeErrors:
+                continue
+
+            nrm = np.abs(A*X - b).max() / np.abs(b).max()
+            if not nrm <= accuracyTol or elapsed >= bestTime:
+                Ainv.clean()
+                continue
+
+            if bestSolver is not None:
+                bestSolver.clean()
+            best, bestTime, bestSolver = name, elapsed, Ainv
+
+        if bestSolver is None:
+            raise RuntimeError(
+                'None of the solvers {} reached an accuracy of {}'.format(
+                    list(candidates.keys()), accuracyTol
+                )
+            )
+        return best, bestSolver
+
+    def _readCache(self):
+        if self.cacheFile is None or not os.path.isfile(self.cacheFile):
+            return {}
+        try:
+            with open(self.cacheFile, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _loadDecision(self):
+        if self.key not in self._decisions:
+            self._decisions.update(self._readCache())
+        return self._decisions.get(self.key)
+
+    def _storeDecision(self, name):
+        self._decisions[self.key] = name
+        if self.cacheFile is None:
+            return
+        decisions = self._readCache()
+        decisions[self.key] = name
+        try:
+            directory = os.path.dirname(self.cacheFile)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            tmp = '{}.{}.tmp'.format(self.cacheFile, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump(decisions, f, indent=2, sort_keys=True)
+            os.rename(tmp, self.cacheFile)
+        except (IOError, OSError):
+            warnings.warn(
+                'Could not write the solver decisions to {}'.format(
+                    self.cacheFile
+                )
+            )
+
+    def __mul__(self, b):
+        tic = time.time()
+        X = self.solver * b
+        if self.diagnostics is not None:
+            self.diagnostics.record(
+                self, 'solve', time=time.time() - tic, residual=None,
+                nRHS=1 if X.ndim == 1 else X.shape[1]
+            )
+        return X
+
+    def clean(self):
+        return self.solver.clean()
+
+
+def _factorMemory(Ainv):
+    """
+    Estimate the memory (in bytes) held by a solver instance.
+
+    Uses the number of non-zeros of the factors when the wrapped solver
+    exposes them (e.g. :code:`scipy.sparse.linalg.splu`) and falls back to
+    the size of the stored system matrix otherwise.
+    """
+    if isinstance(Ainv, SolverAuto):
+        return _factorMemory(Ainv.solver)
+    solver = getattr(Ainv, 'solver', None)
+    A = getattr(Ainv, 'A', None)
+    nnz = getattr(solver, 'nnz', None)
+    if nnz is not None and A is not None:
+        dtype = np.dtype(getattr(Ainv, 'factorDtype', A.dtype))
+        return int(nnz) * (dtype.itemsize + np.dtype(np.int32).itemsize)
+    if sp.issparse(A):
+        A = A.tocsc() if A.format not in ['csc', 'csr'] else A
+        return A.data.nbytes + A.indices.nbytes + A.indptr.nbytes
+    return 0
+
+
+class FactorCache(object):
+    """
+    Least-recently-used store of solver instances (matrix factorizations).
+
+    Factors are keyed on any hashable (e.g. a frequency or a time step) and
+    are created on demand by :code:`get`. When :code:`maxMemory` (bytes) is
+    set, the least recently used factors are cleaned and dropped until the
+    estimated memory of the cache fits.
+
+    ::
+
+        cache = FactorCache(maxMemory=4e9)
+        Ainv = cache.get(freq, lambda: Solver(getA(freq)))
+        cache.clean()
+
+    """
+
+    def __init__(self, maxMemory=None):
+        self.maxMemory = maxMemory
+        self._factors = OrderedDict()
+        self._memory = {}
+
+    def __contains__(self, key):
+        return key in self._factors
+
+    def __len__(self):
+        return len(self._factors)
+
+    def keys(self):
+        return list(self._factors.keys())
+
+    @property
+    def memory(self):
+        """Estimated memory (bytes) held by the cached factors"""
+        return sum(self._memory.values())
+
+    def get(self, key, factory):
+        """
+        Return the factor stored under key, creating it with
+        :code:`factory()` if needed.
+        """
+        if key in self._factors:
+            # mark as most recently used
+            Ainv = self._factors.pop(key)
+            self._factors[key] = Ainv
+            return Ainv
+
+        Ainv = factory()
+        self._factors[key] = Ainv
+        self._memory[key] = _factorMemory(Ainv)
+        self._evict(keep=key)
+        return Ainv
+
+    def _evict(self, keep=None):
+        if self.maxMemory is None:
+            return
+        for key in list(self._factors.keys()):
+            if self.memory <= self.maxMemory:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+
+    def remove(self, key):
+        """Clean and drop the factor stored under key"""
+        Ainv = self._factors.pop(key)
+        self._memory.pop(key)
+        Ainv.clean()
+
+    def clean(self):
+        """Clean and drop all factors"""
+        for key in list(self._factors.keys()):
+            self.remove(key)
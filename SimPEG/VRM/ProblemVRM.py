@@ -836,6 +836,17 @@ class Problem_Linear(Problem_BaseVRM):
         # Must return as a numpy array
         return mkvc(sp.coo_matrix.dot(self.T, np.dot(self.A, m)))
 
+    def fieldsEnsemble(self, M):
+
+        """Computes the fields D = T*A*M of the models M [nP x nModels]"""
+
+        if self.ispaired is False:
+            AssertionError("Problem must be paired with survey to generate A matrix")
+
+        M = self.xiMap.transformEnsemble(M)
+
+        return np.asarray(sp.coo_matrix.dot(self.T, np.dot(self.A, M)))
+
     def Jvec(self, m, v, f=None):
 
         """Compute Pd*T*A*dxidm*v"""
@@ -21,7 +21,9 @@ from .Utils import mkvc
 from .Utils import Versions
 from .Utils.SolverUtils import (
     _checkAccuracy, SolverWrapD, SolverWrapI,
-    Solver, SolverCG, SolverDiag, SolverLU, SolverBiCG,
+    Solver, SolverCG, SolverDiag, SolverLU, SolverLUReuse, SolverLUMixed,
+    SolverBiCG, SolverIterative, SolverPCG, SolverPBiCG, SolverPGMRES,
+    SolverAuto, SolverDiagnostics,
 )
 __version__   = '0.13.0'
 __author__    = 'SimPEG Team'
@@ -0,0 +1,76 @@
+"""
+Re-using the fill-reducing ordering between models
+===================================================
+
+The sparsity pattern of the system matrix of an EM problem is set by the
+mesh, only its values change with the model. :code:`SolverLUReuse` keeps
+the column ordering computed for the first factorization and re-uses it for
+every later matrix with the same pattern, so only the numeric factorization
+is repeated during an inversion.
+
+Here we compare the time to factor the system matrix for a sequence of
+models with :code:`SolverLU` and :code:`SolverLUReuse` for a cell centered
+DC problem and an E-formulation FDEM problem.
+"""
+from __future__ import print_function
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from SimPEG import Mesh, Maps, SolverLU, SolverLUReuse
+from SimPEG.EM import FDEM
+import SimPEG.EM.Static.DC as DC
+
+np.random.seed(1)
+
+nModels = 5
+cs = 25.
+hx = [(cs, 4, -1.3), (cs, 12), (cs, 4, 1.3)]
+mesh = Mesh.TensorMesh([hx, hx, hx], 'CCC')
+
+problems = {
+    'DC Problem3D_CC': (
+        DC.Problem3D_CC(mesh, sigmaMap=Maps.ExpMap(mesh)),
+        lambda prob: prob.getA()
+    ),
+    'FDEM Problem3D_e': (
+        FDEM.Problem3D_e(mesh, sigmaMap=Maps.ExpMap(mesh)),
+        lambda prob: prob.getA(1e2)
+    ),
+}
+
+models = [
+    np.log(1e-2) + 0.5*np.random.randn(mesh.nC) for _ in range(nModels)
+]
+
+
+def factorTimes(prob, getA, Solver, **solverOpts):
+    times = []
+    for m in models:
+        prob.model = m
+        A = getA(prob)
+        tic = time.time()
+        Ainv = Solver(A, **solverOpts)
+        times.append(time.time() - tic)
+        Ainv.clean()
+    return np.array(times)
+
+
+fig, ax = plt.subplots(1, len(problems), figsize=(10, 4))
+for a, (name, (prob, getA)) in zip(ax, sorted(problems.items())):
+    tLU = factorTimes(prob, getA, SolverLU)
+    tReuse = factorTimes(prob, getA, SolverLUReuse)
+    print(
+        '{}: SolverLU {:.3f} s, SolverLUReuse {:.3f} s ({} models)'.format(
+            name, tLU.sum(), tReuse.sum(), nModels
+        )
+    )
+
+    a.plot(np.arange(nModels), tLU, 'o-', label='SolverLU')
+    a.plot(np.arange(nModels), tReuse, 's-', label='SolverLUReuse')
+    a.set_xlabel('model')
+    a.set_ylabel('factor time (s)')
+    a.set_title(name)
+    a.legend()
+
+plt.tight_layout()
+plt.show()
@@ -1,9 +1,18 @@
 import unittest
-from SimPEG import Mesh, Solver, SolverDiag, SolverCG, SolverLU, Utils
+from SimPEG import (
+    Mesh, Solver, SolverDiag, SolverCG, SolverLU, SolverLUReuse, SolverLUMixed,
+    SolverWrapD, SolverPCG, SolverPBiCG, SolverPGMRES, SolverAuto,
+    SolverDiagnostics, Utils
+)
+import os
+import shutil
+import tempfile
+from SimPEG.Utils import Counter
 from discretize import TensorMesh
 from SimPEG.Utils import sdiag
 import numpy as np
 import scipy.sparse as sparse
+import scipy.sparse.linalg
 
 TOLD = 1e-10
 TOLI = 1e-3
@@ -48,6 +57,40 @@ class TestSolver(unittest.TestCase):
     def test_direct_splu_1(self): self.assertLess(dotest(SolverLU, False),TOLD)
     def test_direct_splu_M(self): self.assertLess(dotest(SolverLU, True),TOLD)
 
+    def test_direct_splu_block(self): self.assertLess(dotest(SolverLU, False, blockSize=2),TOLD)
+    def test_direct_spsolve_block(self): self.assertLess(dotest(Solver, False, blockSize=3),TOLD)
+
+    def test_direct_splu_reuse_1(self): self.assertLess(dotest(SolverLUReuse, False),TOLD)
+    def test_direct_splu_reuse_M(self): self.assertLess(dotest(SolverLUReuse, True),TOLD)
+
+    def test_direct_splu_reuse_ordering(self):
+        M = TensorMesh([np.ones(8), np.ones(8)])
+        D = M.faceDiv
+        A0 = D*M.getFaceInnerProduct(np.ones(M.nC))*D.T + sdiag(np.ones(M.nC))
+        sigma = np.exp(np.random.randn(M.nC))
+        A1 = D*M.getFaceInnerProduct(sigma)*D.T + sdiag(np.ones(M.nC))
+        A1 = A1 + sparse.tril(A1, -1)*0.1  # non-symmetric, same pattern
+
+        SolverLUReuse(A0).clean()
+        Ainv = SolverLUReuse(A1)
+        self.assertTrue(Ainv.solver._q is not None)
+
+        e = np.random.rand(M.nC, numRHS)
+        self.assertLess(np.linalg.norm(e - Ainv * (A1 * e), np.inf), TOLD)
+        ATe = Ainv.solver.solve(A1.T * e[:, 0], trans='T')
+        self.assertLess(np.linalg.norm(e[:, 0] - ATe, np.inf), TOLD)
+
+        Ainv = SolverLUReuse(A1, reuseOrdering=False)
+        self.assertTrue(Ainv.solver._q is None)
+
+    def test_direct_single_rhs_backend(self):
+        def spsolve1(A, b):
+            if b.ndim != 1:
+                raise ValueError('only a single RHS is supported')
+            return sparse.linalg.spsolve(A, b)
+        Solver1 = SolverWrapD(spsolve1, factorize=False, name="Solver1")
+        self.assertLess(dotest(Solver1, False), TOLD)
+
     def test_iterative_diag_1(self): self.assertLess(dotest(SolverDiag, False, A=Utils.sdiag(np.random.rand(10)+1.0)),TOLI)
     def test_iterative_diag_M(self): self.assertLess(dotest(SolverDiag, True, A=Utils.sdiag(np.random.rand(10)+1.0)),TOLI)
 
@@ -55,6 +98,192 @@ class TestSolver(unittest.TestCase):
     def test_iterative_cg_M(self): self.assertLess(dotest(SolverCG, True),TOLI)
 
 
+    def test_direct_splu_mixed(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        e = np.random.rand(M.nC, numRHS)
+
+        Ainv = SolverLUMixed(A, accuracyTol=1e-12)
+        self.assertEqual(Ainv.factorDtype, np.float32)
+        x = Ainv * (A * e)
+        self.assertFalse(Ainv.fallback)
+        self.assertTrue(Ainv.refinements[-1] > 0)
+        self.assertLess(np.linalg.norm(e - x, np.inf), 1e-10)
+        x = Ainv * (A * e[:, 0])
+        self.assertFalse(Ainv.fallback)
+        self.assertLess(np.linalg.norm(e[:, 0] - x, np.inf), 1e-10)
+
+        Ainv = SolverLUMixed(1j*A, accuracyTol=1e-12, maxRefine=0)
+        x = Ainv * (1j*A * e[:, 0])
+        self.assertTrue(Ainv.fallback)
+        self.assertLess(np.linalg.norm(e[:, 0] - x, np.inf), 1e-10)
+        Ainv.clean()
+
+    def test_iterative_pcg_jacobi(self): self.assertLess(dotest(SolverPCG, False, preconditioner='jacobi', tol=1e-10),TOLI)
+    def test_iterative_pcg_blockjacobi(self): self.assertLess(dotest(SolverPCG, False, preconditioner='blockjacobi', blockSize=100, tol=1e-10),TOLI)
+    def test_iterative_pbicg_ilu(self): self.assertLess(dotest(SolverPBiCG, False, preconditioner='ilu', tol=1e-10),TOLI)
+    def test_iterative_pgmres_M(self): self.assertLess(dotest(SolverPGMRES, True, preconditioner=None, tol=1e-10),TOLI)
+
+    def test_iterative_warm_start(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        b = np.random.rand(M.nC, 2)
+        counter = Counter()
+
+        Ainv = SolverPCG(A, counter=counter, tol=1e-10)
+        x = Ainv * b
+        cold = Ainv.iterations[:]
+        x = Ainv * b
+        self.assertTrue(all(w < c for w, c in zip(Ainv.iterations[2:], cold)))
+        self.assertLess(np.linalg.norm(A*x - b, np.inf), 1e-6)
+
+        self.assertEqual(counter._countList['SolverPCG.solve'], 4)
+        self.assertEqual(
+            counter._countList['SolverPCG.iterations'], sum(Ainv.iterations)
+        )
+        self.assertEqual(len(counter.values('SolverPCG.residual')), 4)
+        Ainv.clean()
+
+        # the initial guesses are not shared with other systems
+        other = SolverPCG(2.*A, tol=1e-10)
+        other * b
+        self.assertEqual(other.iterations, cold)
+        self.assertEqual(Ainv._lastSolutions, {})
+
+    def test_diagnostics(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        b = np.random.rand(M.nC, numRHS)
+        diagnostics = SolverDiagnostics()
+
+        Ainv = SolverLU(
+            A, diagnostics=diagnostics, checkAccuracy=2, checkColumns=2
+        )
+        for i in range(4):
+            diagnostics.tag = i
+            Ainv * b
+        Ainv.clean()
+
+        factor = diagnostics.query(event='factor')
+        self.assertEqual(len(factor), 1)
+        self.assertTrue(factor[0]['fillIn'] >= 1.)
+        self.assertTrue(factor[0]['memory'] > 0)
+
+        solves = diagnostics.query(event='solve')
+        self.assertEqual(len(solves), 4)
+        self.assertEqual(diagnostics.total('nRHS', event='solve'), 4*numRHS)
+        # only every second solve is checked
+        checked = [r['tag'] for r in solves if r['residual'] is not None]
+        self.assertEqual(checked, [0, 2])
+        self.assertLess(max(r['residual'] for r in solves if r['residual'] is not None), TOLD)
+        diagnostics.summary()
+
+    def test_diagnostics_solvers(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        b = np.random.rand(M.nC, numRHS)
+
+        for MYSOLVER, opts in [
+            (SolverPCG, {'tol': 1e-10, 'checkAccuracy': 2}),
+            (SolverLUMixed, {
+                'accuracyTol': 1e-12, 'maxRefine': 0, 'checkAccuracy': 2
+            }),
+            (SolverAuto, {'cacheFile': None}),
+            (SolverDiag, {}),
+        ]:
+            diagnostics = SolverDiagnostics()
+            Ainv = MYSOLVER(A, diagnostics=diagnostics, **opts)
+            for i in range(4):
+                diagnostics.tag = i
+                Ainv * b[:, 0]
+            Ainv.clean()
+
+            solves = diagnostics.query(event='solve')
+            self.assertEqual(len(solves), 4)
+            if 'checkAccuracy' in opts:
+                # only every second solve is checked
+                checked = [
+                    r['tag'] for r in solves if r['residual'] is not None
+                ]
+                self.assertEqual(checked, [0, 2])
+
+
+class TestSolverAuto(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cacheFile = os.path.join(self.tmpdir, 'solver_decisions.json')
+        SolverAuto._decisions.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        SolverAuto._decisions.clear()
+
+    def test_decision_cache(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        e = np.random.rand(M.nC, numRHS)
+
+        Ainv = SolverAuto(A, problemClass='Test', cacheFile=self.cacheFile)
+        self.assertLess(np.linalg.norm(e - Ainv * (A * e), np.inf), 1e-5)
+        self.assertTrue(os.path.isfile(self.cacheFile))
+        name = Ainv.name
+        Ainv.clean()
+
+        # the decision is read from disk without probing
+        SolverAuto._decisions.clear()
+        candidates = {name: (SolverLU, {})}
+        Ainv = SolverAuto(
+            A, problemClass='Test', cacheFile=self.cacheFile,
+            candidates=candidates
+        )
+        self.assertEqual(Ainv.name, name)
+        Ainv.clean()
+
+    def test_accuracy(self):
+        A = sdiag(np.random.rand(10) + 1.)
+        candidates = {
+            'SolverDiag': (SolverDiag, {}),
+            'SolverCG': (SolverCG, {'maxiter': 1, 'checkAccuracy': False}),
+        }
+        Ainv = SolverAuto(A, candidates=candidates, cacheFile=None)
+        self.assertEqual(Ainv.name, 'SolverDiag')
+
+    def test_probe(self):
+        M = TensorMesh([np.ones(10), np.ones(10)])
+        A = M.faceDiv*M.getFaceInnerProduct()*M.faceDiv.T + sdiag(np.ones(M.nC))
+        B = sdiag(np.random.rand(M.nC) + 1.) + sparse.eye(M.nC, k=1)
+
+        # matrices of the same size are told apart by their pattern
+        Ainv = SolverAuto(A, problemClass='Test', cacheFile=None)
+        Binv = SolverAuto(B, problemClass='Test', cacheFile=None)
+        self.assertNotEqual(Ainv.key, Binv.key)
+
+        # the memory is the one of the chosen solver
+        Ainv = SolverAuto(
+            A, candidates={'SolverLU': (SolverLU, {})}, cacheFile=None
+        )
+        self.assertTrue(Utils.SolverUtils._factorMemory(Ainv) > 0)
+
+        # the iterative candidates stop at the checked accuracy
+        candidates = Utils.SolverUtils._solverCandidates(accuracyTol=1e-8)
+        for name in ['SolverCG', 'SolverBiCG', 'SolverPBiCG']:
+            self.assertEqual(candidates[name][1]['tol'], 1e-8)
+        Ainv = SolverAuto(
+            A, candidates={'SolverCG': candidates['SolverCG']},
+            accuracyTol=1e-8, cacheFile=None
+        )
+        self.assertEqual(Ainv.name, 'SolverCG')
+
+        # only the errors of a failing candidate are skipped
+        def broken(A, **kwargs):
+            raise KeyError('not a solver error')
+        SolverAuto._decisions.clear()
+        with self.assertRaises(KeyError):
+            SolverAuto(
+                A, candidates={'broken': (broken, {})}, cacheFile=None
+            )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -137,6 +137,34 @@ class MapTests(unittest.TestCase):
         maps = Maps.ReciprocalMap(self.mesh3)
         self.assertTrue(maps.test(v3, dx=dv3))
 
+    def test_transformEnsemble(self):
+        M = np.random.rand(self.mesh3.nC, 4)
+        active = np.arange(self.mesh3.nC) % 2 == 0
+        mappings = [
+            Maps.ExpMap(self.mesh3),
+            Maps.ExpMap(self.mesh3) * Maps.Projection(
+                self.mesh3.nC, np.arange(self.mesh3.nC)[::-1]
+            ),
+            # transformed column by column
+            Maps.InjectActiveCells(self.mesh3, active, 3.),
+            Maps.Weighting(self.mesh3, weights=np.random.rand(self.mesh3.nC)),
+            Maps.ExpMap(self.mesh3) * Maps.InjectActiveCells(
+                self.mesh3, active, 3.
+            )
+        ]
+        self.assertEqual(
+            [mapping.supportsEnsemble for mapping in mappings],
+            [True, True, False, False, False]
+        )
+        self.assertTrue(Maps.IdentityMap(self.mesh3).supportsEnsemble)
+        for mapping in mappings:
+            nP = mapping.shape[1] if mapping.shape[1] != '*' else self.mesh3.nC
+            ensemble = mapping.transformEnsemble(M[:nP])
+            for ii in range(M.shape[1]):
+                self.assertTrue(
+                    np.allclose(ensemble[:, ii], mapping * M[:nP, ii])
+                )
+
     def test_Mesh2MeshMap(self):
         maps = Maps.Mesh2Mesh([self.mesh22, self.mesh2])
         self.assertTrue(maps.test())
@@ -0,0 +1,87 @@
+from __future__ import print_function
+import unittest
+import numpy as np
+from SimPEG import Mesh, Maps, Utils
+from SimPEG import EM
+from SimPEG.EM.Utils.testingUtils import CountingSolver
+
+freqs = [1e-1, 1e1]
+CONDUCTIVITY = 1e-1
+
+
+def getProblem(fdemType='e'):
+    cs = 10.
+    hx = [(cs, 2, -1.3), (cs, 2), (cs, 2, 1.3)]
+    mesh = Mesh.TensorMesh([hx, hx, hx], 'CCC')
+
+    rx = EM.FDEM.Rx.Point_bSecondary(
+        np.array([[20., 0., 10.], [-20., 0., 10.]]), 'z', 'imag'
+    )
+    srcList = [
+        EM.FDEM.Src.MagDipole([rx], freq=f, loc=np.r_[0., 0., 0.])
+        for f in freqs
+    ]
+    survey = EM.FDEM.Survey(srcList)
+
+    Problem = getattr(EM.FDEM, 'Problem3D_{}'.format(fdemType))
+    prb = Problem(mesh, sigmaMap=Maps.ExpMap(mesh))
+    prb.Solver = CountingSolver
+    prb.pair(survey)
+    return prb
+
+
+class FDEM_FactorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(12)
+        self.prb = getProblem()
+        self.m = (
+            np.log(CONDUCTIVITY) * np.ones(self.prb.mesh.nC) +
+            0.1 * np.random.randn(self.prb.mesh.nC)
+        )
+        CountingSolver.nFactors = 0
+
+    def test_reuse_factors(self):
+        prb, m = self.prb, self.m
+        f = prb.fields(m)
+        v = np.random.rand(prb.mesh.nC)
+        w = np.random.rand(prb.survey.nD)
+        prb.Jvec(m, v, f=f)
+        prb.Jtvec(m, w, f=f)
+        # one factorization per frequency for fields, Jvec and Jtvec
+        self.assertEqual(CountingSolver.nFactors, len(freqs))
+        self.assertEqual(len(prb._Ainv), len(freqs))
+
+        # factors are released on a model update
+        prb.model = m + 0.1
+        self.assertTrue(prb._Ainv is None)
+        prb.fields(prb.model)
+        self.assertEqual(CountingSolver.nFactors, 2*len(freqs))
+
+    def test_same_result(self):
+        prb, m = self.prb, self.m
+        v = np.random.rand(prb.mesh.nC)
+        w = np.random.rand(prb.survey.nD)
+
+        f = prb.fields(m)
+        Jv, Jtw = prb.Jvec(m, v, f=f), prb.Jtvec(m, w, f=f)
+
+        prb.cacheFactors = False
+        prb.model = m + 0.1
+        f = prb.fields(m)
+        Jv0, Jtw0 = prb.Jvec(m, v, f=f), prb.Jtvec(m, w, f=f)
+
+        self.assertTrue(np.allclose(Jv, Jv0))
+        self.assertTrue(np.allclose(Jtw, Jtw0))
+
+    def test_memory_cap(self):
+        prb, m = self.prb, self.m
+        prb.factorCacheMemory = 1.  # only keep the most recent factor
+        prb.fields(m)
+        self.assertEqual(len(prb._Ainv), 1)
+        self.assertEqual(prb._Ainv.keys(), [freqs[-1]])
+        self.assertTrue(prb._Ainv.memory > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
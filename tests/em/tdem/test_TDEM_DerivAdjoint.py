@@ -180,6 +180,29 @@ class TDEM_Fields_B_Pieces(Base_DerivAdjoint_Test):
         print('    ', V1, V2, np.abs(V1-V2), tol, passed)
         self.assertTrue(passed)
 
+    def test_AdiagDeriv_sources(self):
+        print('\n Testing AdiagDeriv on a block of sources')
+
+        prb = self.prob
+        f = self.fields
+        tInd = 3
+
+        u = f[:, 'bSolution', tInd+1]
+        m = np.random.rand(len(self.m))
+        V = np.random.randn(prb.mesh.nF, u.shape[1])
+
+        # the block gives a column for each source and the summed adjoint
+        block = prb.getAdiagDeriv(tInd, u, m)
+        blockT = prb.getAdiagDeriv(tInd, u, V, adjoint=True)
+        for i in range(u.shape[1]):
+            self.assertTrue(np.allclose(
+                block[:, i], prb.getAdiagDeriv(tInd, u[:, i], m)
+            ))
+        self.assertTrue(np.allclose(blockT, sum(
+            prb.getAdiagDeriv(tInd, u[:, i], V[:, i], adjoint=True)
+            for i in range(u.shape[1])
+        )))
+
 
 class DerivAdjoint_E(Base_DerivAdjoint_Test):
 
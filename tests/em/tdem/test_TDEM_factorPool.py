@@ -0,0 +1,78 @@
+from __future__ import division, print_function
+import unittest
+import numpy as np
+from SimPEG import EM
+from SimPEG.EM.Utils.testingUtils import CountingSolver, getTDEMProblem
+
+
+class TDEM_FactorPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(42)
+        self.prob = getTDEMProblem()
+        self.m = (
+            np.log(1e-1)*np.ones(self.prob.mesh.nC) +
+            0.1*np.random.randn(self.prob.mesh.nC)
+        )
+        CountingSolver.nFactors = 0
+
+    def test_reuse_factors(self):
+        prob, m = self.prob, self.m
+        f = prob.fields(m)
+        prob.Jvec(m, np.random.rand(prob.mesh.nC), f=f)
+        prob.Jtvec(m, np.random.rand(prob.survey.nD), f=f)
+
+        # one factorization for each distinct dt
+        self.assertEqual(CountingSolver.nFactors, 3)
+        self.assertTrue(prob.factorMemory > 0)
+
+        # the pool is released on a model update
+        prob.model = m + 0.1
+        self.assertEqual(prob.factorMemory, 0)
+        prob.fields(prob.model)
+        self.assertEqual(CountingSolver.nFactors, 6)
+
+    def test_same_result(self):
+        prob, m = self.prob, self.m
+        v = np.random.rand(prob.mesh.nC)
+        w = np.random.rand(prob.survey.nD)
+
+        f = prob.fields(m)
+        Jv, Jtw = prob.Jvec(m, v, f=f), prob.Jtvec(m, w, f=f)
+
+        prob.cacheFactors = False
+        prob.model = m + 0.1
+        f = prob.fields(m)
+        Jv0, Jtw0 = prob.Jvec(m, v, f=f), prob.Jtvec(m, w, f=f)
+
+        self.assertTrue(np.allclose(Jv, Jv0))
+        self.assertTrue(np.allclose(Jtw, Jtw0))
+        self.assertEqual(prob.factorMemory, 0)
+
+    def test_adjoint(self):
+        # the blocks of one source are [n x 1], like those of several
+        rxList = {
+            'b': None,
+            'e': [EM.TDEM.Rx.Point_e(
+                np.array([[5., 5., 5.]]), np.logspace(-4, -3, 5), 'y'
+            )]
+        }
+        for tdemType in ['b', 'e']:
+            for srcZ in [(0.,), (0., 10.)]:
+                prob = getTDEMProblem(
+                    tdemType, rxList=rxList[tdemType], srcZ=srcZ
+                )
+                v = np.random.rand(prob.mesh.nC)
+                w = np.random.rand(prob.survey.nD)
+
+                f = prob.fields(self.m)
+                vJtw = v.dot(prob.Jtvec(self.m, w, f=f))
+                wJv = w.dot(prob.Jvec(self.m, v, f=f))
+                self.assertTrue(
+                    np.abs(vJtw - wJv) < 1e-4*(np.abs(vJtw) + np.abs(wJv))/2.,
+                    (tdemType, srcZ, vJtw, wJv)
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
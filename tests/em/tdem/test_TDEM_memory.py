@@ -0,0 +1,114 @@
+from __future__ import division, print_function
+import unittest
+import numpy as np
+from SimPEG import EM
+from SimPEG.EM.Utils.testingUtils import getTDEMProblem
+
+
+def get_prob(formulation='b'):
+    times = np.logspace(-4, -3, 5)
+    locs = np.array([[5., 5., 5.], [-5., 5., 15.]])
+    return getTDEMProblem(
+        formulation,
+        rxList=[
+            EM.TDEM.Rx.Point_dbdt(locs, times, 'z'),
+            EM.TDEM.Rx.Point_e(locs[:1], times[1:3], 'y')
+        ],
+        srcZ=(0., 10.)
+    )
+
+
+class TDEM_MemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(42)
+
+    def test_fields_nostore(self):
+        for formulation in ['b', 'e']:
+            prob = get_prob(formulation)
+            m = (
+                np.log(1e-1)*np.ones(prob.mesh.nC) +
+                0.1*np.random.randn(prob.mesh.nC)
+            )
+            dpred = prob.survey.dpred(m)
+            self.assertTrue(np.allclose(prob.fields_nostore(m), dpred))
+
+    def test_checkpoints(self):
+        prob = get_prob('b')
+        m = (
+            np.log(1e-1)*np.ones(prob.mesh.nC) +
+            0.1*np.random.randn(prob.mesh.nC)
+        )
+        v = np.random.rand(prob.mesh.nC)
+        w = np.random.rand(prob.survey.nD)
+
+        f = prob.fields(m)
+        dpred = prob.survey.dpred(m, f=f)
+        Jv, Jtw = prob.Jvec(m, v, f=f), prob.Jtvec(m, w, f=f)
+
+        prob.maxStoredSteps = 7
+        f = prob.fields(m)
+        store = f._fields['bSolution']
+        self.assertTrue(np.allclose(f.projectedData, dpred))
+        self.assertTrue(np.allclose(prob.survey.dpred(m, f=f), dpred))
+        self.assertTrue(np.allclose(prob.Jtvec(m, w, f=f), Jtw))
+        self.assertTrue(np.allclose(prob.Jvec(m, v, f=f), Jv))
+        self.assertTrue(store.nStored <= prob.maxStoredSteps)
+
+        # steps of another model are replayed with the model of the fields,
+        # and the model of the problem is left as it was
+        b = prob.fields(m)[:, 'b', :]
+        f = prob.fields(m)
+        m1 = m + 0.5
+        prob.model = m1
+        self.assertTrue(np.allclose(f[:, 'b', :], b))
+        self.assertTrue(np.allclose(prob.model, m1))
+
+    def test_checkpoints_nomap(self):
+        # conductivity set directly, no model
+        prob = get_prob('b')
+        sigma = 1e-1*np.ones(prob.mesh.nC)
+        nomap = EM.TDEM.Problem3D_b(prob.mesh, sigma=sigma)
+        nomap.timeSteps, nomap.Solver = prob.timeSteps, prob.Solver
+        survey = prob.survey
+        survey.unpair()
+        nomap.pair(survey)
+
+        f = nomap.fields(None)
+        b = f[:, 'b', :]
+        dpred = survey.dpred(None, f=f)
+
+        nomap.maxStoredSteps = 7
+        f = nomap.fields(None)
+        self.assertTrue(np.allclose(f[:, 'b', :], b))
+        self.assertTrue(np.allclose(survey.dpred(None, f=f), dpred))
+        self.assertTrue(nomap.model is None)
+
+    def test_separable_projection(self):
+        prob = get_prob('b')
+        m = np.log(1e-1)*np.ones(prob.mesh.nC)
+        f = prob.fields(m)
+        src = prob.survey.srcList[1]
+
+        for rx in src.rxList:
+            P = rx.getP(prob.mesh, prob.timeMesh, f)
+            u = f[src, rx.projField, :]
+            self.assertTrue(np.allclose(
+                rx.eval(src, prob.mesh, prob.timeMesh, f),
+                P * np.ravel(u, order='F')
+            ))
+
+            v = np.random.randn(P.shape[1])
+            w = np.random.randn(rx.nD)
+            self.assertTrue(np.allclose(
+                rx.evalDeriv(src, prob.mesh, prob.timeMesh, f, v), P * v
+            ))
+            self.assertTrue(np.allclose(
+                rx.evalDeriv(
+                    src, prob.mesh, prob.timeMesh, f, w, adjoint=True
+                ), P.T * w
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
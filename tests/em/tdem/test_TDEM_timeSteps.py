@@ -0,0 +1,88 @@
+from __future__ import division, print_function
+import unittest
+import numpy as np
+from SimPEG import Utils
+from SimPEG import EM
+from SimPEG.EM.Utils.testingUtils import CountingSolver, getTDEMProblem
+
+
+def get_prob():
+    times = np.logspace(-4, -3, 5)
+    locs = np.array([[5., 5., 5.], [-5., 5., 15.]])
+    return getTDEMProblem(
+        'b',
+        rxList=[
+            EM.TDEM.Rx.Point_dbdt(locs, times, 'z'),
+            EM.TDEM.Rx.Point_b(locs[:1], times, 'z')
+        ],
+        timeSteps=None
+    )
+
+
+class TDEM_TimeStepDesignTest(unittest.TestCase):
+
+    def test_waveforms(self):
+        times = np.logspace(-4, -3, 5) + 2e-4
+        waveforms = [
+            EM.TDEM.Src.StepOffWaveform(),
+            EM.TDEM.Src.RampOffWaveform(offTime=2e-5),
+            EM.TDEM.Src.VTEMWaveform(peakTime=1e-4, offTime=1.5e-4),
+            EM.TDEM.Src.TrapezoidWaveform(
+                ramp_on=np.r_[0., 1e-5], ramp_off=np.r_[1e-4, 1.2e-4]
+            ),
+            EM.TDEM.Src.RawWaveform(
+                offTime=5e-5, waveFct=lambda t: max(1. - t/5e-5, 0.)
+            )
+        ]
+        for waveform in waveforms:
+            design = EM.TDEM.designTimeSteps(
+                waveform, times, accuracy=0.05, factorCost=20., solveCost=1.
+            )
+            steps = Utils.meshTensor(design.timeSteps)
+            nodes = design.t0 + np.r_[0., np.cumsum(steps)]
+
+            # the receiver times are covered, the waveform ends on a node
+            self.assertTrue(nodes[-1] >= times.max())
+            self.assertTrue(
+                np.abs(nodes - waveform.offTime).min() <= steps.min()
+            )
+            self.assertEqual(design.nSteps, len(steps))
+            self.assertEqual(design.nFactors, len(np.unique(steps)))
+            self.assertEqual(
+                design.cost, 20.*design.nFactors + design.nSteps
+            )
+
+            # fewer distinct dt as factorizations get expensive
+            expensive = EM.TDEM.designTimeSteps(
+                waveform, times, accuracy=0.05, factorCost=1e4,
+                solveCost=1.
+            )
+            self.assertTrue(expensive.nFactors <= design.nFactors)
+
+            # free solves: the fewest distinct dt
+            free = EM.TDEM.designTimeSteps(
+                waveform, times, accuracy=0.05, factorCost=1., solveCost=0.
+            )
+            self.assertTrue(free.nFactors <= expensive.nFactors)
+
+    def test_reference_run(self):
+        prob = get_prob()
+        m = np.log(1e-1)*np.ones(prob.mesh.nC)
+
+        CountingSolver.nFactors = 0
+        design = prob.designTimeSteps(accuracy=0.02)
+        dpred = prob.survey.dpred(m)
+        self.assertEqual(CountingSolver.nFactors, design.nFactors)
+        self.assertEqual(prob.nT, design.nSteps)
+
+        reference = get_prob()
+        fine = reference.designTimeSteps(accuracy=0.002)
+        self.assertTrue(fine.nSteps > design.nSteps)
+        dref = reference.survey.dpred(m)
+
+        err = np.linalg.norm(dpred - dref) / np.linalg.norm(dref)
+        self.assertTrue(err < 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
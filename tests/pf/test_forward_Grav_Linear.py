@@ -1,6 +1,9 @@
 import unittest
 from SimPEG import Mesh, Utils, PF, Maps
 import numpy as np
+import os
+import shutil
+import tempfile
 
 
 class GravFwdProblemTests(unittest.TestCase):
@@ -87,6 +90,269 @@ class GravFwdProblemTests(unittest.TestCase):
 
         self.assertTrue(err_x < 0.005 and err_y < 0.005 and err_z < 0.005)
 
+    def test_sensitivity_store(self):
+
+        path = tempfile.mkdtemp()
+        try:
+            G = {}
+            for run in range(2):
+                prob = PF.Gravity.GravityIntegral(
+                    self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+                    actInd=self.prob_z.actInd, rx_type='z',
+                    memory_saving_mode=True, sensitivity_path=path
+                )
+                self.survey.unpair()
+                self.survey.pair(prob)
+                G[run] = prob.G
+
+            # the second run maps the file written by the first
+            self.assertEqual(len(os.listdir(path)), 1)
+            self.assertTrue(isinstance(G[1], np.memmap))
+            self.assertEqual(G[1].dtype, np.float32)
+            self.assertTrue(np.all(G[0] == G[1]))
+
+            # blocked products on the mapped G
+            PF.SensitivityStore.blockMemory = 4*G[1].shape[1]*10
+            v = np.random.rand(G[1].shape[0])
+            self.assertTrue(np.allclose(
+                prob.Jvec(self.model, self.model),
+                np.dot(np.array(G[1], dtype=float), self.model), rtol=1e-5
+            ))
+            self.assertTrue(np.allclose(
+                prob.Jtvec(self.model, v),
+                np.dot(np.array(G[1], dtype=float).T, v), rtol=1e-5
+            ))
+        finally:
+            PF.SensitivityStore.blockMemory = 2.5e8
+            del G, prob
+            shutil.rmtree(path)
+
+    def test_compressed_G(self):
+
+        dense = PF.Gravity.GravityIntegral(
+            self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+            actInd=self.prob_z.actInd, rx_type='z'
+        )
+        self.survey.pair(dense)
+        G = np.array(dense.G, dtype=float)
+
+        prob = PF.Gravity.GravityIntegral(
+            self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+            actInd=self.prob_z.actInd, rx_type='z', compression_tol=1e-3
+        )
+        self.survey.unpair()
+        self.survey.pair(prob)
+        self.assertTrue(
+            isinstance(prob.G, PF.CompressedSensitivity.CompressedG)
+        )
+
+        v = np.random.rand(G.shape[0])
+        d = np.dot(G, self.model)
+        self.assertTrue(
+            np.linalg.norm(prob.Jvec(self.model, self.model) - d) <
+            1e-2*np.linalg.norm(d)
+        )
+        dt = np.dot(G.T, v)
+        self.assertTrue(
+            np.linalg.norm(prob.Jtvec(self.model, v) - dt) <
+            1e-2*np.linalg.norm(dt)
+        )
+        self.assertTrue(np.allclose(
+            prob.G.rows(0, 2), G[:2], atol=1e-2*np.abs(G[:2]).max()
+        ))
+
+    def test_getJtJdiag(self):
+
+        prob = PF.Gravity.GravityIntegral(
+            self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+            actInd=self.prob_z.actInd, rx_type='z'
+        )
+        self.survey.pair(prob)
+        G = np.array(prob.G, dtype=float)
+        w = np.random.rand(G.shape[0])
+        W = Utils.sdiag(w)
+
+        jtj = np.sum((w[:, None]*G)**2., axis=0)
+        self.assertTrue(np.allclose(prob.getJtJdiag(self.model, W=W), jtj))
+
+        # cached until the map changes
+        self.assertTrue(prob.getJtJdiag(self.model) is prob.gtgdiag)
+        prob.rhoMap = Maps.ExpMap(nP=len(self.model))
+        dmudm = np.exp(self.model)
+        self.assertTrue(np.allclose(
+            prob.getJtJdiag(self.model, W=W), jtj*dmudm**2.
+        ))
+
+        # blocks of rows shared between threads, non-diagonal dmudm
+        try:
+            PF.SensitivityStore.blockMemory = 8*G.shape[1]*10
+            P = Maps.Projection(len(self.model), np.arange(len(self.model))[::-1])
+            jtjP = PF.SensitivityStore.jtjDiag(
+                prob.G, w=w, dmudm=P.deriv(self.model), n_cpu=2
+            )
+        finally:
+            PF.SensitivityStore.blockMemory = 2.5e8
+        self.assertTrue(np.allclose(jtjP, jtj[::-1]))
+
+    def test_streamFields(self):
+
+        prob = PF.Gravity.GravityIntegral(
+            self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+            actInd=self.prob_z.actInd, rx_type='z'
+        )
+        self.survey.pair(prob)
+        G = np.array(prob.G, dtype=float)
+
+        models = np.c_[self.model, 2.*self.model, np.random.rand(len(self.model))]
+        for parallelized in [False, True]:
+            prob.parallelized = parallelized
+            prob.n_cpu = 2
+            d = np.empty((G.shape[0], models.shape[1]))
+            stops = []
+            for start, stop, block in prob.streamFields(models):
+                d[start:stop] = block
+                stops += [stop]
+            self.assertEqual(stops[-1], G.shape[0])
+            self.assertTrue(np.allclose(d, np.dot(G, models)))
+
+        # a single model gives a vector per chunk
+        start, stop, block = next(prob.streamFields(self.model))
+        self.assertEqual(block.shape, (stop - start,))
+
+    def test_gridded_fft(self):
+
+        # receivers on a grid with the spacing of the cells
+        mesh = self.prob_z.mesh
+        xr = np.arange(11)*mesh.hx[0] - 1.05
+        yr = np.arange(9)*mesh.hy[0] - 0.93
+        X, Y = np.meshgrid(xr, yr)
+        locXyz = np.c_[Utils.mkvc(X), Utils.mkvc(Y), np.ones(X.size)*3.]
+        survey = PF.BaseGrav.LinearSurvey(
+            PF.BaseGrav.SrcField([PF.BaseGrav.RxObs(locXyz)])
+        )
+
+        dense = PF.Gravity.GravityIntegral(
+            mesh, rhoMap=self.prob_z.rhoMap, actInd=self.prob_z.actInd
+        )
+        survey.pair(dense)
+        G = np.array(dense.G, dtype=float)
+        survey.unpair()
+
+        prob = PF.Gravity.GravityIntegral(
+            mesh, rhoMap=self.prob_z.rhoMap, actInd=self.prob_z.actInd,
+            gridded_fft=True
+        )
+        survey.pair(prob)
+        self.assertTrue(
+            isinstance(prob.G, PF.GriddedSensitivity.GriddedG)
+        )
+
+        v = np.random.rand(G.shape[0])
+        self.assertTrue(np.allclose(
+            prob.Jvec(self.model, self.model), np.dot(G, self.model)
+        ))
+        self.assertTrue(np.allclose(prob.Jtvec(self.model, v), np.dot(G.T, v)))
+        self.assertTrue(np.allclose(prob.G.rows(3, 7), G[3:7]))
+
+        # scattered receivers fall back to the dense G
+        survey.unpair()
+        self.survey.pair(prob)
+        self.assertTrue(
+            PF.GriddedSensitivity.griddedG(
+                mesh, prob.actInd, prob.forwardJob()
+            ) is None
+        )
+
+    def test_append_receivers(self):
+
+        def problem(locs, **kwargs):
+            survey = PF.BaseGrav.LinearSurvey(
+                PF.BaseGrav.SrcField([PF.BaseGrav.RxObs(locs)])
+            )
+            prob = PF.Gravity.GravityIntegral(
+                self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+                actInd=self.prob_z.actInd, **kwargs
+            )
+            survey.pair(prob)
+            return prob
+
+        nFirst = 200
+        full = problem(self.locXyz)
+        G = np.array(full.G, dtype=float)
+        jtj = np.sum(G**2., axis=0)
+
+        path = tempfile.mkdtemp()
+        try:
+            for kwargs in [{}, {'sensitivity_path': path}]:
+                prob = problem(self.locXyz[:nFirst], **kwargs)
+                prob.getJtJdiag(self.model)
+
+                # only the rows of the new receivers are computed
+                prob.appendReceivers(self.locXyz[nFirst:])
+                self.assertEqual(prob.G.shape, G.shape)
+                self.assertTrue(np.allclose(np.asarray(prob.G), G))
+                self.assertTrue(np.allclose(prob.gtgdiag, jtj))
+                self.assertTrue(np.allclose(
+                    prob.fields(self.model), np.dot(G, self.model)
+                ))
+
+                drop = np.arange(0, G.shape[0], 3)
+                keep = np.setdiff1d(np.arange(G.shape[0]), drop)
+                prob.dropReceivers(drop)
+                self.assertTrue(np.allclose(np.asarray(prob.G), G[keep]))
+                self.assertTrue(np.allclose(
+                    prob.gtgdiag, np.sum(G[keep]**2., axis=0)
+                ))
+                self.assertEqual(prob.survey.nRx, len(keep))
+
+                # the dropped rows appended again, at the end
+                prob.appendReceivers(self.locXyz[drop])
+                self.assertTrue(np.allclose(
+                    np.asarray(prob.G), np.r_[G[keep], G[drop]]
+                ))
+                if kwargs:
+                    # the file of G is updated, not copied
+                    self.assertEqual(len(os.listdir(path)), 1)
+                del prob
+        finally:
+            shutil.rmtree(path)
+
+        # the data of the new receivers are required, weights re-computed
+        prob = problem(self.locXyz[:nFirst])
+        d = np.dot(G, self.model)
+        prob.survey.dobs, prob.survey.std = d[:nFirst], 0.05*np.ones(nFirst)
+        prob.getJtJdiag(self.model, W=Utils.sdiag(np.ones(nFirst)))
+        self.assertRaises(
+            ValueError, prob.appendReceivers, self.locXyz[nFirst:]
+        )
+        self.assertEqual(prob.survey.nRx, nFirst)
+        prob.appendReceivers(
+            self.locXyz[nFirst:], dobs=d[nFirst:],
+            std=0.05*np.ones(G.shape[0] - nFirst)
+        )
+        self.assertTrue(prob.gtgdiag is None)
+        self.assertEqual(len(prob.survey.dobs), G.shape[0])
+        self.assertEqual(len(prob.survey.std), G.shape[0])
+
+    def test_fieldsEnsemble(self):
+
+        models = np.c_[self.model, 2.*self.model, np.random.rand(len(self.model))]
+
+        self.survey.pair(self.prob_z)
+        d = self.prob_z.fieldsEnsemble(models)
+        for ii in range(models.shape[1]):
+            self.assertTrue(
+                np.allclose(d[:, ii], self.prob_z.fields(models[:, ii]))
+            )
+
+        self.survey.unpair()
+        prob = PF.Gravity.GravityIntegral(
+            self.prob_z.mesh, rhoMap=self.prob_z.rhoMap,
+            actInd=self.prob_z.actInd, rx_type='z'
+        )
+        self.survey.pair(prob)
+        self.assertTrue(np.allclose(prob.fieldsEnsemble(models), d))
+
 
 if __name__ == '__main__':
     unittest.main()
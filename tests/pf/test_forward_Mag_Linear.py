@@ -1,7 +1,10 @@
 import unittest
 from SimPEG import Mesh, Utils, PF, Maps, Problem, Survey, mkvc
 import numpy as np
+import scipy.sparse as sp
 import matplotlib.pyplot as plt
+import shutil
+import tempfile
 
 
 class MagFwdProblemTests(unittest.TestCase):
@@ -88,6 +91,227 @@ class MagFwdProblemTests(unittest.TestCase):
         err_tmi = np.linalg.norm(dtmi-btmi)/np.linalg.norm(btmi)
         self.assertTrue(err_xyz < 0.005 and err_tmi < 0.005)
 
+    def test_block_G(self):
+
+        # G computed one receiver at a time and in blocks of receivers
+        G = {}
+        for max_block_memory in [1, 1e9]:
+            prob = PF.Magnetics.MagneticIntegral(
+                self.prob_xyz.mesh, chiMap=self.prob_xyz.chiMap,
+                actInd=self.prob_xyz.actInd, rx_type='xyz',
+                max_block_memory=max_block_memory
+            )
+            self.survey.unpair()
+            self.survey.pair(prob)
+            G[max_block_memory] = prob.G
+
+        self.assertEqual(G[1].shape, (3*self.locXyz.shape[0], len(self.model)))
+        self.assertTrue(np.allclose(G[1], G[1e9]))
+
+        # forwardOnly data match G
+        self.survey.unpair()
+        self.survey.pair(self.prob_xyz)
+        d = self.prob_xyz.fields(self.model)
+        Gd = np.dot(G[1e9], self.model).reshape((-1, 3))
+        self.assertTrue(np.allclose(d, mkvc(Gd), rtol=1e-4))
+
+    def test_parallel_G(self):
+
+        # G computed serially and by workers in shared memory
+        G = {}
+        for parallelized in [False, True]:
+            prob = PF.Magnetics.MagneticIntegral(
+                self.prob_tmi.mesh, chiMap=self.prob_tmi.chiMap,
+                actInd=self.prob_tmi.actInd, rx_type='tmi',
+                parallelized=parallelized, n_cpu=2
+            )
+            self.survey.unpair()
+            self.survey.pair(prob)
+            G[parallelized] = prob.G
+
+        # G is a view of the shared file, here in a chosen directory
+        directory = tempfile.mkdtemp()
+        PF.ParallelForward.sharedDirectory = directory
+        try:
+            prob._G = None
+            G['shared'] = prob.G
+        finally:
+            PF.ParallelForward.sharedDirectory = None
+            shutil.rmtree(directory)
+
+        PF.ParallelForward.closePool()
+        self.assertEqual(G[True].dtype, np.float32)
+        self.assertTrue(np.allclose(G[False], G[True]))
+        self.assertTrue(isinstance(G['shared'], np.memmap))
+        self.assertTrue(G['shared'].filename.startswith(directory))
+        self.assertTrue(np.allclose(G['shared'], G[True]))
+
+    def test_dist_wgt(self):
+
+        mesh = self.prob_tmi.mesh
+        actv = self.prob_tmi.actInd
+        rxLoc = self.locXyz[::7, :]
+
+        # reference: one datum at a time
+        p = 1 / np.sqrt(3)
+        hY, hX, hZ = np.meshgrid(mesh.hy, mesh.hx, mesh.hz)
+        xyz = mesh.gridCC[actv]
+        h = np.c_[mkvc(hX), mkvc(hY), mkvc(hZ)][actv]
+        V = mesh.vol[actv]
+        ref = np.zeros(xyz.shape[0])
+        for loc in rxLoc:
+            temp = 0.
+            for sx in [-p, p]:
+                for sy in [-p, p]:
+                    for sz in [-p, p]:
+                        r = np.sqrt(np.sum(
+                            (xyz + h*np.r_[sx, sy, sz] - loc)**2., axis=1
+                        ))
+                        temp = temp + (r + 0.5)**-3.
+            ref += (V*temp/8.)**2.
+        ref = np.sqrt(ref) / V
+        ref = np.sqrt(ref / ref.max())
+
+        wr = PF.Magnetics.get_dist_wgt(mesh, rxLoc, actv, 3., 0.5)
+        self.assertTrue(np.allclose(wr, ref))
+
+        # blocks of receivers shared between threads, single precision
+        wr = PF.Magnetics.get_dist_wgt(
+            mesh, rxLoc, actv, 3., 0.5, n_cpu=2, dtype=np.float32,
+            max_block_memory=12*4*xyz.shape[0]*5
+        )
+        self.assertTrue(np.allclose(wr, ref, rtol=1e-3))
+
+    def test_footprint_G(self):
+
+        mesh = self.prob_tmi.mesh
+        locXyz = self.locXyz.copy()
+        locXyz[:, :2] /= 8.
+        survey = PF.BaseMag.LinearSurvey(PF.BaseMag.SrcField(
+            [PF.BaseMag.RxObs(locXyz)], param=self.survey.srcField.param
+        ))
+
+        dense = PF.Magnetics.MagneticIntegral(
+            mesh, chiMap=self.prob_tmi.chiMap, actInd=self.prob_tmi.actInd
+        )
+        survey.pair(dense)
+        G = np.array(dense.G, dtype=float)
+        survey.unpair()
+
+        prob = PF.Magnetics.MagneticIntegral(
+            mesh, chiMap=self.prob_tmi.chiMap, actInd=self.prob_tmi.actInd,
+            footprint_radius=4., regional_block_size=0.6
+        )
+        survey.pair(prob)
+        self.assertTrue(isinstance(prob.G, PF.LocalSensitivity.LocalG))
+        self.assertTrue(prob.G.S.nnz < G.size)
+
+        # exact within the footprint, small regional error beyond
+        d = np.dot(G, self.model)
+        self.assertTrue(
+            np.linalg.norm(prob.fields(self.model) - d) <
+            0.05*np.linalg.norm(d)
+        )
+        self.assertTrue(prob.G.truncationError < 0.05)
+
+        v = np.random.rand(G.shape[0])
+        self.assertTrue(np.allclose(
+            prob.G.dotT(v), np.dot(prob.G.rows(0, G.shape[0]).T, v)
+        ))
+        self.assertTrue(np.allclose(
+            prob.getJtJdiag(self.model),
+            np.sum(prob.G.rows(0, G.shape[0])**2., axis=0)
+        ))
+        self.assertTrue(np.allclose(
+            prob.getJ(self.model), prob.G.rows(0, G.shape[0])
+        ))
+
+        # the regional kernels are compressed, the G is not stored
+        prob.compression_tol, prob._G = 1e-3, None
+        self.assertEqual(prob.G.F.tol, 1e-3)
+        prob.sensitivity_path, prob._G = tempfile.gettempdir(), None
+        self.assertRaises(ValueError, getattr, prob, 'G')
+        prob.compression_tol, prob.sensitivity_path = None, None
+
+        # a radius covering the mesh gives the dense G
+        prob.footprint_radius = 100.
+        prob._G = None
+        self.assertTrue(np.allclose(
+            prob.G.rows(0, G.shape[0]), G, atol=1e-6*np.abs(G).max()
+        ))
+
+    def test_compressed_G(self):
+
+        mesh, actInd = self.prob_xyz.mesh, self.prob_xyz.actInd
+        nC = len(self.model)
+        M = np.r_[self.model, 0.5*self.model, -self.model]
+
+        # vector model: one block of columns per component
+        G = {}
+        for compression_tol in [None, 1e-4]:
+            prob = PF.Magnetics.MagneticIntegral(
+                mesh, chiMap=Maps.IdentityMap(nP=3*nC), actInd=actInd,
+                rx_type='xyz', modelType='vector',
+                compression_tol=compression_tol
+            )
+            self.survey.unpair()
+            self.survey.pair(prob)
+            G[compression_tol] = prob.getJ(M)
+        self.assertTrue(isinstance(prob.G, PF.CompressedSensitivity.CompressedG))
+        self.assertTrue(np.all(
+            np.sort(prob.G.order) == np.arange(3*nC)
+        ))
+        self.assertTrue(
+            np.linalg.norm(G[1e-4] - G[None]) < 1e-3*np.linalg.norm(G[None])
+        )
+
+        # amplitude: J and the diagonal of JtJ with a compressed G
+        J, JtJdiag = {}, {}
+        for compression_tol in [None, 1e-4]:
+            prob = PF.Magnetics.MagneticIntegral(
+                mesh, chiMap=Maps.IdentityMap(nP=nC), actInd=actInd,
+                rx_type='xyz', modelType='amplitude',
+                compression_tol=compression_tol
+            )
+            self.survey.unpair()
+            self.survey.pair(prob)
+            prob.model = self.model
+            J[compression_tol] = prob.getJ(self.model)
+            JtJdiag[compression_tol] = prob.getJtJdiag(
+                self.model, W=Utils.sdiag(np.ones(prob.nD))
+            )
+        self.assertTrue(
+            np.linalg.norm(J[1e-4] - J[None]) < 1e-3*np.linalg.norm(J[None])
+        )
+        self.assertTrue(np.allclose(JtJdiag[1e-4], JtJdiag[None], rtol=1e-2))
+
+    def test_spherical_deriv(self):
+
+        nC = 50
+        a, t, p = np.random.rand(nC), np.random.randn(nC), np.random.randn(nC)
+        dSdm = PF.Magnetics.SphericalDeriv(a, t, p)
+
+        # reference assembly from the diagonal blocks
+        D = lambda x: Utils.sdiag(x)
+        S = sp.vstack([
+            sp.hstack([D(np.cos(t)*np.cos(p)), D(-a*np.sin(t)*np.cos(p)),
+                       D(-a*np.cos(t)*np.sin(p))]),
+            sp.hstack([D(np.cos(t)*np.sin(p)), D(-a*np.sin(t)*np.sin(p)),
+                       D(a*np.cos(t)*np.cos(p))]),
+            sp.hstack([D(np.sin(t)), D(a*np.cos(t)), sp.csr_matrix((nC, nC))])
+        ]).toarray()
+
+        v = np.random.randn(3*nC)
+        V = np.random.randn(3*nC, 4)
+        w = np.random.rand(3*nC)
+        self.assertTrue(np.allclose(dSdm * v, S.dot(v)))
+        self.assertTrue(np.allclose(dSdm.T * v, S.T.dot(v)))
+        self.assertTrue(np.allclose(dSdm * V, S.dot(V)))
+        self.assertTrue(np.allclose(dSdm.tosparse().toarray(), S))
+        self.assertTrue(np.allclose(
+            dSdm.columnNorms(w), np.sum((w[:, None]*S)**2., axis=0)
+        ))
+
 
 if __name__ == '__main__':
     unittest.main()
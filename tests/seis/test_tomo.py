@@ -39,6 +39,12 @@ class TomoTest(unittest.TestCase):
             return self.survey.dpred(x), lambda x: self.problem.Jvec(s, x)
         return Tests.checkDerivative(fun, s, num=4, plotIt=False, eps=FLR)
 
+    def test_fieldsEnsemble(self):
+        S = np.random.rand(self.M.nC, 3) + 1.
+        d = self.problem.fieldsEnsemble(S)
+        for ii in range(S.shape[1]):
+            self.assertTrue(np.allclose(d[:, ii], self.problem.fields(S[:, ii])))
+
 if __name__ == '__main__':
     unittest.main()
 